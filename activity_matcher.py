@@ -0,0 +1,308 @@
+"""
+Activity name matching for Enterprise CarbonScope application.
+Maps free-text activity names such as "DG set diesel" to the activities of
+the emission factor registry with a prebuilt trigram index, so whole import
+columns are resolved at once and only ambiguous names need review.
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import config
+from emission_factors import get_registry
+
+# Common spellings used by facilities for registry activities
+ACTIVITY_ALIASES = {
+    ("Stationary Combustion", "Diesel"): ["diesel generator", "DG set", "genset", "HSD", "gasoil boiler"],
+    ("Stationary Combustion", "Natural Gas"): ["PNG", "piped gas", "gas boiler", "NG"],
+    ("Stationary Combustion", "LPG"): ["cooking gas", "propane", "LPG cylinder"],
+    ("Stationary Combustion", "Coal"): ["coal boiler", "bituminous coal"],
+    ("Mobile Combustion", "Petrol/Gasoline"): ["petrol vehicle", "gasoline", "MS fuel"],
+    ("Mobile Combustion", "Diesel"): ["diesel vehicle", "fleet diesel", "truck diesel"],
+    ("Mobile Combustion", "CNG"): ["CNG vehicle", "compressed natural gas"],
+    ("Electricity", "India Grid"): ["grid power India", "EB power", "state electricity board"],
+    ("Electricity", "Solar Power"): ["rooftop solar", "solar PV"],
+    ("Electricity", "Wind Power"): ["wind energy", "wind PPA"],
+    ("Business Travel", "Short-haul Flight"): ["domestic flight", "domestic air travel"],
+    ("Business Travel", "Long-haul Flight"): ["international flight", "international air travel"],
+    ("Business Travel", "Taxi"): ["cab", "ride hailing"],
+    ("Employee Commuting", "Car (Petrol/Gasoline)"): ["petrol car", "gasoline car"],
+    ("Employee Commuting", "Car (Diesel)"): ["diesel car"],
+    ("Employee Commuting", "Motorcycle"): ["two wheeler", "motorbike", "scooter"],
+    ("Employee Commuting", "Train/Metro"): ["metro", "subway", "suburban rail"],
+    ("Waste", "Landfill"): ["landfilled waste", "municipal solid waste"],
+    ("Water", "Water Supply"): ["municipal water", "potable water"],
+}
+
+# Activities whose factors only hold in one country; factor table rows with a
+# country are added to these by get_matcher
+ACTIVITY_REGIONS = {
+    ("Electricity", "India Grid"): "India",
+    ("Electricity", "Indonesia Grid"): "Indonesia",
+    ("Electricity", "Japan Grid"): "Japan",
+}
+
+# Columns of the batch match result
+MATCH_COLUMNS = ['category', 'activity', 'score', 'status', 'candidates']
+
+
+def normalize_name(text):
+    """
+    Normalize an activity name for matching.
+
+    Args:
+        text (str): Activity name
+
+    Returns:
+        str: Lower-cased words separated by single spaces, punctuation removed
+    """
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", str(text).lower()).split())
+
+
+def trigrams(text):
+    """
+    Get the character trigrams of a normalized name.
+
+    Each word is padded with two leading blanks and one trailing blank, so
+    short words and word starts carry weight and word order does not matter.
+
+    Args:
+        text (str): Normalized name
+
+    Returns:
+        set: Trigrams of the name
+    """
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class ActivityMatcher:
+    """
+    Trigram index over (category, activity) keys and their aliases.
+
+    Names are indexed once into posting lists per trigram. A query counts
+    shared trigrams against every indexed name with one bincount over the
+    postings of its trigrams, so ranking all candidates takes microseconds.
+    A name's score averages its trigram similarity with the query and the
+    share of its trigrams found in the query, so "diesel genset" still
+    ranks "Diesel" first.
+
+    Region-specific activities, such as a national grid, are only matched
+    for rows of their own country; without a country they are left for
+    review instead of being picked by name alone.
+    """
+
+    def __init__(self, keys, aliases=None, regions=None):
+        """
+        Build the index.
+
+        Args:
+            keys (list): (category, activity) pairs
+            aliases (dict, optional): Lists of alternative names by (category, activity)
+            regions (dict, optional): Country of the region-specific (category, activity) pairs
+        """
+        self.keys = pd.MultiIndex.from_tuples(list(dict.fromkeys(keys)), names=['category', 'activity'])
+        self.regions = np.array([normalize_name((regions or {}).get(key, '')) for key in self.keys], dtype=object)
+        self.categories = pd.Index(self.keys.get_level_values('category').unique())
+        self.category_codes = {category: code for code, category in enumerate(self.categories)}
+        names, targets = [], []
+        for target, (category, activity) in enumerate(self.keys):
+            names.append(activity)
+            targets.append(target)
+        for (category, activity), alternatives in (aliases or {}).items():
+            target = self.keys.get_indexer([(category, activity)])[0]
+            if target == -1:
+                continue
+            names.extend(alternatives)
+            targets.extend([target] * len(alternatives))
+
+        normalized = [normalize_name(name) for name in names]
+        self.targets = np.array(targets, dtype=np.int64)
+        self.name_categories = self.categories.get_indexer(self.keys.get_level_values('category'))[self.targets]
+        # Names equal up to case and punctuation, by category code and across categories;
+        # canonical names come first, so positions below len(self.keys) are key names
+        self.exact, self.exact_any = {}, {}
+        for position, name in enumerate(normalized):
+            self.exact.setdefault((self.name_categories[position], name), position)
+            self.exact_any.setdefault(name, []).append(position)
+
+        vocabulary, postings = {}, []
+        gram_sets = [trigrams(name) for name in normalized]
+        for position, grams in enumerate(gram_sets):
+            for gram in grams:
+                if gram not in vocabulary:
+                    vocabulary[gram] = len(postings)
+                    postings.append([])
+                postings[vocabulary[gram]].append(position)
+        self.vocabulary = vocabulary
+        self.postings = [np.array(positions, dtype=np.int64) for positions in postings]
+        self.sizes = np.array([len(grams) for grams in gram_sets], dtype=float)
+
+    def __len__(self):
+        """Number of indexed names, aliases included."""
+        return len(self.targets)
+
+    def _scores(self, name, category=None):
+        """Score every (category, activity) key against a normalized name."""
+        grams = trigrams(name)
+        lists = [self.postings[self.vocabulary[gram]] for gram in grams if gram in self.vocabulary]
+        scores = np.zeros(len(self.keys))
+        if not lists:
+            return scores
+        common = np.bincount(np.concatenate(lists), minlength=len(self.targets)).astype(float)
+        name_scores = (common / (self.sizes + len(grams) - common) + common / self.sizes) / 2
+        if category is not None:
+            name_scores[self.name_categories != self.category_codes.get(category, -1)] = 0.0
+        # A key scores as its best matching name
+        np.maximum.at(scores, self.targets, name_scores)
+        return scores
+
+    def match(self, text, category=None, limit=5):
+        """
+        Rank the activities matching a free-text name.
+
+        Args:
+            text (str): Activity name as written
+            category (str, optional): Only match activities of this category
+            limit (int, optional): Maximum number of matches
+
+        Returns:
+            list: (category, activity, score) tuples, best first
+        """
+        scores = self._scores(normalize_name(text), category)
+        best = np.argsort(-scores, kind='stable')[:limit]
+        return [(*self.keys[i], round(float(scores[i]), 3)) for i in best if scores[i] > 0]
+
+    def _allowed(self, country):
+        """Flag the keys a row of a country can be matched to: all but the activities of other regions."""
+        return (self.regions == '') | (self.regions == normalize_name(country or ''))
+
+    def match_column(self, activities, categories=None, countries=None, min_score=config.ACTIVITY_MATCH_MIN_SCORE,
+                     margin=config.ACTIVITY_MATCH_MARGIN):
+        """
+        Map a whole column of free-text activity names at once.
+
+        Each distinct (category, name) pair is scored once. A name is
+        "exact" when it equals an activity name up to case and punctuation,
+        "matched" when its best key scores at least min_score and leads the
+        runner-up by margin (or it equals an alias), "ambiguous" when
+        several keys score within margin of the best, and "unmatched"
+        otherwise.
+
+        Names of region-specific activities match as written. Otherwise a
+        region-specific activity is only a candidate for rows of its country,
+        and a row without a country whose best candidate is region-specific
+        is "ambiguous".
+
+        Args:
+            activities (pandas.Series): Activity names as written
+            categories (pandas.Series, optional): Category of each row; when omitted,
+                activities of every category are candidates
+            countries (pandas.Series, optional): Country of each row
+            min_score (float, optional): Lowest score accepted as a match
+            margin (float, optional): Lead over the runner-up a match needs
+
+        Returns:
+            pandas.DataFrame: category, activity, score, status and candidates per row,
+                aligned with activities; category and activity are None unless matched
+        """
+        frame = pd.DataFrame({
+            'category': categories.values if categories is not None else None,
+            'activity': activities.values,
+            'country': countries.values if countries is not None else None
+        }, index=activities.index).astype(object)
+        codes, distinct = pd.factorize(pd.MultiIndex.from_frame(frame.fillna('')))
+
+        results = []
+        for category, text, country in distinct:
+            category = category or None
+            name = normalize_name(text)
+            allowed = self._allowed(country)
+            if category:
+                exact = [self.exact.get((self.category_codes.get(category, -1), name))]
+            else:
+                exact = self.exact_any.get(name, [None])
+            # Aliases of another region's activities are scored like any other name
+            exact = [position for position in exact
+                     if position is not None and (position < len(self.keys) or allowed[self.targets[position]])]
+            if exact:
+                targets = list(dict.fromkeys(self.targets[exact]))
+                if len(targets) > 1:
+                    candidates = " | ".join(f"{self.keys[i][0]} / {self.keys[i][1]}" for i in targets)
+                    results.append((None, None, 1.0, 'ambiguous', candidates))
+                else:
+                    status = 'exact' if exact[0] < len(self.keys) else 'matched'
+                    results.append((*self.keys[targets[0]], 1.0, status, ''))
+                continue
+            scores = self._scores(name, category)
+            if country:
+                scores[~allowed] = 0.0
+            order = np.argsort(-scores, kind='stable')[:3]
+            best, runner_up = scores[order[0]], scores[order[1]] if len(order) > 1 else 0.0
+            if best < min_score:
+                results.append((None, None, round(float(best), 3), 'unmatched', ''))
+                continue
+            close = [i for i in order if scores[i] >= min_score and best - scores[i] < margin]
+            if len(close) > 1 or not allowed[order[0]]:
+                candidates = " | ".join(f"{self.keys[i][0]} / {self.keys[i][1]}" for i in close)
+                results.append((None, None, round(float(best), 3), 'ambiguous', candidates))
+                continue
+            results.append((*self.keys[order[0]], round(float(best), 3), 'matched', ''))
+
+        distinct_results = pd.DataFrame(results, columns=MATCH_COLUMNS)
+        matched = distinct_results.take(codes)
+        matched.index = activities.index
+        return matched
+
+
+def load_aliases(path=config.ACTIVITY_ALIASES_FILE):
+    """
+    Get the built-in aliases merged with the aliases file.
+
+    Args:
+        path (str, optional): CSV with category, activity and alias columns
+
+    Returns:
+        dict: Lists of alternative names by (category, activity)
+    """
+    aliases = {key: list(names) for key, names in ACTIVITY_ALIASES.items()}
+    if os.path.exists(path):
+        table = pd.read_csv(path, dtype=str).dropna(subset=['category', 'activity', 'alias'])
+        for category, activity, alias in table[['category', 'activity', 'alias']].itertuples(index=False):
+            aliases.setdefault((category.strip(), activity.strip()), []).append(alias.strip())
+    return aliases
+
+
+_matcher = None
+_matcher_table = None
+
+
+def get_matcher():
+    """
+    Get the matcher over the activities of the shared factor registry.
+
+    The index is rebuilt when the registry loads new factor tables.
+
+    Returns:
+        ActivityMatcher: Shared matcher
+    """
+    global _matcher, _matcher_table
+    table = get_registry().table
+    if _matcher is None or _matcher_table is not table:
+        named = table[table['activity'] != '']
+        keys = list(zip(named['category'], named['activity']))
+        # Activities whose factor rows all name the same country are specific to it
+        countries = {}
+        for key, country in zip(keys, named['country']):
+            countries.setdefault(key, set()).add(country)
+        regions = dict(ACTIVITY_REGIONS)
+        regions.update({key: next(iter(names)) for key, names in countries.items() if len(names) == 1 and '' not in names})
+        _matcher = ActivityMatcher(keys, load_aliases(), regions)
+        _matcher_table = table
+    return _matcher
@@ -0,0 +1,671 @@
+"""
+Materialized aggregates for Enterprise CarbonScope application.
+Keeps emission totals by scope, category, month and scope, facility and
+business unit up to date as entries are added and deleted, so dashboards
+read precomputed numbers instead of grouping every row on each rerun. The
+totals of every key combination form a rollup cube that is sliced and
+drilled into across the organisational dimensions, and daily totals per
+scope and category form a prefix-sum index for arbitrary date ranges.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import config
+from emissions_store import file_lock, repair_tail
+
+# Grouping columns of each maintained aggregate
+AGGREGATE_DIMENSIONS = {
+    'scope': ['scope'],
+    'category': ['category'],
+    'month_scope': ['month', 'scope'],
+    'facility': ['facility'],
+    'business_unit': ['business_unit'],
+}
+
+# Key columns of an aggregate group, in the order they are persisted
+KEY_COLUMNS = [
+    'scope', 'category', 'month', 'facility', 'business_unit',
+    'country', 'project', 'data_quality', 'activity', 'verification_status'
+]
+
+# Dimensions of the rollup cube; 'period' is the month, quarter or year of the entry
+CUBE_DIMENSIONS = ['period'] + [col for col in KEY_COLUMNS if col != 'month']
+
+# Granularities the cube's period dimension rolls up to
+PERIOD_GRANULARITIES = ['month', 'quarter', 'year']
+
+# Period frequencies of the summary time series
+TIME_SERIES_GRANULARITIES = {'week': 'W', 'month': 'M', 'quarter': 'Q', 'year': 'Y'}
+
+# Drill-down paths through the cube, coarsest level first
+DRILL_HIERARCHIES = {
+    'organisation': ['business_unit', 'facility', 'activity'],
+    'emission source': ['scope', 'category', 'activity'],
+    'geography': ['country', 'facility'],
+    'project': ['project', 'business_unit', 'facility'],
+    'data quality': ['verification_status', 'data_quality'],
+}
+
+# Day number stored for entries without a valid date
+NO_DAY = -1
+
+
+def _format_months(dates):
+    """Format dates as YYYY-MM, formatting each distinct month once; missing dates become ''."""
+    codes, months = pd.factorize(dates.dt.to_period('M'))
+    labels = np.append(pd.PeriodIndex(months, freq='M').strftime('%Y-%m').to_numpy(dtype=object), '')
+    return labels[np.where(codes == -1, len(months), codes)]
+
+
+def _period_label(month, period):
+    """Relabel a YYYY-MM month as its quarter (YYYY-Qn) or year (YYYY); '' stays ''."""
+    if not month or period == 'month':
+        return month
+    if period == 'year':
+        return month[:4]
+    return f"{month[:4]}-Q{(int(month[5:7]) - 1) // 3 + 1}"
+
+
+def _time_series_labels(periods, granularity):
+    """Format period keys: weeks by their first day, months as YYYY-MM, quarters as YYYY-Qn, years as YYYY."""
+    if granularity == 'week':
+        return periods.start_time.strftime('%Y-%m-%d')
+    return periods.strftime({'month': '%Y-%m', 'quarter': '%Y-Q%q', 'year': '%Y'}[granularity])
+
+
+def time_series(dates, scopes, emissions, granularity='month'):
+    """
+    Sum emissions by period and scope into the nested summary time series.
+
+    Dates become period keys and are summed per scope with one pivot; only
+    the distinct periods are formatted as labels.
+
+    Args:
+        dates (array-like): Date of each row; rows without a date are left out
+        scopes (array-like): Scope of each row
+        emissions (array-like): Emissions of each row in kgCO2e
+        granularity (str, optional): One of TIME_SERIES_GRANULARITIES
+
+    Returns:
+        dict: period label -> scope -> emissions, in period order
+    """
+    if granularity not in TIME_SERIES_GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'. Choose from: {', '.join(TIME_SERIES_GRANULARITIES)}")
+    frame = pd.DataFrame({
+        'period': pd.DatetimeIndex(dates).to_period(TIME_SERIES_GRANULARITIES[granularity]),
+        'scope': np.asarray(scopes, dtype=object),
+        'emissions': np.asarray(emissions, dtype=float)
+    })
+    frame = frame[frame['period'].notna() & frame['scope'].notna()]
+    if len(frame) == 0:
+        return {}
+    pivot = frame.pivot_table(index='period', columns='scope', values='emissions', aggfunc='sum', observed=True)
+    pivot.index = _time_series_labels(pivot.index, granularity)
+    # Scopes without entries in a period are NaN in the pivot and left out
+    return {
+        period: {scope: emissions for scope, emissions in totals.items() if emissions == emissions}
+        for period, totals in pivot.to_dict(orient='index').items()
+    }
+
+
+def group_hash(key):
+    """
+    Get the stable identifier of an aggregate key combination.
+
+    Args:
+        key (tuple): Values of the KEY_COLUMNS
+
+    Returns:
+        str: 16 hex digits of the SHA-1 of the key
+    """
+    return hashlib.sha1(json.dumps(list(key)).encode('utf-8')).hexdigest()[:16]
+
+
+def contributions(df):
+    """
+    Reduce emissions rows to their aggregate key columns and emissions.
+
+    Args:
+        df (pandas.DataFrame): Emissions rows with entry_id populated
+
+    Returns:
+        pandas.DataFrame: entry_id, the KEY_COLUMNS, day (days since 1970-01-01, NO_DAY
+            when missing) and emissions per row
+    """
+    dates = pd.to_datetime(df['date'], errors='coerce') if 'date' in df.columns else pd.Series(pd.NaT, index=df.index)
+    frame = pd.DataFrame({'entry_id': df['entry_id'].astype(object).values}, index=df.index)
+    for col in [col for col in KEY_COLUMNS if col != 'month']:
+        values = df[col].astype(object) if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        frame[col] = values.where(values.notna(), '').astype(str).values
+    frame['month'] = _format_months(dates)
+    days = dates.values.astype('datetime64[D]')
+    frame['day'] = np.where(np.isnat(days), NO_DAY, days.astype(np.int64))
+    frame['emissions'] = pd.to_numeric(df['emissions_kgCO2e'], errors='coerce').fillna(0.0).values
+    return frame.reset_index(drop=True)[['entry_id'] + KEY_COLUMNS + ['day', 'emissions']]
+
+
+class EmissionsAggregates:
+    """
+    Persistent aggregate store.
+
+    Each indexed entry keeps the id of its aggregate key combination, its
+    day and its emissions, so a delete or a replacement subtracts exactly
+    what the entry added. Changes touch only the totals of the groups they fall in and are
+    appended to a JSON lines file; the store is read lazily on first use and
+    rebuilt from the data when it falls out of step.
+
+    In the file, entries refer to their key combination by its hash
+    (group_hash), never by a position, so processes appending to the same
+    file without seeing each other's records cannot mix up combinations.
+    Group ids are local to each loaded copy. Appends hold the file's lock,
+    and once superseded records outnumber the live ones the file is
+    rewritten from a fresh read. One instance is shared by the sessions of
+    a process, so loading, changes and queries hold an in-process lock.
+
+    The sum and count of every key combination are kept in arrays indexed by
+    group id. These cells are the base of the rollup cube: rollup and
+    drill_down group the cells rather than the rows, so their cost follows
+    the number of distinct combinations, not the number of entries.
+
+    Dated entries are also summed per day and (scope, category) series over
+    a sorted array of days. Cumulative sums over those days are computed on
+    the first query after a change, so the totals of any date range take two
+    binary searches and a subtraction (period_totals).
+    """
+
+    def __init__(self, aggregates_file=config.AGGREGATES_FILE):
+        """Initialize the EmissionsAggregates class."""
+        self.aggregates_file = aggregates_file
+        self._lock = threading.RLock()
+        self._entries = None
+        self._groups = None
+        self._group_ids = None
+        self._hashes = None
+        self._lines = 0
+        self._totals = None
+        self._days = None
+        self._sums = None
+        self._counts = None
+        self._cell_codes = None
+        self._cell_values = None
+        self._series = None
+        self._group_series = None
+        self._day_index = None
+        self._daily = None
+        self._cumulative = None
+
+    def _reset(self):
+        """Clear the in-memory state."""
+        self._entries = {}
+        self._groups, self._group_ids, self._hashes = [], {}, []
+        self._lines = 0
+        self._totals = {name: {} for name in AGGREGATE_DIMENSIONS}
+        self._days = {}
+        self._sums = np.zeros(0)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._cell_codes = None
+        self._cell_values = None
+        self._series = {}
+        self._group_series = np.zeros(0, dtype=np.int64)
+        self._day_index = np.zeros(0, dtype=np.int64)
+        self._daily = np.zeros((0, 0, 2))
+        self._cumulative = None
+
+    def _ensure_loaded(self):
+        """Read the aggregates file on first use."""
+        with self._lock:
+            if self._entries is not None:
+                return
+            self._reset()
+            if not os.path.exists(self.aggregates_file):
+                return
+            by_hash = {}
+            with open(self.aggregates_file, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    self._lines += 1
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn line from an interrupted write; sync notices a lost entry
+                        continue
+                    if "k" in record:
+                        if "h" not in record or len(record["k"]) != len(KEY_COLUMNS):
+                            # Written with positional group ids or other key columns; sync rebuilds it
+                            self._reset()
+                            return
+                        by_hash[record["h"]] = self._register(tuple(record["k"]), record["h"])
+                    elif record.get("del"):
+                        self._entries.pop(record["id"], None)
+                    elif record.get("h") in by_hash:
+                        self._entries[record["id"]] = (by_hash[record["h"]], record["d"], record["e"])
+                    else:
+                        # Entry of an unknown key combination; sync rebuilds it
+                        self._reset()
+                        return
+            self._apply(self._entries.values(), 1)
+
+    def invalidate(self):
+        """Drop the in-memory state, so the aggregates file is read again on next use."""
+        with self._lock:
+            self._entries = None
+
+    def _register(self, key, key_hash):
+        """Get the local group id of a key combination, registering it if it is new."""
+        group = self._group_ids.get(key)
+        if group is None:
+            group = self._group_ids[key] = len(self._groups)
+            self._groups.append(key)
+            self._hashes.append(key_hash)
+        return group
+
+    def _intern(self, frame):
+        """
+        Get the group id of each row's key combination, registering new ones.
+
+        Returns:
+            tuple: (group id per row, records defining the new groups)
+        """
+        codes, combos = pd.factorize(pd.MultiIndex.from_frame(frame[KEY_COLUMNS]))
+        records, ids = [], np.empty(len(combos), dtype=np.int64)
+        for position, combo in enumerate(combos):
+            if combo not in self._group_ids:
+                records.append({"h": group_hash(combo), "k": list(combo)})
+                self._register(combo, records[-1]["h"])
+            ids[position] = self._group_ids[combo]
+        return ids[codes], records
+
+    def _apply(self, entries, sign):
+        """Add (sign 1) or subtract (sign -1) (group id, day, emissions) entries from every aggregate."""
+        entries = pd.DataFrame.from_records(list(entries), columns=['group', 'day', 'emissions'])
+        if len(entries) == 0:
+            return
+        for day, count in entries['day'].value_counts().items():
+            self._days[day] = self._days.get(day, 0) + sign * count
+            if self._days[day] <= 0:
+                del self._days[day]
+        # Collapse to key combinations first, then roll each dimension up from those
+        per_group = entries.groupby('group')['emissions'].agg(['sum', 'size'])
+        self._grow()
+        self._sums[per_group.index.values] += sign * per_group['sum'].values
+        self._counts[per_group.index.values] += sign * per_group['size'].values
+        self._index_days(entries, sign)
+        keys = pd.DataFrame([self._groups[group] for group in per_group.index], columns=KEY_COLUMNS)
+        keys['sum'], keys['size'] = per_group['sum'].values, per_group['size'].values
+        for name, columns in AGGREGATE_DIMENSIONS.items():
+            grouped = keys.groupby(columns, sort=False)[['sum', 'size']].sum()
+            totals = self._totals[name]
+            for key, emissions, count in zip(grouped.index, grouped['sum'], grouped['size']):
+                current = totals.setdefault(key, [0.0, 0])
+                current[0] += sign * float(emissions)
+                current[1] += sign * int(count)
+                if current[1] <= 0:
+                    del totals[key]
+
+    def _grow(self):
+        """Extend the cell arrays and the series of each group to cover newly registered groups."""
+        grown = len(self._groups) - len(self._sums)
+        if grown > 0:
+            self._sums = np.concatenate([self._sums, np.zeros(grown)])
+            self._counts = np.concatenate([self._counts, np.zeros(grown, dtype=np.int64)])
+            series = [
+                self._series.setdefault((group[0], group[1]), len(self._series))
+                for group in self._groups[len(self._group_series):]
+            ]
+            self._group_series = np.concatenate([self._group_series, np.array(series, dtype=np.int64)])
+
+    def _index_days(self, entries, sign):
+        """Add (sign 1) or subtract (sign -1) dated entries from the daily totals of their series."""
+        dated = entries[entries['day'] != NO_DAY]
+        if len(dated) == 0:
+            return
+        per_day = pd.DataFrame({
+            'day': dated['day'].to_numpy(dtype=np.int64),
+            'series': self._group_series[dated['group'].to_numpy()],
+            'emissions': dated['emissions'].to_numpy()
+        }).groupby(['day', 'series'])['emissions'].agg(['sum', 'size'])
+        days = per_day.index.get_level_values('day').to_numpy()
+        series = per_day.index.get_level_values('series').to_numpy()
+        # New days and series are rare after the first load; only then is the daily array reallocated
+        new_days = np.setdiff1d(days, self._day_index)
+        if len(new_days) > 0 or self._daily.shape[1] < len(self._series):
+            day_index = np.union1d(self._day_index, new_days)
+            daily = np.zeros((len(day_index), len(self._series), 2))
+            daily[np.searchsorted(day_index, self._day_index), :self._daily.shape[1]] = self._daily
+            self._day_index, self._daily = day_index, daily
+        rows = np.searchsorted(self._day_index, days)
+        self._daily[rows, series, 0] += sign * per_day['sum'].to_numpy()
+        self._daily[rows, series, 1] += sign * per_day['size'].to_numpy()
+        self._cumulative = None
+
+    def _entry_lines(self, entries):
+        """Serialize (entry_id, (group id, day, emissions)) pairs as JSON lines."""
+        return [f'{{"id": {json.dumps(entry_id)}, "h": "{self._hashes[group]}", "d": {day}, "e": {emissions!r}}}\n'
+                for entry_id, (group, day, emissions) in entries]
+
+    def _write(self, records, entries=()):
+        """Append records and entry lines to the aggregates file; compact it once most lines are superseded."""
+        lines = [json.dumps(record) + "\n" for record in records] + self._entry_lines(entries)
+        if not lines:
+            return
+        with file_lock(self.aggregates_file):
+            repair_tail(self.aggregates_file)
+            with open(self.aggregates_file, 'a') as f:
+                f.write("".join(lines))
+        self._lines += len(lines)
+        if self._lines > config.AGGREGATES_COMPACTION_RATIO * (len(self._entries) + len(self._groups)):
+            self.compact()
+
+    def _rewrite(self):
+        """Replace the aggregates file with the definitions of the groups in use and one line per entry."""
+        used = sorted({group for group, _, _ in self._entries.values()})
+        lines = [json.dumps({"h": self._hashes[group], "k": list(self._groups[group])}) + "\n" for group in used]
+        lines += self._entry_lines(self._entries.items())
+        tmp_path = f"{self.aggregates_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("".join(lines))
+        os.replace(tmp_path, self.aggregates_file)
+        self._lines = len(lines)
+
+    def compact(self):
+        """Rewrite the aggregates file without deleted and replaced entries, from a fresh read of it."""
+        with self._lock:
+            with file_lock(self.aggregates_file):
+                self.invalidate()
+                self._ensure_loaded()
+                self._rewrite()
+
+    def __len__(self):
+        """Number of aggregated entries."""
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._entries)
+
+    def add(self, df):
+        """
+        Add stored rows to the aggregates.
+
+        Rows replacing an entry that is already aggregated take its place.
+
+        Args:
+            df (pandas.DataFrame): Rows as stored, with entry_id populated
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if len(df) == 0:
+                return
+            frame = contributions(df).drop_duplicates(subset='entry_id', keep='last')
+            replaced = [entry_id for entry_id in frame['entry_id'] if entry_id in self._entries]
+            self._apply([self._entries.pop(entry_id) for entry_id in replaced], -1)
+            groups, records = self._intern(frame)
+            added = list(zip(frame['entry_id'], zip(groups.tolist(), frame['day'].tolist(), frame['emissions'].tolist())))
+            self._apply([entry for _, entry in added], 1)
+            self._entries.update(added)
+            # The last line of an entry wins on load, so replaced entries need no delete record
+            self._write(records, added)
+
+    def remove(self, entry_ids):
+        """
+        Subtract deleted rows from the aggregates.
+
+        Args:
+            entry_ids (list): entry_id values of the deleted rows
+        """
+        with self._lock:
+            self._ensure_loaded()
+            entry_ids = list(dict.fromkeys(entry_ids))
+            removed = [entry_id for entry_id in entry_ids if entry_id in self._entries]
+            self._apply([self._entries.pop(entry_id) for entry_id in removed], -1)
+            # Deletes are written even for entries this copy has not seen, which another process may have added
+            self._write([{"id": entry_id, "del": True} for entry_id in entry_ids])
+
+    def rebuild(self, data):
+        """
+        Rebuild the aggregates from the full emissions data.
+
+        Args:
+            data (pandas.DataFrame): All stored emissions rows
+        """
+        with self._lock:
+            self._reset()
+            if len(data) > 0:
+                frame = contributions(data).drop_duplicates(subset='entry_id', keep='last')
+                groups, _ = self._intern(frame)
+                self._entries = dict(zip(
+                    frame['entry_id'], zip(groups.tolist(), frame['day'].tolist(), frame['emissions'].tolist())
+                ))
+                self._apply(self._entries.values(), 1)
+            with file_lock(self.aggregates_file):
+                self._rewrite()
+
+    def sync(self, data):
+        """
+        Rebuild the aggregates if they do not cover exactly the stored entries.
+
+        Besides the entry ids, the totals by scope are compared, which catches
+        entries whose emissions or scope changed without passing through add.
+
+        Args:
+            data (pandas.DataFrame): All stored emissions rows
+        """
+        with self._lock:
+            self._ensure_loaded()
+            in_step = len(self._entries) == len(data) and (
+                len(data) == 0 or data['entry_id'].isin(self._entries.keys()).all()
+            )
+            if in_step and len(data) > 0:
+                scopes = data['scope'].astype(object).where(data['scope'].notna(), '').astype(str)
+                emissions = pd.to_numeric(data['emissions_kgCO2e'], errors='coerce').fillna(0.0)
+                expected = emissions.groupby(scopes.values).sum()
+                actual = pd.Series({scope: total for scope, (total, _) in self._totals['scope'].items()}, dtype=float)
+                in_step = expected.index.sort_values().equals(actual.index.sort_values()) and np.allclose(
+                    actual[expected.index].values, expected.values, rtol=1e-9, atol=1e-6
+                )
+            if not in_step:
+                self.rebuild(data)
+
+    def total(self):
+        """float: Total emissions of all entries in kgCO2e."""
+        with self._lock:
+            self._ensure_loaded()
+            return sum(emissions for emissions, _ in self._totals['scope'].values())
+
+    def latest_date(self):
+        """pandas.Timestamp: Latest entry date, or None when no entry has a date."""
+        with self._lock:
+            self._ensure_loaded()
+            days = [day for day in self._days if day != NO_DAY]
+            return pd.Timestamp(max(days), unit='D') if days else None
+
+    def by(self, dimension):
+        """
+        Get the totals of one aggregate.
+
+        Args:
+            dimension (str): One of AGGREGATE_DIMENSIONS
+
+        Returns:
+            pandas.DataFrame: The dimension's grouping columns, emissions_kgCO2e and
+                entries, sorted by the grouping columns
+        """
+        with self._lock:
+            if dimension not in AGGREGATE_DIMENSIONS:
+                raise ValueError(f"Unknown aggregate '{dimension}'. Choose from: {', '.join(AGGREGATE_DIMENSIONS)}")
+            self._ensure_loaded()
+            columns = AGGREGATE_DIMENSIONS[dimension]
+            totals = self._totals[dimension]
+            keys = [key if isinstance(key, tuple) else (key,) for key in totals]
+            result = pd.DataFrame(keys, columns=columns)
+            result['emissions_kgCO2e'] = [emissions for emissions, _ in totals.values()]
+            result['entries'] = [count for _, count in totals.values()]
+            return result.sort_values(columns).reset_index(drop=True)
+
+    def summary(self, granularity='month'):
+        """
+        Get the totals in the shape of DataHandler.get_emissions_summary.
+
+        The time series is summed from the daily totals of the date index, so
+        any granularity is computed without reading entries.
+
+        Args:
+            granularity (str, optional): 'week', 'month', 'quarter' or 'year'
+
+        Returns:
+            dict: total_emissions, scope_breakdown, category_breakdown and
+                time_series (period -> scope -> emissions)
+        """
+        with self._lock:
+            self._ensure_loaded()
+            days, series = np.nonzero(self._daily[:, :, 1] > 0.5)
+            scopes = np.array([scope for scope, _ in self._series], dtype=object)
+            return {
+                "total_emissions": self.total(),
+                "scope_breakdown": {scope: emissions for scope, (emissions, _) in self._totals['scope'].items()},
+                "category_breakdown": {category: emissions for category, (emissions, _) in self._totals['category'].items()},
+                "time_series": time_series(
+                    pd.to_datetime(self._day_index[days], unit='D'), scopes[series], self._daily[days, series, 0], granularity
+                )
+            }
+
+    def _cells(self):
+        """
+        Get the key columns of every group as integer codes.
+
+        Groups registered since the last call are encoded on the way, so the
+        codes grow with the groups instead of being rebuilt.
+
+        Returns:
+            dict: Code array by key column; self._cell_values maps values to codes
+        """
+        if self._cell_codes is None:
+            self._cell_codes = {col: np.zeros(0, dtype=np.int64) for col in KEY_COLUMNS}
+            self._cell_values = {col: {} for col in KEY_COLUMNS}
+        done = len(self._cell_codes[KEY_COLUMNS[0]])
+        if done < len(self._groups):
+            for col, values in zip(KEY_COLUMNS, zip(*self._groups[done:])):
+                lookup = self._cell_values[col]
+                codes, distinct = pd.factorize(np.array(values, dtype=object))
+                known = np.array([lookup.setdefault(value, len(lookup)) for value in distinct], dtype=np.int64)
+                self._cell_codes[col] = np.concatenate([self._cell_codes[col], known[codes]])
+        return self._cell_codes
+
+    def _cell_column(self, dimension, period):
+        """
+        Get one cube dimension of every group.
+
+        Returns:
+            tuple: (code per group, Index of the value of each code); periods are
+                relabelled once per distinct month
+        """
+        column = 'month' if dimension == 'period' else dimension
+        codes = self._cells()[column]
+        labels = pd.Index(list(self._cell_values[column]), dtype=object)
+        if dimension == 'period' and period != 'month':
+            relabel, labels = pd.factorize(pd.Index([_period_label(month, period) for month in labels], dtype=object))
+            codes = relabel[codes]
+        return codes, labels
+
+    def rollup(self, dimensions, where=None, period='month'):
+        """
+        Slice the cube and roll it up to some of its dimensions.
+
+        Args:
+            dimensions (list): CUBE_DIMENSIONS to group by; empty for the grand total
+            where (dict, optional): Value or list of values to keep, by dimension
+            period (str, optional): Granularity of the period dimension, one of
+                PERIOD_GRANULARITIES
+
+        Returns:
+            pandas.DataFrame: The dimensions, emissions_kgCO2e and entries, sorted by
+                the dimensions; '' stands for entries without a value
+        """
+        with self._lock:
+            dimensions, where = list(dimensions), dict(where or {})
+            unknown = [dimension for dimension in dimensions + list(where) if dimension not in CUBE_DIMENSIONS]
+            if unknown:
+                raise ValueError(f"Unknown dimension '{unknown[0]}'. Choose from: {', '.join(CUBE_DIMENSIONS)}")
+            if period not in PERIOD_GRANULARITIES:
+                raise ValueError(f"Unknown period '{period}'. Choose from: {', '.join(PERIOD_GRANULARITIES)}")
+            self._ensure_loaded()
+            self._grow()
+            columns = {dimension: self._cell_column(dimension, period) for dimension in set(dimensions) | set(where)}
+            keep = self._counts > 0
+            for dimension, values in where.items():
+                values = [values] if isinstance(values, str) or not np.iterable(values) else list(values)
+                codes, labels = columns[dimension]
+                keep &= np.isin(codes, np.flatnonzero(labels.isin(values)))
+            # Group the codes of the kept cells; values are looked up only for the result rows
+            cells = pd.DataFrame({dimension: columns[dimension][0][keep] for dimension in dimensions})
+            cells['emissions_kgCO2e'] = self._sums[keep]
+            cells['entries'] = self._counts[keep]
+            if not dimensions:
+                return cells.sum().to_frame().T.astype({'entries': np.int64})
+            result = cells.groupby(dimensions, sort=False)[['emissions_kgCO2e', 'entries']].sum().reset_index()
+            for dimension in dimensions:
+                result[dimension] = columns[dimension][1].take(result[dimension].to_numpy()).to_numpy()
+            return result.sort_values(dimensions).reset_index(drop=True)
+
+    def drill_down(self, hierarchy, path=(), where=None, period='month'):
+        """
+        Break the totals under a path down by the next level of a hierarchy.
+
+        For example drill_down(['business_unit', 'facility', 'activity'], ['Manufacturing'])
+        gives the totals of each facility of the Manufacturing business unit.
+
+        Args:
+            hierarchy (list): Cube dimensions from the coarsest level down, e.g. a
+                DRILL_HIERARCHIES value
+            path (list, optional): Selected values of the first levels
+            where (dict, optional): Further slicing, as in rollup
+            period (str, optional): Granularity of the period dimension
+
+        Returns:
+            pandas.DataFrame: The next level, emissions_kgCO2e and entries
+        """
+        if len(path) >= len(hierarchy):
+            raise ValueError("The path already selects the lowest level of the hierarchy")
+        where = dict(where or {})
+        where.update(zip(hierarchy, path))
+        return self.rollup([hierarchy[len(path)]], where, period)
+
+    def period_totals(self, start_date=None, end_date=None, by=None):
+        """
+        Get the totals of the entries dated within a period from the date index.
+
+        Args:
+            start_date (datetime, optional): First day of the period, open when omitted
+            end_date (datetime, optional): Last day of the period, open when omitted
+            by (str, optional): 'scope' or 'category' to break the totals down
+
+        Returns:
+            float or pandas.DataFrame: Emissions in kgCO2e when by is None, otherwise
+                by, emissions_kgCO2e and entries, sorted by the breakdown column
+        """
+        with self._lock:
+            if by not in (None, 'scope', 'category'):
+                raise ValueError(f"Unknown breakdown '{by}'. Choose from: scope, category")
+            self._ensure_loaded()
+            if self._cumulative is None:
+                self._cumulative = np.concatenate([np.zeros((1,) + self._daily.shape[1:]), self._daily.cumsum(axis=0)])
+            first = 0 if start_date is None else np.searchsorted(
+                self._day_index, (pd.Timestamp(start_date).normalize() - pd.Timestamp(0)).days, side='left'
+            )
+            last = len(self._day_index) if end_date is None else np.searchsorted(
+                self._day_index, (pd.Timestamp(end_date).normalize() - pd.Timestamp(0)).days, side='right'
+            )
+            totals = self._cumulative[max(last, first)] - self._cumulative[first]
+            if by is None:
+                return float(totals[:, 0].sum())
+            result = pd.DataFrame(list(self._series), columns=['scope', 'category'])
+            result['emissions_kgCO2e'] = totals[:, 0]
+            result['entries'] = np.rint(totals[:, 1]).astype(np.int64)
+            result = result.groupby(by)[['emissions_kgCO2e', 'entries']].sum().reset_index()
+            return result[result['entries'] > 0].reset_index(drop=True)
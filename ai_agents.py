@@ -7,6 +7,7 @@ the way for scalable, sustainable, and data-driven climate solutions.
 import os
 from dotenv import load_dotenv
 from crewai import Agent, Task, Crew, LLM
+from emission_factors import get_registry
 
 # Load environment variables
 load_dotenv()
@@ -108,7 +109,8 @@ class CarbonScopeAgents:
                 f"emission scope and category: {data_description}\n"
                 f"1. Determine if this is Scope 1, 2, or 3\n"
                 f"2. Suggest the most appropriate category\n"
-                f"3. Recommend an appropriate emission factor if possible\n"
+                f"3. Recommend an appropriate emission factor if possible, preferring these reference factors:\n"
+                f"{get_registry().describe()}\n"
                 f"4. Validate the data for completeness and accuracy"
             ),
             expected_output="A detailed classification of the emissions data with scope, "
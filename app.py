@@ -5,11 +5,22 @@ import json
 import shutil
 import time
 from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
 from dotenv import load_dotenv
 import base64
 from io import BytesIO
+from emissions_store import open_store
+from emissions_schema import apply_schema
+from csv_import import bulk_import_csv, import_csv_chunked, upsert_csv
+from dedup_index import DEDUP_MODES, DedupIndex
+from factor_index import FactorIndex, recalculate_for_factors
+from aggregates import EmissionsAggregates, DRILL_HIERARCHIES, PERIOD_GRANULARITIES
+from result_cache import ResultCache
+from shared_dataset import SharedDataset
+from change_feed import ChangeWatcher
+from table_view import SORTABLE_COLUMNS, TableView
+from emission_factors import get_registry
+from units import conversion_factors
+import config
 
 # Load environment variables
 load_dotenv()
@@ -18,57 +29,104 @@ load_dotenv()
 # Ensure data directory exists
 os.makedirs('data', exist_ok=True)
 
+# Row-hash index used to catch duplicate entries and re-imports; kept across reruns
+# so the index file is read once per process, not on every interaction
+@st.cache_resource(show_spinner=False)
+def get_dedup():
+    return DedupIndex()
+
+dedup = get_dedup()
+
+# Reverse index from emission factors to the entries that use them, kept across reruns
+@st.cache_resource(show_spinner=False)
+def get_factor_index():
+    return FactorIndex()
+
+factor_index = get_factor_index()
+
+# Dashboard totals maintained as entries are added and deleted; kept across reruns
+# so they are read from disk once per process, not on every interaction
+@st.cache_resource(show_spinner=False)
+def get_aggregates():
+    return EmissionsAggregates()
+
+aggregates = get_aggregates()
+
+# Emissions data shared by every session of this process instead of a copy per session
+@st.cache_resource(show_spinner=False)
+def get_dataset():
+    return SharedDataset(open_store)
+
+dataset = get_dataset()
+
+# Writes of this process update the shared data and the indexes in place. Data changes written
+# by other processes make the indexes read their files again and bring them in step with the
+# data; the shared dataset and cached figures are keyed on the data version and follow by themselves.
+# The watcher polls from the dashboard fragment, so it waits for writes of this process to finish
+def resync_indexes(version):
+    with dataset.writing():
+        aggregates.invalidate()
+        dedup.invalidate()
+        factor_index.invalidate()
+        emissions_data = dataset.data()
+        dedup.sync(emissions_data)
+        factor_index.sync(emissions_data)
+        aggregates.sync(emissions_data)
+
+@st.cache_resource(show_spinner=False)
+def get_change_watcher():
+    watcher = ChangeWatcher(open_store())
+    watcher.on_external_change(resync_indexes)
+    return watcher
+
+watcher = get_change_watcher()
+watcher.poll()
+
+# Dashboard figures by data version, reused until the data changes
+@st.cache_resource(show_spinner=False)
+def get_chart_cache():
+    return ResultCache()
+
+chart_cache = get_chart_cache()
+
+# Sort orders of the Existing Emissions Data table, shared by sessions viewing the same data
+@st.cache_resource(show_spinner=False)
+def get_table_views():
+    return ResultCache(max_entries=2)
+
+table_views = get_table_views()
+
 # Set page config for wide layout
 st.set_page_config(page_title="Enterprise CarbonScope", page_icon="🌍", layout="wide")
 
 # Initialize session state variables if they don't exist
 if 'language' not in st.session_state:
     st.session_state.language = 'English'
-if 'emissions_data' not in st.session_state:
-    # Load data if exists, otherwise create empty dataframe
-    if os.path.exists('data/emissions.json'):
+# Load data once per process by replaying the snapshot and record log, otherwise create empty dataframe;
+# the first session to get here loads it while the others wait
+with dataset.writing():
+    if dataset.version is None:
         try:
-            with open('data/emissions.json', 'r') as f:
-                data = f.read().strip()
-                if data:  # Check if file is not empty
-                    try:
-                        st.session_state.emissions_data = pd.DataFrame(json.loads(data))
-                    except json.JSONDecodeError:
-                        # Create a backup of the corrupted file
-                        backup_file = f'data/emissions_backup_{int(time.time())}.json'
-                        shutil.copy('data/emissions.json', backup_file)
-                        st.warning(f"Corrupted emissions data file found. A backup has been created at {backup_file}")
-                        # Create empty dataframe
-                        st.session_state.emissions_data = pd.DataFrame(columns=[
-                            'date', 'scope', 'category', 'activity', 'quantity', 
-                            'unit', 'emission_factor', 'emissions_kgCO2e', 'notes'
-                        ])
-                else:
-                    # Empty file, create new DataFrame
-                    st.session_state.emissions_data = pd.DataFrame(columns=[
-                        'date', 'scope', 'category', 'activity', 'quantity', 
-                        'unit', 'emission_factor', 'emissions_kgCO2e', 'notes'
-                    ])
+            emissions_data = dataset.reload()
+            dedup.sync(emissions_data)
+            factor_index.sync(emissions_data)
+            aggregates.sync(emissions_data)
+        except json.JSONDecodeError:
+            # Create a backup of the corrupted file
+            backup_file = f'data/emissions_backup_{int(time.time())}.json'
+            shutil.copy('data/emissions.json', backup_file)
+            st.warning(f"Corrupted emissions data file found. A backup has been created at {backup_file}")
+            # Create empty dataframe
+            dataset.clear()
         except Exception as e:
             st.error(f"Error loading emissions data: {str(e)}")
             # Create empty dataframe if loading fails
-            st.session_state.emissions_data = pd.DataFrame(columns=[
-                'date', 'scope', 'category', 'activity', 'quantity', 
-                'unit', 'emission_factor', 'emissions_kgCO2e', 'notes'
-            ])
-            # Make sure data directory exists
-            os.makedirs('data', exist_ok=True)
-    else:
-        st.session_state.emissions_data = pd.DataFrame(columns=[
-            'date', 'scope', 'category', 'activity', 'quantity', 
-            'unit', 'emission_factor', 'emissions_kgCO2e', 'notes'
-        ])
-        # Make sure data directory exists
-        os.makedirs('data', exist_ok=True)
+            dataset.clear()
 if 'theme' not in st.session_state:
     st.session_state.theme = 'dark'
+# The Dashboard opens first; it reads the aggregates and imports none of the heavy page dependencies
 if 'active_page' not in st.session_state:
-    st.session_state.active_page = "Carbon Insights"
+    st.session_state.active_page = "Dashboard"
 
 # Translation dictionary
 translations = {
@@ -252,45 +310,16 @@ def t(key):
     lang = st.session_state.language
     return translations.get(lang, {}).get(key, key)
 
-# Function to save emissions data
-def save_emissions_data():
-    try:
-        # Create data directory if it doesn't exist
-        os.makedirs('data', exist_ok=True)
-        
-        # Create a backup of the existing file if it exists
-        if os.path.exists('data/emissions.json'):
-            backup_path = 'data/emissions_backup.json'
-            try:
-                with open('data/emissions.json', 'r') as src, open(backup_path, 'w') as dst:
-                    dst.write(src.read())
-            except Exception:
-                # Continue even if backup fails
-                pass
-        
-        # Save data to JSON file with proper formatting
-        with open('data/emissions.json', 'w') as f:
-            if len(st.session_state.emissions_data) > 0:
-                json.dump(st.session_state.emissions_data.to_dict('records'), f, indent=2)
-            else:
-                # Write empty array if no data
-                f.write('[]')
-                
-        return True
-    except Exception as e:
-        st.error(f"Error saving data: {str(e)}")
-        return False
-
 # Function to add new emission entry
-def add_emission_entry(date, business_unit, project, scope, category, activity, country, facility, responsible_person, quantity, unit, emission_factor, data_quality, verification_status, notes):
-    """Add a new emission entry to the emissions data."""
+def add_emission_entry(date, business_unit, project, scope, category, activity, country, facility, responsible_person, quantity, unit, emission_factor, data_quality, verification_status, notes, factor_id=None):
+    """Add a new emission entry to the emissions data; factor_id links it to a registry factor."""
     try:
         # Calculate emissions
         emissions_kgCO2e = float(quantity) * float(emission_factor)
         
         # Create new entry
         new_entry = pd.DataFrame([{
-            'date': date.strftime('%Y-%m-%d'),
+            'date': pd.Timestamp(date),
             'business_unit': business_unit,
             'project': project,
             'scope': scope,
@@ -305,101 +334,140 @@ def add_emission_entry(date, business_unit, project, scope, category, activity,
             'emissions_kgCO2e': emissions_kgCO2e,
             'data_quality': data_quality,
             'verification_status': verification_status,
-            'notes': notes
+            'notes': notes,
+            'factor_id': factor_id
         }])
         
-        # Add to existing data
-        st.session_state.emissions_data = pd.concat([st.session_state.emissions_data, new_entry], ignore_index=True)
-        
-        # Save data and return success/failure
-        return save_emissions_data()
+        # The duplicate check, the write and the index updates run as one write,
+        # so sessions adding the same entry at once cannot both pass the check
+        with dataset.writing():
+            # Skip or merge entries that duplicate an existing one
+            new_entry, duplicates = dedup.deduplicate(apply_schema(new_entry), config.DEDUP_MODE)
+            if len(new_entry) == 0:
+                st.warning("An identical entry already exists, so this one was not added.")
+                return False
+            
+            # Log the entry; the shared data gets it too (replacing it if it updates an existing entry)
+            new_entry = dataset.append(new_entry)
+            dedup.add(new_entry)
+            factor_index.add(new_entry)
+            aggregates.add(new_entry)
+        return True
     except Exception as e:
         st.error(f"Error adding entry: {str(e)}")
         return False
 
 def delete_emission_entry(index):
     try:
-        # Make a copy of the current data
-        if len(st.session_state.emissions_data) > index:
-            # Drop the row at the specified index
-            st.session_state.emissions_data = st.session_state.emissions_data.drop(index).reset_index(drop=True)
-            
-            # Save data and return success/failure
-            return save_emissions_data()
-        else:
-            st.error("Invalid index for deletion")
-            return False
+        with dataset.writing():
+            emissions_data = dataset.data()
+            if len(emissions_data) > index:
+                # Log the deletion; the shared data drops the row at the specified index
+                row = emissions_data.loc[index]
+                dataset.delete([row['entry_id']], dates=[row['date']])
+                dedup.remove([row['entry_id']])
+                factor_index.remove([row['entry_id']])
+                aggregates.remove([row['entry_id']])
+                return True
+        st.error("Invalid index for deletion")
+        return False
     except Exception as e:
         st.error(f"Error deleting entry: {str(e)}")
         return False
 
+# Function to show the rows rejected by CSV validation
+def show_validation_errors(errors):
+    """Show the per-row validation error table; returns True when there were no errors."""
+    if len(errors) == 0:
+        return True
+    st.warning(f"{errors['row'].nunique()} rows failed validation and were quarantined. Valid rows were imported.")
+    st.dataframe(errors, use_container_width=True, hide_index=True)
+    return False
+
 # Function to process uploaded CSV
-def process_csv(uploaded_file):
-    """Process uploaded CSV file and add to emissions data."""
+def process_csv(uploaded_file, dedup_mode=config.DEDUP_MODE, resolve_factors=False):
+    """Import uploaded CSV file chunk by chunk and add it to emissions data."""
     try:
-        # Read CSV file
-        df = pd.read_csv(uploaded_file)
-        required_columns = ['date', 'scope', 'category', 'activity', 'quantity', 'unit', 'emission_factor']
-        
-        # Check if all required columns exist
-        if not all(col in df.columns for col in required_columns):
-            st.error(f"CSV must contain all required columns: {', '.join(required_columns)}")
-            return False
-        
-        # Validate data types
-        try:
-            # Convert quantity and emission_factor to float
-            df['quantity'] = df['quantity'].astype(float)
-            df['emission_factor'] = df['emission_factor'].astype(float)
+        progress = st.progress(0.0, text="Importing CSV...")
+        # The import writes through the shared data and updates the indexes, so it runs as one write of it
+        with dataset.writing():
+            success, message, _, errors = import_csv_chunked(
+                dataset,
+                uploaded_file,
+                progress_callback=lambda fraction, rows: progress.progress(fraction, text=f"Imported {rows} rows..."),
+                dedup=dedup,
+                dedup_mode=dedup_mode,
+                resolve_factors=resolve_factors,
+                aggregates=aggregates,
+                factor_index=factor_index
+            )
+            progress.empty()
             
-            # Validate dates
-            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-        except Exception as e:
-            st.error(f"Data validation error: {str(e)}")
-            return False
-        
-        # Calculate emissions if not provided
-        if 'emissions_kgCO2e' not in df.columns:
-            df['emissions_kgCO2e'] = df['quantity'] * df['emission_factor']
-        
-        # Add enterprise fields if not present
-        enterprise_fields = {
-            'business_unit': 'Corporate',
-            'project': 'Not Applicable',
-            'country': 'India',
-            'facility': '',
-            'responsible_person': '',
-            'data_quality': 'Medium',
-            'verification_status': 'Unverified',
-            'notes': ''
-        }
-        
-        # Add missing columns with default values
-        for field, default_value in enterprise_fields.items():
-            if field not in df.columns:
-                df[field] = default_value
-        
-        # Append to existing data
-        st.session_state.emissions_data = pd.concat([st.session_state.emissions_data, df], ignore_index=True)
-        
-        # Save data
-        if save_emissions_data():
-            st.success(f"Successfully added {len(df)} entries")
-            return True
-        else:
-            st.error("Failed to save data")
-            return False
+            if not success:
+                st.error(message)
+                return False
+        st.success(message)
+        return show_validation_errors(errors)
     except Exception as e:
         st.error(f"Error processing CSV: {str(e)}")
         return False
 
+# Function to apply uploaded corrected CSVs to existing entries
+def process_csv_upsert(uploaded_files, key_columns, delete_missing, resolve_factors=False):
+    """Apply each uploaded CSV as a diff of inserts, updates and deletes against existing entries."""
+    try:
+        all_valid = True
+        with dataset.writing():
+            for uploaded_file in uploaded_files:
+                success, message, _, errors = upsert_csv(
+                    dataset, uploaded_file, key_columns=key_columns, delete_missing=delete_missing, dedup=dedup,
+                    resolve_factors=resolve_factors, aggregates=aggregates, factor_index=factor_index
+                )
+                if not success:
+                    st.error(f"{uploaded_file.name}: {message}")
+                    all_valid = False
+                    continue
+                st.success(f"{uploaded_file.name}: {message}")
+                all_valid = show_validation_errors(errors) and all_valid
+        return all_valid
+    except Exception as e:
+        st.error(f"Error applying CSV correction: {str(e)}")
+        return False
+
+# Function to process several uploaded CSVs at once
+def process_csv_bulk(uploaded_files, dedup_mode=config.DEDUP_MODE, resolve_factors=False):
+    """Ingest several uploaded CSV files in parallel and add them to emissions data in one commit."""
+    try:
+        progress = st.progress(0.0, text="Importing CSV files...")
+        with dataset.writing():
+            success, message, _, errors = bulk_import_csv(
+                dataset,
+                uploaded_files,
+                progress_callback=lambda fraction, files: progress.progress(fraction, text=f"Processed {files} of {len(uploaded_files)} files..."),
+                dedup=dedup,
+                dedup_mode=dedup_mode,
+                resolve_factors=resolve_factors,
+                aggregates=aggregates,
+                factor_index=factor_index
+            )
+            progress.empty()
+            
+            if not success:
+                st.error(message)
+                return False
+        st.success(message)
+        return show_validation_errors(errors)
+    except Exception as e:
+        st.error(f"Error processing CSV files: {str(e)}")
+        return False
+
 # Function to generate PDF report
 def generate_report():
     # Create a BytesIO object
     buffer = BytesIO()
     
     # Create a simple CSV report for now
-    st.session_state.emissions_data.to_csv(buffer, index=False)
+    dataset.data().to_csv(buffer, index=False)
     buffer.seek(0)
     
     return buffer
@@ -744,6 +812,64 @@ def card(content, title=None):
     else:
         st.markdown(f"<div class='stCard'>{content}</div>", unsafe_allow_html=True)
 
+# Dashboard figures, built from aggregate totals; plotly loads on the first chart, not at start-up
+def scope_pie_figure(scope_data):
+    import plotly.express as px
+    
+    fig = px.pie(
+        scope_data, 
+        values='emissions_kgCO2e', 
+        names='scope', 
+        color='scope', 
+        color_discrete_map={'Scope 1': '#2E7D32', 'Scope 2': '#1565C0', 'Scope 3': '#FFB300'},
+        hole=0.4
+    )
+    fig.update_layout(
+        margin=dict(t=0, b=0, l=0, r=0),
+        legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
+        height=400
+    )
+    return fig
+
+def category_bar_figure(category_data):
+    import plotly.express as px
+    
+    fig = px.bar(
+        category_data, 
+        x='category', 
+        y='emissions_kgCO2e', 
+        color='category',
+        color_discrete_sequence=px.colors.qualitative.Set2,
+        labels={'emissions_kgCO2e': 'Emissions (kgCO2e)', 'category': 'Category'}
+    )
+    fig.update_layout(
+        showlegend=False,
+        margin=dict(t=0, b=0, l=0, r=0),
+        height=400
+    )
+    return fig
+
+def time_series_figure(time_data):
+    import plotly.express as px
+    
+    fig = px.line(
+        time_data, 
+        x='month', 
+        y='emissions_kgCO2e', 
+        color='scope', 
+        markers=True,
+        color_discrete_map={'Scope 1': '#4CAF50', 'Scope 2': '#2196F3', 'Scope 3': '#FFC107'},
+        labels={'emissions_kgCO2e': 'Emissions (kgCO2e)', 'month': 'Month', 'scope': 'Scope'}
+    )
+    fig.update_layout(
+        margin=dict(t=0, b=0, l=0, r=0),
+        xaxis_title="",
+        yaxis_title="kgCO2e",
+        legend_title="",
+        height=400
+    )
+    return fig
+
 # Apply custom CSS
 local_css()
 
@@ -773,21 +899,26 @@ with st.sidebar:
         unsafe_allow_html=True
     )
 
+# Data version this session last drew
+st.session_state.seen_version = watcher.version
+
+@st.fragment(run_every=config.CHANGE_POLL_SECONDS)
+def refresh_on_change():
+    """Rerun the page when the data changed since this session drew it."""
+    watcher.poll()
+    if watcher.version != st.session_state.seen_version:
+        st.rerun()
+
 # Main content
 if st.session_state.active_page == "Dashboard":
     st.markdown(f"<h1> {t('dashboard')}</h1>", unsafe_allow_html=True)
+    refresh_on_change()
     
-    if len(st.session_state.emissions_data) == 0:
+    if len(dataset.data()) == 0:
         st.markdown(f"<div class='info-box'>{t('welcome_message')}</div>", unsafe_allow_html=True)
     else:
-        # Calculate metrics
-        # Ensure emissions_kgCO2e is numeric
-        st.session_state.emissions_data['emissions_kgCO2e'] = pd.to_numeric(st.session_state.emissions_data['emissions_kgCO2e'], errors='coerce')
-        
-        # Replace NaN with 0
-        st.session_state.emissions_data['emissions_kgCO2e'].fillna(0, inplace=True)
-        
-        total_emissions = st.session_state.emissions_data['emissions_kgCO2e'].sum()
+        # Metrics and charts read the precomputed aggregates instead of scanning the data
+        total_emissions = aggregates.total()
         
         # Display metrics
         col1, col2, col3 = st.columns(3)
@@ -799,47 +930,62 @@ if st.session_state.active_page == "Dashboard":
                 icon="🌍"
             )
         with col2:
-            if 'date' in st.session_state.emissions_data.columns:
-                st.session_state.emissions_data['date'] = pd.to_datetime(st.session_state.emissions_data['date'], errors='coerce')
-                if not st.session_state.emissions_data['date'].isnull().all():
-                    latest_date = st.session_state.emissions_data['date'].max().strftime('%Y-%m-%d')
-                else:
-                    latest_date = "No date data"
-                metric_card(
-                    title="Latest Entry",
-                    value=latest_date,
-                    icon="📅"
-                )
+            latest = aggregates.latest_date()
+            latest_date = latest.strftime('%Y-%m-%d') if latest is not None else "No date data"
+            metric_card(
+                title="Latest Entry",
+                value=latest_date,
+                icon="📅"
+            )
         with col3:
-            entry_count = len(st.session_state.emissions_data)
+            entry_count = len(aggregates)
             metric_card(
                 title="Total Entries",
                 value=str(entry_count),
                 icon="📊"
             )
         
+        # Period totals come from the prefix-sum date index, not from the rows
+        st.markdown("<h2>Period Totals</h2>", unsafe_allow_html=True)
+        today = pd.Timestamp(datetime.now().date())
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            period_choice = st.selectbox("Period", ["Year to Date", "Last 12 Months", "Custom"], key="period_totals_choice")
+        if period_choice == "Year to Date":
+            period_start, period_end = today.replace(month=1, day=1), today
+        elif period_choice == "Last 12 Months":
+            period_start, period_end = today - pd.DateOffset(years=1) + pd.Timedelta(days=1), today
+        else:
+            with col2:
+                period_range = st.date_input("Date Range", (today - pd.DateOffset(months=3), today), key="period_totals_range")
+            if len(period_range) != 2:
+                period_range = (period_range[0], period_range[0])
+            period_start, period_end = pd.Timestamp(period_range[0]), pd.Timestamp(period_range[1])
+        period_scopes = aggregates.period_totals(period_start, period_end, by='scope')
+        period_columns = st.columns(len(period_scopes) + 1)
+        with period_columns[0]:
+            metric_card(
+                title=f"{period_start.strftime('%Y-%m-%d')} to {period_end.strftime('%Y-%m-%d')}",
+                value=f"{period_scopes['emissions_kgCO2e'].sum():.2f}",
+                suffix=" kgCO2e",
+                icon="🗓️"
+            )
+        for period_column, (_, row) in zip(period_columns[1:], period_scopes.iterrows()):
+            with period_column:
+                metric_card(title=row['scope'], value=f"{row['emissions_kgCO2e']:.2f}", suffix=" kgCO2e")
+        
         # Charts
         st.markdown(f"<h2>{t('emissions_by_scope')}</h2>", unsafe_allow_html=True)
         
         # Check if there are any non-zero emissions before creating charts
         if total_emissions > 0:
             # Create scope data for pie chart
-            scope_data = st.session_state.emissions_data.groupby('scope')['emissions_kgCO2e'].sum().reset_index()
+            scope_data = aggregates.by('scope')
             
             # Only create chart if we have data with emissions
             if not scope_data.empty and scope_data['emissions_kgCO2e'].sum() > 0:
-                fig1 = px.pie(
-                    scope_data, 
-                    values='emissions_kgCO2e', 
-                    names='scope', 
-                    color='scope', 
-                    color_discrete_map={'Scope 1': '#2E7D32', 'Scope 2': '#1565C0', 'Scope 3': '#FFB300'},
-                    hole=0.4
-                )
-                fig1.update_layout(
-                    margin=dict(t=0, b=0, l=0, r=0),
-                    legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
-                    height=400
+                fig1 = chart_cache.get_or_compute(
+                    (dataset.data_version, 'dashboard_scope_pie'), lambda: scope_pie_figure(scope_data)
                 )
                 st.plotly_chart(fig1, use_container_width=True, config={'displayModeBar': False})
             else:
@@ -854,23 +1000,13 @@ if st.session_state.active_page == "Dashboard":
             
             if total_emissions > 0:
                 # Create category data for bar chart
-                category_data = st.session_state.emissions_data.groupby('category')['emissions_kgCO2e'].sum().reset_index()
+                category_data = aggregates.by('category')
                 category_data = category_data.sort_values('emissions_kgCO2e', ascending=False)
                 
                 # Only create chart if we have data with emissions
                 if not category_data.empty and category_data['emissions_kgCO2e'].sum() > 0:
-                    fig2 = px.bar(
-                        category_data, 
-                        x='category', 
-                        y='emissions_kgCO2e', 
-                        color='category',
-                        color_discrete_sequence=px.colors.qualitative.Set2,
-                        labels={'emissions_kgCO2e': 'Emissions (kgCO2e)', 'category': 'Category'}
-                    )
-                    fig2.update_layout(
-                        showlegend=False,
-                        margin=dict(t=0, b=0, l=0, r=0),
-                        height=400
+                    fig2 = chart_cache.get_or_compute(
+                        (dataset.data_version, 'dashboard_category_bar'), lambda: category_bar_figure(category_data)
                     )
                     st.plotly_chart(fig2, use_container_width=True, config={'displayModeBar': False})
                 else:
@@ -881,38 +1017,16 @@ if st.session_state.active_page == "Dashboard":
         with col2:
             st.markdown(f"<h2>{t('emissions_over_time')}</h2>", unsafe_allow_html=True)
             
-            if total_emissions > 0 and 'date' in st.session_state.emissions_data.columns:
-                # Convert date column to datetime
-                time_data = st.session_state.emissions_data.copy()
-                time_data['date'] = pd.to_datetime(time_data['date'], errors='coerce')
-                
-                # Filter out rows with invalid dates
-                time_data = time_data.dropna(subset=['date'])
+            if total_emissions > 0:
+                # Monthly totals per scope, without entries that have no valid date
+                time_data = aggregates.by('month_scope')
+                time_data = time_data[time_data['month'] != '']
                 
                 if not time_data.empty:
-                    # Create month column for aggregation
-                    time_data['month'] = time_data['date'].dt.strftime('%Y-%m')
-                    
-                    # Group by month and scope
-                    time_data = time_data.groupby(['month', 'scope'])['emissions_kgCO2e'].sum().reset_index()
-                    
                     if len(time_data['month'].unique()) > 0:
                         # Create line chart
-                        fig3 = px.line(
-                            time_data, 
-                            x='month', 
-                            y='emissions_kgCO2e', 
-                            color='scope', 
-                            markers=True,
-                            color_discrete_map={'Scope 1': '#4CAF50', 'Scope 2': '#2196F3', 'Scope 3': '#FFC107'},
-                            labels={'emissions_kgCO2e': 'Emissions (kgCO2e)', 'month': 'Month', 'scope': 'Scope'}
-                        )
-                        fig3.update_layout(
-                            margin=dict(t=0, b=0, l=0, r=0),
-                            xaxis_title="",
-                            yaxis_title="kgCO2e",
-                            legend_title="",
-                            height=400
+                        fig3 = chart_cache.get_or_compute(
+                            (dataset.data_version, 'dashboard_time_series'), lambda: time_series_figure(time_data)
                         )
                         st.plotly_chart(fig3, use_container_width=True, config={'displayModeBar': False})
                     else:
@@ -921,6 +1035,40 @@ if st.session_state.active_page == "Dashboard":
                     st.info("No valid date data available for time series chart.")
             else:
                 st.info("No emissions data available for time series chart.")
+        
+        # Drill down through the rollup cube; each level is one query over the cube's cells
+        st.markdown("<h2>Drill Down</h2>", unsafe_allow_html=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            hierarchy_name = st.selectbox("Breakdown", list(DRILL_HIERARCHIES), format_func=str.title, key="drill_hierarchy")
+        with col2:
+            period = st.selectbox("Period", PERIOD_GRANULARITIES, format_func=str.title, key="drill_period")
+        periods = [value for value in aggregates.rollup(['period'], period=period)['period'] if value]
+        selected_period = st.selectbox("Reporting Period", ["All"] + periods[::-1], key=f"drill_{period}")
+        where = {} if selected_period == "All" else {'period': selected_period}
+        
+        hierarchy = DRILL_HIERARCHIES[hierarchy_name]
+        path = []
+        level_columns = st.columns(len(hierarchy))
+        for level, level_column in zip(hierarchy, level_columns):
+            options = aggregates.drill_down(hierarchy, path, where, period)[level].tolist()
+            with level_column:
+                choice = st.selectbox(
+                    level.replace('_', ' ').title(), ["All"] + options,
+                    format_func=lambda value: value or "(not set)", key=f"drill_{hierarchy_name}_{level}"
+                )
+            if choice == "All":
+                break
+            path.append(choice)
+        
+        if len(path) < len(hierarchy):
+            level_data = aggregates.drill_down(hierarchy, path, where, period)
+            level_data = level_data.sort_values('emissions_kgCO2e', ascending=False)
+            level_data[hierarchy[len(path)]] = level_data[hierarchy[len(path)]].replace('', "(not set)")
+            st.dataframe(level_data, use_container_width=True, hide_index=True)
+        else:
+            totals = aggregates.rollup([], dict(where, **dict(zip(hierarchy, path))), period)
+            st.metric("Emissions (kgCO2e)", f"{totals['emissions_kgCO2e'].iloc[0]:,.2f}")
 
 elif st.session_state.active_page == "Data Entry":
     st.markdown(f"<h1> {t('data_entry')}</h1>", unsafe_allow_html=True)
@@ -1023,9 +1171,10 @@ elif st.session_state.active_page == "Data Entry":
                 }
                 activity_key = category if category != 'Other' else 'Other'
                 activity_list = activity_options.get(activity_key, ['Custom Activity', 'Other'])
+                # Activities with a specific factor in the registry come first
                 activity = st.selectbox(
                     "Activity", 
-                    activity_options.get(category, ['Other']),
+                    list(dict.fromkeys(get_registry().activities(category) + activity_options.get(category, ['Other']))),
                     help="Specific activity that generated the emissions"
                 )
                 if activity == 'Other':
@@ -1049,20 +1198,17 @@ elif st.session_state.active_page == "Data Entry":
                 if unit == 'Other':
                     unit = st.text_input(t('custom_unit'), placeholder="Enter custom unit")
                     
-                # Emission factor auto-population based on country and category
-                emission_factors = {
-                    'India': {
-                        'Electricity': 0.82, 'Mobile Combustion': 2.31, 'Stationary Combustion': 1.85, 'Other': 0.0
-                    },
-                    'United States': {
-                        'Electricity': 0.42,
-                        'Mobile Combustion': 2.32,
-                        'Stationary Combustion': 2.01,
-                        'Business Travel': 0.12,
-                        'Employee Commuting': 0.15
-                    }
-                }
-                default_factor = emission_factors.get(country, {}).get(category, 0.0) if country != 'Other' else 0.0
+                # Emission factor auto-population from the factor registry (activity and country specific, in force on the date)
+                suggested = get_registry().lookup(category, activity, country if country != 'Other' else None, date)
+                default_factor = suggested["factor"] if suggested else 0.0
+                if suggested and suggested["unit"] and suggested["unit"] != unit:
+                    # Express the factor per the selected unit, e.g. per MWh for a factor given per kWh
+                    per_unit = conversion_factors([unit], [suggested["unit"]])[0]
+                    if pd.isna(per_unit):
+                        st.warning(f"{unit} cannot be converted to {suggested['unit']}, the unit this activity's emission factor is given in.")
+                        default_factor = 0.0
+                    else:
+                        default_factor = suggested["factor"] * per_unit
                 
                 # Now that default_factor is defined, show AI suggestion
                 st.info(f"💡 AI Suggestion: Based on your selections, a typical emission factor for {category} in {country} would be around {default_factor:.4f} kgCO2e per unit.")
@@ -1133,29 +1279,79 @@ elif st.session_state.active_page == "Data Entry":
                         cost_value = cost if 'cost' in locals() and cost > 0 else 0.0
                         currency_value = currency if 'currency' in locals() and cost > 0 else ""
                         
-                        add_emission_entry(
+                        # Link the entry to the registry factor when the suggested value was kept
+                        factor_id = suggested["factor_id"] if suggested and emission_factor == default_factor else None
+                        if add_emission_entry(
                             date, business_unit, project, scope, category, activity, country, facility,
-                            responsible_person, quantity, unit, emission_factor, data_quality, verification_status, notes
-                        )
-                        st.success(t('entry_added'))
-                        # Redirect to Dashboard after successful entry
-                        st.session_state.active_page = "Dashboard"
-                        st.rerun()
+                            responsible_person, quantity, unit, emission_factor, data_quality, verification_status, notes,
+                            factor_id
+                        ):
+                            st.success(t('entry_added'))
+                            # Redirect to Dashboard after successful entry
+                            st.session_state.active_page = "Dashboard"
+                            st.rerun()
                     except Exception as e:
                         st.error(f"{t('entry_failed')} {str(e)}")
     
     # Show existing data table
-    if len(st.session_state.emissions_data) > 0:
+    emissions_data = dataset.data()
+    if len(emissions_data) > 0:
         st.markdown("<h3>Existing Emissions Data</h3>", unsafe_allow_html=True)
         
-        # Create a copy of the dataframe with an action column
-        display_df = st.session_state.emissions_data.copy()
+        # Sorting, filtering and paging run on the server; only the visible page is sent to the browser
+        view = table_views.get_or_compute(id(emissions_data), lambda: TableView(emissions_data))
+        
+        filter_cols = st.columns(4)
+        with filter_cols[0]:
+            table_scope = st.selectbox("Scope", ["All"] + view.options('scope'), key="table_scope")
+        with filter_cols[1]:
+            table_category = st.selectbox("Category", ["All"] + view.options('category'), key="table_category")
+        with filter_cols[2]:
+            table_facility = st.selectbox("Facility", ["All"] + view.options('facility'), key="table_facility")
+        with filter_cols[3]:
+            table_search = st.text_input("Activity contains", key="table_search")
+        
+        sort_cols = st.columns(4)
+        with sort_cols[0]:
+            table_sort = st.selectbox(
+                "Sort by", ["Entry order"] + SORTABLE_COLUMNS,
+                format_func=lambda column: column.replace('_', ' ').title() if column != 'emissions_kgCO2e' else "Emissions (kgCO2e)",
+                key="table_sort"
+            )
+        with sort_cols[1]:
+            table_descending = st.toggle("Descending", value=True, key="table_descending")
+        with sort_cols[2]:
+            page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1, key="table_page_size")
+        
+        table_filters = {
+            'scope': None if table_scope == "All" else table_scope,
+            'category': None if table_category == "All" else table_category,
+            'facility': None if table_facility == "All" else table_facility,
+        }
+        table_search = table_search.strip() or None
+        matching = view.count(table_filters, table_search)
+        page_count = max(1, -(-matching // page_size))
+        with sort_cols[3]:
+            page_number = min(st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key="table_page"), page_count)
+        display_df, _ = view.page(
+            sort_by=None if table_sort == "Entry order" else table_sort,
+            ascending=not table_descending,
+            filters=table_filters,
+            search=table_search,
+            page=page_number - 1,
+            page_size=page_size
+        )
+        first_row = (page_number - 1) * page_size
+        st.caption(
+            f"Showing {first_row + 1 if matching else 0:,}-{first_row + len(display_df):,} "
+            f"of {matching:,} matching entries ({len(view):,} in total)"
+        )
         
         # Add a column for the delete action
         col1, col2 = st.columns([3, 1])
         
         with col1:
-            # Display the dataframe
+            # Display the current page; the index is the entry number used for deletion
             st.dataframe(
                 display_df,
                 column_config={
@@ -1175,6 +1371,8 @@ elif st.session_state.active_page == "Data Entry":
                     "data_quality": st.column_config.TextColumn("Data Quality"),
                     "verification_status": st.column_config.TextColumn("Verification"),
                     "notes": st.column_config.TextColumn("Notes"),
+                    "entry_id": None,
+                    "factor_id": None,
                 },
                 use_container_width=True,
                 hide_index=False
@@ -1184,7 +1382,7 @@ elif st.session_state.active_page == "Data Entry":
             # Add delete functionality
             st.markdown("### Delete Entry")
             entry_to_delete = st.number_input("Select entry number to delete", min_value=0, 
-                                           max_value=len(display_df)-1 if len(display_df) > 0 else 0, 
+                                           max_value=len(emissions_data)-1 if len(emissions_data) > 0 else 0, 
                                            step=1, 
                                            help="Enter the index number of the entry you want to delete")
             
@@ -1199,15 +1397,60 @@ elif st.session_state.active_page == "Data Entry":
     with tabs[1]:
         st.markdown("<h3>Upload CSV File</h3>", unsafe_allow_html=True)
         
-        uploaded_file = st.file_uploader(t('upload_csv'), type='csv')
-        if uploaded_file is not None:
-            if process_csv(uploaded_file):
+        uploaded_files = st.file_uploader(
+            t('upload_csv'),
+            type='csv',
+            accept_multiple_files=True,
+            help="Select several files (e.g. one per facility) to ingest them in parallel"
+        )
+        import_mode = st.radio(
+            "Import Mode",
+            ["Append new entries", "Apply correction (upsert)"],
+            horizontal=True,
+            help="A correction matches rows to existing entries on a key and only writes what changed"
+        )
+        if import_mode == "Append new entries":
+            dedup_mode = st.selectbox(
+                "Duplicate Handling",
+                list(DEDUP_MODES),
+                index=list(DEDUP_MODES).index(config.DEDUP_MODE),
+                format_func=lambda mode: DEDUP_MODES[mode],
+                help="Rows matching an existing entry on date, scope, category, activity, facility, quantity, unit and factor are duplicates"
+            )
+        else:
+            key_columns = st.multiselect(
+                "Match Entries On",
+                ['date', 'business_unit', 'project', 'scope', 'category', 'activity', 'country', 'facility', 'notes'],
+                default=config.UPSERT_KEY_COLUMNS,
+                help="Columns identifying the same entry across exports, e.g. facility, activity, date and an invoice id in notes"
+            )
+            delete_missing = st.checkbox(
+                "Delete entries missing from the file",
+                value=True,
+                help="Only entries within the file's date range and facilities are considered"
+            )
+        resolve_factors = st.checkbox(
+            "Look up missing emission factors",
+            value=False,
+            help="Rows without an emission_factor get one from the factor registry by category, activity, country and year; rows with no match are quarantined"
+        )
+        if uploaded_files:
+            if import_mode != "Append new entries":
+                if not key_columns:
+                    st.error("Select at least one column to match entries on.")
+                    imported = False
+                else:
+                    imported = process_csv_upsert(uploaded_files, key_columns, delete_missing, resolve_factors)
+            elif len(uploaded_files) == 1:
+                imported = process_csv(uploaded_files[0], dedup_mode, resolve_factors)
+            else:
+                imported = process_csv_bulk(uploaded_files, dedup_mode, resolve_factors)
+            # Stay on the page when rows were rejected so the error report stays visible
+            if imported:
                 st.success(t('csv_uploaded'))
                 # Redirect to Dashboard after successful upload
                 st.session_state.active_page = "Dashboard"
                 st.rerun()
-            else:
-                st.error("Failed to process CSV file. Please check the format.")
         
         # Sample CSV download with enterprise-grade fields
         sample_data = {
@@ -1273,16 +1516,43 @@ elif st.session_state.active_page == "Settings":
         submitted = st.form_submit_button("Save Settings")
         if submitted:
             st.success("Settings saved successfully!")
+    
+    st.markdown("<h3>Emission Factor Updates</h3>", unsafe_allow_html=True)
+    factor_file = st.file_uploader(
+        "Upload updated emission factors (CSV)",
+        type='csv',
+        help="Columns: category, activity, factor and optionally country, year, unit, source. "
+             "Entries that use a changed factor are recalculated."
+    )
+    if factor_file is not None and st.button("Apply Factor Update", type="primary"):
+        try:
+            factor_table = pd.read_csv(factor_file)
+            changes = get_registry().update(factor_table, source=os.path.splitext(factor_file.name)[0])
+            # Keep the table so the registry includes it after a restart; later uploads sort last
+            os.makedirs(config.FACTOR_TABLES_DIR, exist_ok=True)
+            factor_table.to_csv(os.path.join(config.FACTOR_TABLES_DIR, f"{int(time.time())}_{factor_file.name}"), index=False)
+            
+            # Recalculated rows are written through the shared data, which takes them in place
+            with dataset.writing():
+                updated, summary = recalculate_for_factors(dataset, factor_index, changes)
+                dedup.add(updated)
+                aggregates.add(updated)
+            st.success(f"{len(changes)} factors changed, {len(updated)} entries recalculated.")
+            if len(summary) > 0:
+                st.metric("Change in Total Emissions", f"{summary['delta'].sum():,.2f} kgCO2e")
+                st.dataframe(summary, use_container_width=True, hide_index=True)
+        except Exception as e:
+            st.error(f"Error applying factor update: {str(e)}")
 
 elif st.session_state.active_page == "Carbon Insights":
     st.markdown(f"<h1>✨ Carbon Insights</h1>", unsafe_allow_html=True)
     
-    # Import AI agents
-    from ai_agents import CarbonScopeAgents
-    
-    # Initialize AI agents
-    if 'ai_agents' not in st.session_state:
-        st.session_state.ai_agents = CarbonScopeAgents()
+    # The agents import crewai, so they are created when a crew first runs rather than when the page opens
+    def get_ai_agents():
+        if 'ai_agents' not in st.session_state:
+            from ai_agents import CarbonScopeAgents
+            st.session_state.ai_agents = CarbonScopeAgents()
+        return st.session_state.ai_agents
     
     # Create tabs for different Carbon insights
     ai_tabs = st.tabs(["Data Assistant", "Report Summary", "Offset Advisor", "Regulation Radar", "Emission Optimizer"])
@@ -1298,7 +1568,7 @@ elif st.session_state.active_page == "Carbon Insights":
             if data_description:
                 with st.spinner("AI assistant is analyzing your request..."):
                     try:
-                        result = st.session_state.ai_agents.run_data_entry_crew(data_description)
+                        result = get_ai_agents().run_data_entry_crew(data_description)
                         # Handle CrewOutput object by converting it to string
                         result_str = str(result)
                         st.markdown(f"<div class='stCard'>{result_str}</div>", unsafe_allow_html=True)
@@ -1311,15 +1581,15 @@ elif st.session_state.active_page == "Carbon Insights":
         st.markdown("<h3>Report Summary Generator</h3>", unsafe_allow_html=True)
         st.markdown("Generate a human-readable summary of your emissions data.")
         
-        if len(st.session_state.emissions_data) == 0:
+        if len(dataset.data()) == 0:
             st.warning("No emissions data available. Please add data first.")
         else:
             if st.button("Generate Summary", key="report_summary_btn"):
                 with st.spinner("Generating report summary..."):
                     try:
                         # Convert DataFrame to string representation for the AI
-                        emissions_str = st.session_state.emissions_data.to_string()
-                        result = st.session_state.ai_agents.run_report_summary_crew(emissions_str)
+                        emissions_str = dataset.data().to_string()
+                        result = get_ai_agents().run_report_summary_crew(emissions_str)
                         # Handle CrewOutput object by converting it to string
                         result_str = str(result)
                         st.markdown(f"<div class='stCard'>{result_str}</div>", unsafe_allow_html=True)
@@ -1335,17 +1605,17 @@ elif st.session_state.active_page == "Carbon Insights":
             location = st.text_input("Location", placeholder="e.g., Mumbai, India")
             industry = st.selectbox("Industry", ["Manufacturing", "Technology", "Agriculture", "Transportation", "Energy", "Services", "Other"])
         
-        if len(st.session_state.emissions_data) == 0:
+        if len(dataset.data()) == 0:
             st.warning("No emissions data available. Please add data first.")
         else:
-            total_emissions = st.session_state.emissions_data['emissions_kgCO2e'].sum()
+            total_emissions = dataset.data()['emissions_kgCO2e'].sum()
             st.markdown(f"<p>Total emissions to offset: <strong>{total_emissions:.2f} kgCO2e</strong></p>", unsafe_allow_html=True)
             
             if st.button("Get Offset Recommendations", key="offset_advisor_btn"):
                 if location:
                     with st.spinner("Finding offset options..."):
                         try:
-                            result = st.session_state.ai_agents.run_offset_advice_crew(total_emissions, location, industry)
+                            result = get_ai_agents().run_offset_advice_crew(total_emissions, location, industry)
                             # Handle CrewOutput object by converting it to string
                             result_str = str(result)
                             st.markdown(f"<div class='stCard'>{result_str}</div>", unsafe_allow_html=True)
@@ -1369,7 +1639,7 @@ elif st.session_state.active_page == "Carbon Insights":
             if location and len(export_markets) > 0:
                 with st.spinner("Analyzing regulatory requirements..."):
                     try:
-                        result = st.session_state.ai_agents.run_regulation_check_crew(location, industry, ", ".join(export_markets))
+                        result = get_ai_agents().run_regulation_check_crew(location, industry, ", ".join(export_markets))
                         # Handle CrewOutput object by converting it to string
                         result_str = str(result)
                         st.markdown(f"<div class='stCard'>{result_str}</div>", unsafe_allow_html=True)
@@ -1382,15 +1652,15 @@ elif st.session_state.active_page == "Carbon Insights":
         st.markdown("<h3>Emission Optimizer</h3>", unsafe_allow_html=True)
         st.markdown("Get AI-powered recommendations to reduce enterprise carbon footprint.")
         
-        if len(st.session_state.emissions_data) == 0:
+        if len(dataset.data()) == 0:
             st.warning("No emissions data available. Please add data first.")
         else:
             if st.button("Generate Optimization Recommendations", key="emission_optimizer_btn"):
                 with st.spinner("Analyzing your emissions data..."):
                     try:
                         # Convert DataFrame to string representation for the AI
-                        emissions_str = st.session_state.emissions_data.to_string()
-                        result = st.session_state.ai_agents.run_optimization_crew(emissions_str)
+                        emissions_str = dataset.data().to_string()
+                        result = get_ai_agents().run_optimization_crew(emissions_str)
                         # Handle CrewOutput object by converting it to string
                         result_str = str(result)
                         st.markdown(f"<div class='stCard'>{result_str}</div>", unsafe_allow_html=True)
@@ -0,0 +1,116 @@
+"""
+Summary benchmark for Enterprise CarbonScope application.
+Compares the former iterrows-based monthly time series of
+get_emissions_summary with the vectorized period pivot and with reading
+the summary from the aggregate store, on synthetic data.
+
+Usage:
+    python benchmark_summary.py [--rows 1000000] [--repeat 3]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregates import EmissionsAggregates, time_series
+from emissions_schema import apply_schema
+
+
+def synthetic_emissions(rows, seed=0):
+    """
+    Generate typed emissions rows spread over five years.
+
+    Args:
+        rows (int): Number of rows
+        seed (int, optional): Random seed
+
+    Returns:
+        pandas.DataFrame: Emissions data
+    """
+    rng = np.random.default_rng(seed)
+    categories = {
+        'Scope 1': ['Stationary Combustion', 'Mobile Combustion'],
+        'Scope 2': ['Electricity'],
+        'Scope 3': ['Business Travel', 'Employee Commuting', 'Waste Generated in Operations'],
+    }
+    keys = [(scope, category) for scope, names in categories.items() for category in names]
+    picked = rng.integers(0, len(keys), rows)
+    return apply_schema(pd.DataFrame({
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365, rows), unit='D'),
+        'scope': [keys[i][0] for i in picked],
+        'category': [keys[i][1] for i in picked],
+        'facility': rng.choice([f"Plant {i}" for i in range(20)], rows),
+        'business_unit': rng.choice(['Corporate', 'Manufacturing', 'Sales', 'Logistics'], rows),
+        'emissions_kgCO2e': rng.random(rows) * 1000,
+        'entry_id': [f"e{i}" for i in range(rows)],
+    }))
+
+
+def legacy_time_series(data):
+    """The monthly time series as get_emissions_summary built it before, row loop included."""
+    time_data = data.copy()
+    time_data['month'] = time_data['date'].dt.strftime('%Y-%m')
+    grouped = time_data.groupby(['month', 'scope'], observed=True)['emissions_kgCO2e'].sum().reset_index()
+    result = {}
+    for _, row in grouped.iterrows():
+        if row['month'] not in result:
+            result[row['month']] = {}
+        result[row['month']][row['scope']] = row['emissions_kgCO2e']
+    return result
+
+
+def best_of(repeat, func):
+    """Run func repeat times; return (fastest seconds, last result)."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def same_series(expected, actual):
+    """Check two nested time series hold the same periods, scopes and totals."""
+    return expected.keys() == actual.keys() and all(
+        expected[period].keys() == actual[period].keys()
+        and np.allclose(list(expected[period].values()), [actual[period][scope] for scope in expected[period]])
+        for period in expected
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Number of synthetic rows")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the fastest counts")
+    args = parser.parse_args()
+
+    data = synthetic_emissions(args.rows)
+    print(f"{args.rows:,} rows")
+
+    legacy_seconds, expected = best_of(args.repeat, lambda: legacy_time_series(data))
+    print(f"  legacy iterrows time series     {legacy_seconds * 1000:10.1f} ms")
+
+    pivot_seconds, actual = best_of(
+        args.repeat, lambda: time_series(data['date'], data['scope'], data['emissions_kgCO2e'])
+    )
+    print(f"  vectorized period pivot         {pivot_seconds * 1000:10.1f} ms"
+          f"  ({legacy_seconds / pivot_seconds:.1f}x, identical: {same_series(expected, actual)})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        aggregates = EmissionsAggregates(os.path.join(tmp, 'aggregates.jsonl'))
+        start = time.perf_counter()
+        aggregates.rebuild(data)
+        print(f"  aggregate store build (once)    {(time.perf_counter() - start) * 1000:10.1f} ms")
+        for granularity in ['week', 'month', 'quarter', 'year']:
+            summary_seconds, summary = best_of(args.repeat, lambda: aggregates.summary(granularity))
+            note = f", identical: {same_series(expected, summary['time_series'])}" if granularity == 'month' else ""
+            print(f"  aggregate summary, {granularity:<7}      {summary_seconds * 1000:10.1f} ms"
+                  f"  ({legacy_seconds / summary_seconds:.1f}x{note})")
+
+
+if __name__ == '__main__':
+    main()
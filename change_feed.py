@@ -0,0 +1,61 @@
+"""
+Change feed for Enterprise CarbonScope application.
+Watches the data version persisted next to the emissions store, so caches
+held by this process are invalidated and open dashboards refresh when the
+data changes, without re-reading the store on every rerun.
+"""
+
+import threading
+
+
+class ChangeWatcher:
+    """
+    Polls a store's persisted data version.
+
+    A poll costs one stat of the version file. Changes this process wrote
+    itself already reached its caches, so the registered invalidation
+    callbacks run only when the version moved by more than this process's
+    own changes, i.e. when another process wrote to the data.
+    """
+
+    def __init__(self, store):
+        """
+        Initialize the ChangeWatcher class.
+
+        Args:
+            store (EmissionsStore): Store whose data version is watched
+        """
+        self.store = store
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._own = store.own_changes
+        self.version = store.data_version
+
+    def on_external_change(self, callback):
+        """
+        Register a callback for changes written by other processes.
+
+        Args:
+            callback (callable): Called with the new data version
+        """
+        self._callbacks.append(callback)
+
+    def poll(self):
+        """
+        Check whether the data changed since the last poll.
+
+        Returns:
+            bool: True if the data version moved, by this process or another
+        """
+        with self._lock:
+            # Own changes are read first, so a bump racing this poll can only look external
+            own = self.store.own_changes
+            version = self.store.data_version
+            if version == self.version:
+                return False
+            external = version - self.version > own - self._own
+            self.version, self._own = version, own
+        if external:
+            for callback in self._callbacks:
+                callback(version)
+        return True
@@ -24,6 +24,53 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 DATA_DIR = "data"
 EMISSIONS_FILE = os.path.join(DATA_DIR, "emissions.json")
 COMPANY_INFO_FILE = os.path.join(DATA_DIR, "company_info.json")
+ARROW_EMISSIONS_FILE = os.path.join(DATA_DIR, "emissions_columnar.arrow")
+SQLITE_EMISSIONS_FILE = os.path.join(DATA_DIR, "emissions.db")
+PARTITIONS_DIR = os.path.join(DATA_DIR, "partitions")
+IMPORT_CHECKPOINT_FILE = os.path.join(DATA_DIR, "import_checkpoint.json")
+QUARANTINE_DIR = os.path.join(DATA_DIR, "quarantine")
+DEDUP_INDEX_FILE = os.path.join(DATA_DIR, "dedup_index.jsonl")
+FACTOR_INDEX_FILE = os.path.join(DATA_DIR, "factor_index.jsonl")
+AGGREGATES_FILE = os.path.join(DATA_DIR, "aggregates.jsonl")
+# Additional emission factor tables (CSV, e.g. DEFRA/IPCC exports) loaded into the factor registry
+FACTOR_TABLES_DIR = os.path.join(DATA_DIR, "factors")
+# Site-specific activity names (CSV with category, activity and alias columns) for activity matching
+ACTIVITY_ALIASES_FILE = os.path.join(DATA_DIR, "activity_aliases.csv")
+
+# Default handling of duplicate entries: "skip", "update" or "flag"
+DEDUP_MODE = "skip"
+
+# Natural key matching corrected rows to stored entries in upsert imports
+# (e.g. an invoice id kept in notes)
+UPSERT_KEY_COLUMNS = ['facility', 'activity', 'date', 'notes']
+
+# Lowest trigram score accepted as an activity match, and the lead over the
+# next candidate below which a match is left for review as ambiguous
+ACTIVITY_MATCH_MIN_SCORE = 0.4
+ACTIVITY_MATCH_MARGIN = 0.1
+
+# Lines of the aggregates file per aggregated entry and key combination past
+# which it is rewritten without deleted and replaced entries
+AGGREGATES_COMPACTION_RATIO = 2
+
+# Limits of the in-process cache of aggregations and chart figures
+RESULT_CACHE_MAX_ENTRIES = 256
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Seconds between checks of an open dashboard for data changed by other sessions or processes
+CHANGE_POLL_SECONDS = 5
+
+# Rows read, validated and persisted at a time by the CSV importer
+IMPORT_CHUNK_SIZE = 50000
+
+# Maximum number of validation errors shown after an import (all are kept in the quarantine CSV)
+MAX_REPORTED_ERRORS = 1000
+
+# Storage backend for emissions data: "json", "arrow" (requires pyarrow), "sqlite" or "partitioned"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+
+# Number of logged adds/deletes after which the log is compacted into the snapshot
+LOG_COMPACTION_THRESHOLD = 1000
 
 # Supported languages
 SUPPORTED_LANGUAGES = ["English", "Hindi", "French", "German"]
@@ -42,10 +89,13 @@ SCOPE_DESCRIPTIONS = {
 DEFAULT_UNITS = [
     "kWh",
     "MWh",
+    "GJ",
     "liter",
+    "gallon",
     "kg",
     "tonne",
     "km",
+    "mile",
     "passenger-km",
     "cubic meter",
     "square meter",
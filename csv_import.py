@@ -0,0 +1,591 @@
+"""
+Chunked CSV import for Enterprise CarbonScope application.
+Reads, validates, enriches and persists emissions CSVs a chunk at a time so
+memory stays bounded, and checkpoints progress so an interrupted import
+resumes where it stopped. Rows that fail validation are quarantined to a
+CSV instead of aborting the import. Several files can be ingested in
+parallel and committed together, and corrected re-exports can be applied
+as a diff against stored entries.
+"""
+
+import glob
+import hashlib
+import io
+import json
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import config
+from activity_matcher import get_matcher
+from dedup_index import row_hashes
+from emission_factors import get_registry
+from emissions_schema import EMISSIONS_COLUMNS, apply_schema
+from units import normalize_quantities
+from validation import empty_errors, validate_emissions
+
+# Enterprise fields filled in when a CSV does not provide them
+ENTERPRISE_DEFAULTS = {
+    'business_unit': 'Corporate',
+    'project': 'Not Applicable',
+    'country': 'India',
+    'facility': '',
+    'responsible_person': '',
+    'data_quality': 'Medium',
+    'verification_status': 'Unverified',
+    'notes': ''
+}
+
+
+def _open_source(source):
+    """
+    Open a path, or rewind a file-like object, as a binary handle.
+
+    Text file-like objects, such as io.StringIO, are read whole and encoded
+    as UTF-8, since every reader here decodes bytes itself.
+
+    Returns:
+        tuple: (binary handle, size in bytes, whether the handle must be closed)
+    """
+    if hasattr(source, 'read'):
+        source.seek(0)
+        if isinstance(source.read(0), str):
+            content = source.read().encode('utf-8')
+            source.seek(0)
+            return io.BytesIO(content), len(content), True
+        source.seek(0, os.SEEK_END)
+        size = source.tell()
+        source.seek(0)
+        return source, size, False
+    return open(source, 'rb'), os.path.getsize(source), True
+
+
+def fingerprint(source):
+    """
+    Compute a content hash identifying a CSV source.
+
+    Args:
+        source: Path to CSV file or file-like object
+
+    Returns:
+        str: Hex digest of the content
+    """
+    handle, _, should_close = _open_source(source)
+    digest = hashlib.sha256()
+    try:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    finally:
+        if should_close:
+            handle.close()
+        else:
+            handle.seek(0)
+    return digest.hexdigest()
+
+
+def prepare_chunk(df, row_offset=0, resolve_factors=False):
+    """
+    Validate and enrich one chunk of CSV rows.
+
+    Quantities are converted to the unit of their emission factor: the unit
+    of the registry factor for resolved factors, or the optional factor_unit
+    column for factors given in the file. Rows whose unit cannot be converted
+    are rejected.
+
+    Args:
+        df (pandas.DataFrame): Raw CSV rows
+        row_offset (int, optional): Number of data rows before this chunk in the file
+        resolve_factors (bool, optional): Fill missing emission factors from the factor
+            registry in one join, after mapping free-text activity names to registry
+            activities; rows with an ambiguous activity or without a matching factor
+            are rejected
+
+    Returns:
+        tuple: (typed valid rows with enterprise defaults and computed emissions,
+                raw rejected rows, error table)
+
+    Raises:
+        ValueError: If required columns are missing
+    """
+    df = df.reset_index(drop=True)
+    valid, errors = validate_emissions(df, row_offset, require_factor=not resolve_factors)
+    rows = df[valid.values]
+
+    # Add missing columns with default values
+    rows = apply_schema(rows)
+    for field, default_value in ENTERPRISE_DEFAULTS.items():
+        if field not in df.columns:
+            rows[field] = default_value
+
+    factor_units = rows.pop('factor_unit') if 'factor_unit' in rows.columns else pd.Series(None, index=rows.index)
+    if resolve_factors:
+        rows, factor_units, errors = _match_activities(rows, factor_units, valid, errors, row_offset)
+        rows, factor_units, errors = _resolve_factors(rows, factor_units, valid, errors, row_offset)
+    rows, errors = _normalize_units(rows, factor_units, valid, errors, row_offset)
+
+    # Calculate emissions if not provided
+    missing_emissions = rows['emissions_kgCO2e'].isna()
+    rows.loc[missing_emissions, 'emissions_kgCO2e'] = (
+        rows.loc[missing_emissions, 'quantity'] * rows.loc[missing_emissions, 'emission_factor']
+    )
+
+    return apply_schema(rows), df[~valid.values], errors
+
+
+def _reject(rows, rejected, valid, errors, column, reason, values, row_offset):
+    """
+    Mark valid rows invalid in place and add them to the error table.
+
+    rows keeps the index of the chunk, so rejected rows map straight back to the file.
+
+    Returns:
+        tuple: (remaining rows, error table)
+    """
+    valid[rejected] = False
+    new_errors = pd.DataFrame({'row': rejected + row_offset + 1, 'column': column, 'reason': reason, 'value': values})
+    errors = pd.concat([errors, new_errors], ignore_index=True).sort_values('row', kind='stable')
+    return rows.drop(rejected), errors.reset_index(drop=True)
+
+
+def _match_activities(rows, factor_units, valid, errors, row_offset):
+    """
+    Map free-text activity names of rows without a factor to registry activities.
+
+    Names matching one activity are replaced by it; names that match several
+    activities about equally well, or a country's activity in a row without a
+    country, are rejected for review. Unmatched names are left for the category-wide
+    factors.
+
+    Returns:
+        tuple: (rows with mapped activities, factor unit per row, error table)
+    """
+    missing = rows['emission_factor'].isna()
+    if not missing.any():
+        return rows, factor_units, errors
+    countries = rows.loc[missing, 'country'] if 'country' in rows.columns else None
+    matches = get_matcher().match_column(rows.loc[missing, 'activity'], rows.loc[missing, 'category'], countries)
+    # Exact matches may still differ in case or punctuation from the registry name
+    mapped = matches['status'].isin(['exact', 'matched'])
+    if mapped.any():
+        rows['activity'] = rows['activity'].astype(object)
+        rows.loc[mapped[mapped].index, 'activity'] = matches.loc[mapped, 'activity']
+    ambiguous = matches.index[matches['status'] == 'ambiguous']
+    if len(ambiguous) == 0:
+        return rows, factor_units, errors
+
+    values = (rows.loc[ambiguous, 'activity'].astype(str) + " -> " + matches.loc[ambiguous, 'candidates']).values
+    rows, errors = _reject(rows, ambiguous, valid, errors, 'activity', "ambiguous activity", values, row_offset)
+    return rows, factor_units.drop(ambiguous), errors
+
+
+def _resolve_factors(rows, factor_units, valid, errors, row_offset):
+    """
+    Fill blank emission factors of valid rows from the factor registry.
+
+    Rows that still have no factor are rejected.
+
+    Returns:
+        tuple: (rows with factors, factor unit per row, error table)
+    """
+    missing = rows['emission_factor'].isna()
+    if not missing.any():
+        return rows, factor_units, errors
+    resolved = get_registry().lookup_frame(rows[missing])
+    rows.loc[missing, 'emission_factor'] = resolved['emission_factor']
+    rows.loc[missing, 'factor_id'] = resolved['factor_id']
+    factor_units = factor_units.astype(object)
+    factor_units[missing] = resolved['factor_unit']
+    unresolved = rows.index[rows['emission_factor'].isna()]
+    if len(unresolved) == 0:
+        return rows, factor_units, errors
+
+    context = rows.loc[unresolved, ['category', 'activity', 'country']].astype(object).fillna('').astype(str)
+    rows, errors = _reject(rows, unresolved, valid, errors, 'emission_factor', "no matching emission factor",
+                           (context['category'] + " / " + context['activity'] + " / " + context['country']).values,
+                           row_offset)
+    return rows, factor_units.drop(unresolved), errors
+
+
+def _normalize_units(rows, factor_units, valid, errors, row_offset):
+    """
+    Convert quantities of valid rows to the unit of their emission factor.
+
+    Rows whose unit has a different dimension than the factor unit are rejected.
+
+    Returns:
+        tuple: (rows with converted quantity and unit, error table)
+    """
+    rows, incompatible = normalize_quantities(rows, factor_units)
+    if not incompatible.any():
+        return rows, errors
+    mismatched = rows.index[incompatible.values]
+    values = (rows.loc[mismatched, 'unit'].astype(str) + " -> " + factor_units[mismatched].astype(str)).values
+    return _reject(rows, mismatched, valid, errors, 'unit', "unit incompatible with emission factor unit",
+                   values, row_offset)
+
+
+def quarantine_rows(quarantine_file, rejected, errors):
+    """
+    Append rejected rows, with their row numbers and reasons, to a quarantine CSV.
+
+    Args:
+        quarantine_file (str): Path of the quarantine CSV
+        rejected (pandas.DataFrame): Raw rejected rows
+        errors (pandas.DataFrame): Error table for those rows
+    """
+    if len(rejected) == 0:
+        return
+    reasons = (errors['column'] + ": " + errors['reason']).groupby(errors['row']).agg("; ".join)
+    rejected = rejected.copy()
+    rejected.insert(0, 'row', reasons.index.values)
+    rejected['errors'] = reasons.values
+    os.makedirs(os.path.dirname(quarantine_file) or '.', exist_ok=True)
+    rejected.to_csv(quarantine_file, mode='a', index=False, header=not os.path.exists(quarantine_file))
+
+
+def _load_checkpoint(checkpoint_file, source_fingerprint):
+    """Get the number of rows already imported from this source, if any."""
+    if not os.path.exists(checkpoint_file):
+        return 0
+    with open(checkpoint_file, 'r') as f:
+        try:
+            checkpoint = json.load(f)
+        except json.JSONDecodeError:
+            return 0
+    if checkpoint.get("fingerprint") != source_fingerprint:
+        return 0
+    return checkpoint.get("rows_done", 0)
+
+
+def _save_checkpoint(checkpoint_file, source_fingerprint, rows_done):
+    """Record how many rows of this source have been persisted."""
+    tmp_path = f"{checkpoint_file}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"fingerprint": source_fingerprint, "rows_done": rows_done}, f)
+    os.replace(tmp_path, checkpoint_file)
+
+
+def _entry_ids(source_fingerprint, rows):
+    """Derive stable entry ids for the given data row numbers of a source."""
+    return [uuid.uuid5(uuid.NAMESPACE_OID, f"{source_fingerprint}:{row}").hex for row in rows]
+
+
+def _quarantine_file(name, source_fingerprint):
+    """Get the quarantine CSV path for a source."""
+    base = os.path.splitext(os.path.basename(name))[0] if name else "import"
+    return os.path.join(config.QUARANTINE_DIR, f"{base}_{source_fingerprint[:12]}.csv")
+
+
+def _duplicates_message(count, mode):
+    """Describe how many duplicates were found and what was done with them."""
+    if not count:
+        return ""
+    action = {"skip": "skipped", "update": "used to update existing entries", "flag": "imported and flagged"}[mode]
+    return f". {count} duplicate rows were {action}"
+
+
+def import_csv_chunked(store, source, chunksize=config.IMPORT_CHUNK_SIZE, progress_callback=None,
+                       checkpoint_file=config.IMPORT_CHECKPOINT_FILE, dedup=None, dedup_mode=config.DEDUP_MODE,
+                       resolve_factors=False, aggregates=None, factor_index=None):
+    """
+    Import a CSV into the store a chunk at a time.
+
+    Each chunk is read, validated, enriched and persisted before the next one
+    is read, so peak memory is bounded by the chunk size. Invalid rows are
+    appended to a quarantine CSV and the valid ones imported. Rows get entry
+    ids derived from the file content and row number, and the number of
+    processed rows is checkpointed after every chunk; importing the same file
+    again after a failure skips the rows already handled, and re-persisting a
+    chunk that was written just before a crash replaces those rows instead of
+    duplicating them.
+
+    Args:
+        store (EmissionsStore): Store to append rows to, or a SharedDataset to publish them through
+        source: Path to CSV file or file-like object
+        chunksize (int, optional): Rows per chunk
+        progress_callback (callable, optional): Called as progress_callback(fraction, rows_done)
+        checkpoint_file (str, optional): Path of the resume checkpoint
+        dedup (DedupIndex, optional): Index to check rows against before storing them
+        dedup_mode (str, optional): Duplicate handling, one of dedup_index.DEDUP_MODES
+        resolve_factors (bool, optional): Fill blank or missing emission factors from the factor registry
+        aggregates (EmissionsAggregates, optional): Aggregates to keep in step with the store
+        factor_index (FactorIndex, optional): Factor references to keep in step with the store
+
+    Returns:
+        tuple: (success, message, rows_imported, error table of at most config.MAX_REPORTED_ERRORS rows)
+    """
+    source_fingerprint = fingerprint(source)
+    rows_done = _load_checkpoint(checkpoint_file, source_fingerprint)
+    resumed_from = rows_done
+    quarantine_file = _quarantine_file(getattr(source, 'name', source if isinstance(source, str) else None),
+                                       source_fingerprint)
+    if not resumed_from and os.path.exists(quarantine_file):
+        os.remove(quarantine_file)
+    imported, rejected_rows, duplicate_rows, reported = 0, 0, 0, [empty_errors()]
+
+    handle, size, should_close = _open_source(source)
+    # Read through a text wrapper that is detached afterwards, so the caller's file stays open
+    text = io.TextIOWrapper(handle, encoding='utf-8', newline='')
+    try:
+        reader = pd.read_csv(text, chunksize=chunksize, skiprows=range(1, rows_done + 1))
+        for chunk in reader:
+            try:
+                rows, rejected, errors = prepare_chunk(chunk, rows_done, resolve_factors)
+            except ValueError as e:
+                return False, f"Data validation error: {str(e)}", 0, empty_errors()
+            rows['entry_id'] = _entry_ids(source_fingerprint, rows_done + rows.index)
+            if dedup is not None:
+                rows, duplicates = dedup.deduplicate(rows, dedup_mode)
+                duplicate_rows += len(duplicates)
+            store.append(rows)
+            if dedup is not None:
+                dedup.add(rows)
+            if aggregates is not None:
+                aggregates.add(rows)
+            if factor_index is not None:
+                factor_index.add(rows)
+            quarantine_rows(quarantine_file, rejected, errors)
+            if sum(len(r) for r in reported) < config.MAX_REPORTED_ERRORS:
+                reported.append(errors)
+            imported += len(rows)
+            rejected_rows += len(rejected)
+            rows_done += len(chunk)
+            _save_checkpoint(checkpoint_file, source_fingerprint, rows_done)
+            if progress_callback:
+                progress_callback(min(handle.tell() / size, 1.0) if size else 1.0, rows_done)
+    except Exception as e:
+        return (False, f"Import stopped after {rows_done} rows: {str(e)}. "
+                       f"Upload the same file again to resume.", imported, empty_errors())
+    finally:
+        text.detach()
+        if should_close:
+            handle.close()
+
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    message = f"Successfully imported {imported} entries"
+    if resumed_from:
+        message += f" (resumed after {resumed_from} previously processed rows)"
+    message += _duplicates_message(duplicate_rows, dedup_mode)
+    if rejected_rows:
+        message += f". {rejected_rows} invalid rows were quarantined to {quarantine_file}"
+    errors = pd.concat(reported, ignore_index=True).head(config.MAX_REPORTED_ERRORS)
+    return True, message, imported, errors
+
+
+def _parse_file(name, content, resolve_factors=False):
+    """
+    Parse, validate and enrich one CSV file in a worker process.
+
+    Args:
+        name (str): File name, used in messages
+        content (bytes): File content
+        resolve_factors (bool, optional): Fill missing emission factors from the factor registry
+
+    Returns:
+        tuple: (name, valid rows, rejected rows, error table, file-level error message or None)
+    """
+    try:
+        source = io.BytesIO(content)
+        rows, rejected, errors = prepare_chunk(pd.read_csv(source), resolve_factors=resolve_factors)
+        rows['entry_id'] = _entry_ids(fingerprint(source), rows.index)
+        return name, rows, rejected, errors, None
+    except Exception as e:
+        return name, None, None, None, str(e)
+
+
+def _read_sources(sources):
+    """Expand a directory or a list of paths/file-like objects into (name, bytes) pairs."""
+    if isinstance(sources, str) and os.path.isdir(sources):
+        sources = sorted(glob.glob(os.path.join(sources, "*.csv")))
+    files = []
+    for source in sources:
+        if hasattr(source, 'read'):
+            handle, _, should_close = _open_source(source)
+            files.append((getattr(source, 'name', 'upload.csv'), handle.read()))
+            if should_close:
+                handle.close()
+            else:
+                handle.seek(0)
+        else:
+            with open(source, 'rb') as f:
+                files.append((os.path.basename(source), f.read()))
+    return files
+
+
+def bulk_import_csv(store, sources, max_workers=None, progress_callback=None, dedup=None,
+                    dedup_mode=config.DEDUP_MODE, resolve_factors=False, aggregates=None, factor_index=None):
+    """
+    Ingest several CSV files in parallel and commit them to the store together.
+
+    Parsing, validation, type coercion and emissions calculation run across a
+    process pool, one file per task. Invalid rows are quarantined per file.
+    Rows are only persisted if every file could be read, in a single append,
+    so a month-end batch is either fully imported or not at all.
+
+    Args:
+        store (EmissionsStore): Store to append rows to, or a SharedDataset to publish them through
+        sources: Directory path, or list of CSV paths or file-like objects
+        max_workers (int, optional): Worker processes, defaults to the number of CPUs
+        progress_callback (callable, optional): Called as progress_callback(fraction, files_done)
+        dedup (DedupIndex, optional): Index to check rows against before storing them
+        dedup_mode (str, optional): Duplicate handling, one of dedup_index.DEDUP_MODES
+        resolve_factors (bool, optional): Fill blank or missing emission factors from the factor registry
+        aggregates (EmissionsAggregates, optional): Aggregates to keep in step with the store
+        factor_index (FactorIndex, optional): Factor references to keep in step with the store
+
+    Returns:
+        tuple: (success, message, rows_imported, error table with a file column)
+    """
+    files = _read_sources(sources)
+    if not files:
+        return False, "No CSV files to import.", 0, empty_errors()
+
+    results, failures = [], []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_parse_file, name, content, resolve_factors) for name, content in files]
+        for done, future in enumerate(futures, start=1):
+            name, rows, rejected, errors, failure = future.result()
+            if failure:
+                failures.append(f"{name}: {failure}")
+            else:
+                results.append((name, rows, rejected, errors))
+            if progress_callback:
+                progress_callback(done / len(files), done)
+
+    if failures:
+        return False, "No entries were imported. Could not read " + "; ".join(failures), 0, empty_errors()
+
+    data = pd.concat([rows for _, rows, _, _ in results], ignore_index=True)
+    duplicate_rows = 0
+    if dedup is not None:
+        data, duplicates = dedup.deduplicate(data, dedup_mode)
+        duplicate_rows = len(duplicates)
+    store.append(data)
+    if dedup is not None:
+        dedup.add(data)
+    if aggregates is not None:
+        aggregates.add(data)
+    if factor_index is not None:
+        factor_index.add(data)
+
+    reported, rejected_rows = [empty_errors()], 0
+    for (name, _, rejected, errors), (_, content) in zip(results, files):
+        if len(rejected) > 0:
+            quarantine_file = _quarantine_file(name, fingerprint(io.BytesIO(content)))
+            if os.path.exists(quarantine_file):
+                os.remove(quarantine_file)
+            quarantine_rows(quarantine_file, rejected, errors)
+            reported.append(errors.assign(file=name))
+            rejected_rows += len(rejected)
+
+    message = f"Successfully imported {len(data)} entries from {len(files)} files"
+    message += _duplicates_message(duplicate_rows, dedup_mode)
+    if rejected_rows:
+        message += f". {rejected_rows} invalid rows were quarantined to {config.QUARANTINE_DIR}"
+    errors = pd.concat(reported, ignore_index=True).head(config.MAX_REPORTED_ERRORS)
+    return True, message, len(data), errors
+
+
+def upsert_csv(store, source, key_columns=config.UPSERT_KEY_COLUMNS, delete_missing=True, dedup=None,
+               resolve_factors=False, aggregates=None, factor_index=None):
+    """
+    Apply a corrected CSV re-export to the store as a diff.
+
+    Incoming rows are matched to stored entries on a natural key. Rows with a
+    new key are inserted, rows whose values changed are written under the
+    existing entry_id, and unchanged rows are not touched. With delete_missing,
+    stored entries inside the file's coverage (its date range and facilities)
+    whose key is absent from the file are deleted. Only changed rows are
+    written, so the cost follows the size of the correction, not of the file.
+
+    Args:
+        store (EmissionsStore): Store to apply the diff to, or a SharedDataset to publish it through
+        source: Path to CSV file or file-like object
+        key_columns (list, optional): Columns forming the natural key
+        delete_missing (bool, optional): Delete covered entries missing from the file
+        dedup (DedupIndex, optional): Duplicate index to keep in step with the store
+        resolve_factors (bool, optional): Fill blank or missing emission factors from the factor registry
+        aggregates (EmissionsAggregates, optional): Aggregates to keep in step with the store
+        factor_index (FactorIndex, optional): Factor references to keep in step with the store
+
+    Returns:
+        tuple: (success, message, rows_changed, error table of rows that were quarantined)
+    """
+    source_fingerprint = fingerprint(source)
+    handle, _, should_close = _open_source(source)
+    text = io.TextIOWrapper(handle, encoding='utf-8', newline='')
+    try:
+        rows, rejected, errors = prepare_chunk(pd.read_csv(text), resolve_factors=resolve_factors)
+    except ValueError as e:
+        return False, f"Data validation error: {str(e)}", 0, empty_errors()
+    finally:
+        text.detach()
+        if should_close:
+            handle.close()
+    quarantine_file = _quarantine_file(getattr(source, 'name', source if isinstance(source, str) else None),
+                                       source_fingerprint)
+    if os.path.exists(quarantine_file):
+        os.remove(quarantine_file)
+    quarantine_rows(quarantine_file, rejected, errors)
+    if len(rows) == 0:
+        return False, "No valid rows to apply.", 0, errors.head(config.MAX_REPORTED_ERRORS)
+
+    # Stored entries the file covers; with pushdown only its date range is read
+    existing = store.query(rows['date'].min(), rows['date'].max())
+
+    value_columns = [col for col in EMISSIONS_COLUMNS if col != 'entry_id']
+    incoming_keys = row_hashes(rows, key_columns)
+    # A key repeated within the file is taken from its last row
+    superseded = incoming_keys.duplicated(keep='last')
+    rows, incoming_keys = rows[~superseded], incoming_keys[~superseded]
+    existing_keys = row_hashes(existing, key_columns)
+    unique_existing = ~existing_keys.duplicated(keep='last').values
+
+    # Position of each incoming key among the stored entries, -1 for new keys
+    positions = pd.Index(existing_keys.values[unique_existing]).get_indexer(incoming_keys.values)
+    is_new = positions == -1
+    matched = existing[unique_existing].iloc[positions[~is_new]]
+    changed = row_hashes(rows[~is_new], value_columns).values != row_hashes(matched, value_columns).values
+
+    inserts = rows[is_new].copy()
+    inserts['entry_id'] = _entry_ids(source_fingerprint, inserts.index)
+    updates = rows[~is_new][changed].copy()
+    updates['entry_id'] = matched['entry_id'].values[changed]
+
+    deletes = existing.iloc[0:0]
+    if delete_missing:
+        covered = existing['facility'].isin(rows['facility'].unique()).values
+        deletes = existing[covered & ~existing_keys.isin(incoming_keys.values).values]
+
+    # An update can move an entry to another date; drop it from where it was first
+    previous_dates = matched['date'].values[changed]
+    moved = updates['date'].values != previous_dates
+    stale = pd.concat([
+        deletes[['entry_id', 'date']],
+        pd.DataFrame({'entry_id': updates['entry_id'].values[moved], 'date': previous_dates[moved]})
+    ], ignore_index=True)
+    if len(stale) > 0:
+        store.delete(stale['entry_id'].tolist(), dates=stale['date'].tolist())
+    written = pd.concat([inserts, updates], ignore_index=True)
+    if len(written) > 0:
+        store.append(written)
+    if dedup is not None:
+        dedup.remove(deletes['entry_id'].tolist())
+        dedup.add(written)
+    if aggregates is not None:
+        aggregates.remove(deletes['entry_id'].tolist())
+        aggregates.add(written)
+    if factor_index is not None:
+        factor_index.remove(deletes['entry_id'].tolist())
+        factor_index.add(written)
+
+    message = (f"Applied correction: {len(inserts)} inserted, {len(updates)} updated, "
+               f"{len(deletes)} deleted, {len(rows) - len(inserts) - len(updates)} unchanged")
+    if superseded.any():
+        message += f". {int(superseded.sum())} rows were superseded by a later row with the same key"
+    if len(rejected) > 0:
+        message += f". {len(rejected)} invalid rows were quarantined to {quarantine_file}"
+    return True, message, len(written) + len(deletes), errors.head(config.MAX_REPORTED_ERRORS)
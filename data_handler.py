@@ -9,10 +9,16 @@ import os
 from datetime import datetime
 import csv
 from io import StringIO
-from fpdf import FPDF
-import matplotlib.pyplot as plt
-import seaborn as sns
-from emission_factors import get_emission_factor, get_categories, get_activities
+from emission_factors import get_emission_factor, get_categories, get_activities, get_registry
+from emissions_store import open_store
+from emissions_schema import apply_schema
+from csv_import import bulk_import_csv, import_csv_chunked, upsert_csv
+from validation import empty_errors
+from dedup_index import DedupIndex
+from factor_index import FactorIndex, recalculate_for_factors
+from aggregates import EmissionsAggregates
+from shared_dataset import SharedDataset
+import config
 
 # Constants
 DATA_DIR = "data"
@@ -25,29 +31,34 @@ os.makedirs(DATA_DIR, exist_ok=True)
 class DataHandler:
     def __init__(self):
         """Initialize the DataHandler class."""
+        self.store = open_store()
+        # Writes go through the dataset, which applies them to the in-memory data instead of reloading it
+        self.dataset = SharedDataset(open_store)
+        self.dedup = DedupIndex()
+        self.factor_index = FactorIndex()
+        self.aggregates = EmissionsAggregates()
         self.load_emissions_data()
         self.load_company_info()
     
+    @property
+    def emissions_data(self):
+        """pandas.DataFrame: Current emissions data; it must not be modified."""
+        return self.dataset.data()
+    
     def load_emissions_data(self):
-        """Load emissions data from file."""
-        if os.path.exists(EMISSIONS_FILE):
-            with open(EMISSIONS_FILE, 'r') as f:
-                try:
-                    self.emissions_data = pd.DataFrame(json.load(f))
-                    # Convert date strings to datetime objects
-                    if 'date' in self.emissions_data.columns:
-                        self.emissions_data['date'] = pd.to_datetime(self.emissions_data['date'])
-                except json.JSONDecodeError:
-                    self.create_empty_emissions_data()
-        else:
+        """Load emissions data from the snapshot and record log and bring the indexes in step with it."""
+        try:
+            # Stores return typed data (datetime dates, float numerics, categorical text)
+            emissions_data = self.dataset.reload()
+            self.dedup.sync(emissions_data)
+            self.factor_index.sync(emissions_data)
+            self.aggregates.sync(emissions_data)
+        except json.JSONDecodeError:
             self.create_empty_emissions_data()
     
     def create_empty_emissions_data(self):
         """Create empty emissions dataframe."""
-        self.emissions_data = pd.DataFrame(columns=[
-            'date', 'scope', 'category', 'activity', 'quantity', 
-            'unit', 'emission_factor', 'emissions_kgCO2e', 'notes'
-        ])
+        self.dataset.clear()
     
     def load_company_info(self):
         """Load company information from file."""
@@ -76,14 +87,12 @@ class DataHandler:
         }
     
     def save_emissions_data(self):
-        """Save emissions data to file."""
-        # Convert datetime objects to strings
-        data_to_save = self.emissions_data.copy()
-        if 'date' in data_to_save.columns:
-            data_to_save['date'] = data_to_save['date'].dt.strftime('%Y-%m-%d')
-        
-        with open(EMISSIONS_FILE, 'w') as f:
-            json.dump(data_to_save.to_dict('records'), f, indent=2)
+        """Rewrite the full emissions snapshot (adds and deletes are logged incrementally)."""
+        emissions_data = self.emissions_data
+        self.store.compact(emissions_data)
+        self.dedup.sync(emissions_data)
+        self.factor_index.sync(emissions_data)
+        self.aggregates.sync(emissions_data)
     
     def save_company_info(self):
         """Save company information to file."""
@@ -124,58 +133,150 @@ class DataHandler:
                 'notes': notes
             }])
             
-            # Append to existing data
-            self.emissions_data = pd.concat([self.emissions_data, new_entry], ignore_index=True)
+            # Skip or merge entries that duplicate an existing one
+            new_entry, _ = self.dedup.deduplicate(apply_schema(new_entry), config.DEDUP_MODE)
+            if len(new_entry) == 0:
+                print("Skipped emission entry: an identical entry already exists")
+                return False
             
-            # Save data
-            self.save_emissions_data()
+            # Log the entry; the data gets it too (replacing it if it updates an existing entry)
+            new_entry = self.dataset.append(new_entry)
+            self.dedup.add(new_entry)
+            self.factor_index.add(new_entry)
+            self.aggregates.add(new_entry)
             
             return True
         except Exception as e:
             print(f"Error adding emission entry: {str(e)}")
             return False
     
-    def import_csv(self, file_path_or_buffer):
+    def import_csv(self, file_path_or_buffer, progress_callback=None, dedup_mode=config.DEDUP_MODE,
+                   resolve_factors=False):
         """
-        Import emissions data from CSV.
+        Import emissions data from CSV, a chunk at a time.
         
         Args:
             file_path_or_buffer: Path to CSV file or file-like object
+            progress_callback (callable, optional): Called as progress_callback(fraction, rows_done)
+            dedup_mode (str, optional): How rows duplicating existing entries are handled
+            resolve_factors (bool, optional): Look up blank or missing emission factors
             
         Returns:
-            tuple: (success, message)
+            tuple: (success, message, error table of rows that were quarantined)
         """
         try:
-            # Read CSV
-            df = pd.read_csv(file_path_or_buffer)
-            
-            # Check required columns
-            required_columns = ['date', 'scope', 'category', 'activity', 'quantity', 'unit', 'emission_factor']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                return False, f"Missing required columns: {', '.join(missing_columns)}"
-            
-            # Convert date strings to datetime objects
-            df['date'] = pd.to_datetime(df['date'])
+            # The import applies each chunk to the data and the indexes as it is stored
+            with self.dataset.writing():
+                success, message, _, errors = import_csv_chunked(
+                    self.dataset, file_path_or_buffer, progress_callback=progress_callback,
+                    dedup=self.dedup, dedup_mode=dedup_mode, resolve_factors=resolve_factors,
+                    aggregates=self.aggregates, factor_index=self.factor_index
+                )
+            return success, message, errors
+        except Exception as e:
+            return False, f"Error importing CSV: {str(e)}", empty_errors()
+    
+    def bulk_import_csv(self, sources, max_workers=None, dedup_mode=config.DEDUP_MODE, resolve_factors=False):
+        """
+        Import several CSV files in parallel, committing them together.
+        
+        Args:
+            sources: Directory of CSV files, or list of paths or file-like objects
+            max_workers (int, optional): Worker processes, defaults to the number of CPUs
+            dedup_mode (str, optional): How rows duplicating existing entries are handled
+            resolve_factors (bool, optional): Look up blank or missing emission factors
             
-            # Calculate emissions if not provided
-            if 'emissions_kgCO2e' not in df.columns:
-                df['emissions_kgCO2e'] = df['quantity'].astype(float) * df['emission_factor'].astype(float)
+        Returns:
+            tuple: (success, message, error table of rows that were quarantined)
+        """
+        try:
+            with self.dataset.writing():
+                success, message, _, errors = bulk_import_csv(
+                    self.dataset, sources, max_workers=max_workers, dedup=self.dedup, dedup_mode=dedup_mode,
+                    resolve_factors=resolve_factors, aggregates=self.aggregates, factor_index=self.factor_index
+                )
+            return success, message, errors
+        except Exception as e:
+            return False, f"Error importing CSV files: {str(e)}", empty_errors()
+    
+    def upsert_csv(self, file_path_or_buffer, key_columns=config.UPSERT_KEY_COLUMNS, delete_missing=True,
+                   resolve_factors=False):
+        """
+        Apply a corrected CSV re-export as inserts, updates and deletes.
+        
+        Args:
+            file_path_or_buffer: Path to CSV file or file-like object
+            key_columns (list, optional): Columns matching rows to stored entries
+            delete_missing (bool, optional): Delete covered entries missing from the file
+            resolve_factors (bool, optional): Look up blank or missing emission factors
             
-            # Add notes column if not present
-            if 'notes' not in df.columns:
-                df['notes'] = ""
+        Returns:
+            tuple: (success, message, error table of rows that were quarantined)
+        """
+        try:
+            with self.dataset.writing():
+                success, message, _, errors = upsert_csv(
+                    self.dataset, file_path_or_buffer, key_columns=key_columns,
+                    delete_missing=delete_missing, dedup=self.dedup, resolve_factors=resolve_factors,
+                    aggregates=self.aggregates, factor_index=self.factor_index
+                )
+            return success, message, errors
+        except Exception as e:
+            return False, f"Error applying CSV correction: {str(e)}", empty_errors()
+    
+    def update_emission_factors(self, factor_table, source=""):
+        """
+        Apply newer emission factors and recalculate only the entries that use them.
+        
+        Args:
+            factor_table (pandas.DataFrame): Factor rows with category, activity and factor columns
+            source (str, optional): Source label, e.g. "DEFRA 2025"
             
-            # Append to existing data
-            self.emissions_data = pd.concat([self.emissions_data, df], ignore_index=True)
+        Returns:
+            tuple: (success, message, per-factor before/after summary)
+        """
+        try:
+            changes = get_registry().update(factor_table, source)
+            with self.dataset.writing():
+                updated, summary = recalculate_for_factors(self.dataset, self.factor_index, changes)
+                self.dedup.add(updated)
+                self.aggregates.add(updated)
+            return True, f"{len(changes)} factors changed, {len(updated)} entries recalculated", summary
+        except Exception as e:
+            return False, f"Error updating emission factors: {str(e)}", None
+    
+    def import_json(self, file_path_or_buffer):
+        """
+        Replace emissions data with the contents of a JSON export.
+        
+        Args:
+            file_path_or_buffer: Path to JSON file or file-like object
             
-            # Save data
-            self.save_emissions_data()
+        Returns:
+            tuple: (success, message)
+        """
+        try:
+            self.store.import_json(file_path_or_buffer)
+            self.load_emissions_data()
+            return True, f"Successfully imported {len(self.emissions_data)} entries"
+        except Exception as e:
+            return False, f"Error importing JSON: {str(e)}"
+    
+    def export_json(self, file_path=None):
+        """
+        Export emissions data as a JSON array, independent of the storage backend.
+        
+        Args:
+            file_path (str, optional): Path to save JSON file
             
-            return True, f"Successfully imported {len(df)} entries"
+        Returns:
+            str or bool: JSON string if file_path is None, otherwise True if successful
+        """
+        try:
+            return self.store.export_json(file_path)
         except Exception as e:
-            return False, f"Error importing CSV: {str(e)}"
+            print(f"Error exporting JSON: {str(e)}")
+            return False
     
     def export_csv(self, file_path=None, start_date=None, end_date=None):
         """
@@ -191,10 +292,7 @@ class DataHandler:
         """
         try:
             # Filter data by date range if specified
-            data = self.emissions_data.copy()
-            if start_date and end_date:
-                mask = (data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))
-                data = data.loc[mask]
+            data = self.get_filtered_data(start_date, end_date)
             
             # Convert datetime objects to strings
             if 'date' in data.columns:
@@ -227,10 +325,10 @@ class DataHandler:
         """
         try:
             # Filter data by date range if specified
-            data = self.emissions_data.copy()
-            if start_date and end_date:
-                mask = (data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))
-                data = data.loc[mask]
+            data = self.get_filtered_data(start_date, end_date)
+            
+            # fpdf is only needed here, so it is not imported at app start-up
+            from fpdf import FPDF
             
             # Create PDF
             pdf = FPDF()
@@ -258,14 +356,14 @@ class DataHandler:
             pdf.cell(0, 10, f"Total Emissions: {total_emissions:.2f} kgCO2e", 0, 1)
             
             # Emissions by scope
-            scope_data = data.groupby('scope')['emissions_kgCO2e'].sum().reset_index()
+            scope_data = data.groupby('scope', observed=True)['emissions_kgCO2e'].sum().reset_index()
             pdf.ln(5)
             pdf.cell(0, 10, "Emissions by Scope:", 0, 1)
             for _, row in scope_data.iterrows():
                 pdf.cell(0, 10, f"{row['scope']}: {row['emissions_kgCO2e']:.2f} kgCO2e ({row['emissions_kgCO2e'] / total_emissions * 100:.1f}%)", 0, 1)
             
             # Emissions by category
-            category_data = data.groupby('category')['emissions_kgCO2e'].sum().reset_index()
+            category_data = data.groupby('category', observed=True)['emissions_kgCO2e'].sum().reset_index()
             pdf.ln(5)
             pdf.cell(0, 10, "Top Categories:", 0, 1)
             for _, row in category_data.nlargest(5, 'emissions_kgCO2e').iterrows():
@@ -309,49 +407,47 @@ class DataHandler:
             print(f"Error generating PDF report: {str(e)}")
             return False
     
-    def get_emissions_summary(self):
+    def get_emissions_summary(self, granularity='month'):
         """
         Get emissions summary statistics.
         
+        Args:
+            granularity (str, optional): Period of the time series: 'week', 'month',
+                'quarter' or 'year'
+            
         Returns:
             dict: Summary statistics
         """
-        if len(self.emissions_data) == 0:
-            return {
-                "total_emissions": 0,
-                "scope_breakdown": {},
-                "category_breakdown": {},
-                "time_series": {}
-            }
-        
-        # Total emissions
-        total_emissions = self.emissions_data['emissions_kgCO2e'].sum()
-        
-        # Emissions by scope
-        scope_data = self.emissions_data.groupby('scope')['emissions_kgCO2e'].sum().to_dict()
-        
-        # Emissions by category
-        category_data = self.emissions_data.groupby('category')['emissions_kgCO2e'].sum().to_dict()
+        # Totals are maintained incrementally by the aggregate store
+        return self.aggregates.summary(granularity)
+    
+    def get_rollup(self, dimensions, where=None, period='month'):
+        """
+        Get emission totals by any of the cube dimensions.
         
-        # Time series data (monthly)
-        time_data = self.emissions_data.copy()
-        if 'date' in time_data.columns and len(time_data) > 0:
-            time_data['month'] = time_data['date'].dt.strftime('%Y-%m')
-            time_series = time_data.groupby(['month', 'scope'])['emissions_kgCO2e'].sum().reset_index()
-            time_series_dict = {}
-            for _, row in time_series.iterrows():
-                if row['month'] not in time_series_dict:
-                    time_series_dict[row['month']] = {}
-                time_series_dict[row['month']][row['scope']] = row['emissions_kgCO2e']
-        else:
-            time_series_dict = {}
+        Args:
+            dimensions (list): Dimensions to group by, from aggregates.CUBE_DIMENSIONS
+            where (dict, optional): Value or list of values to keep, by dimension
+            period (str, optional): 'month', 'quarter' or 'year' for the period dimension
+            
+        Returns:
+            pandas.DataFrame: The dimensions, emissions_kgCO2e and entries
+        """
+        return self.aggregates.rollup(dimensions, where, period)
+    
+    def get_period_totals(self, start_date=None, end_date=None, by=None):
+        """
+        Get emission totals of a date range from the prefix-sum date index.
         
-        return {
-            "total_emissions": total_emissions,
-            "scope_breakdown": scope_data,
-            "category_breakdown": category_data,
-            "time_series": time_series_dict
-        }
+        Args:
+            start_date (datetime, optional): First day of the range
+            end_date (datetime, optional): Last day of the range
+            by (str, optional): 'scope' or 'category' to break the totals down
+            
+        Returns:
+            float or pandas.DataFrame: Total kgCO2e, or the breakdown when by is given
+        """
+        return self.aggregates.period_totals(start_date, end_date, by)
     
     def get_filtered_data(self, start_date=None, end_date=None, scope=None, category=None):
         """
@@ -366,6 +462,10 @@ class DataHandler:
         Returns:
             pandas.DataFrame: Filtered data
         """
+        # Let stores with indexes run the filter and return only matching rows
+        if self.store.pushdown:
+            return self.store.query(start_date, end_date, scope, category)
+        
         data = self.emissions_data.copy()
         
         # Apply filters
@@ -0,0 +1,238 @@
+"""
+Duplicate detection for Enterprise CarbonScope application.
+Keeps a persistent index of normalized row hashes so every ingest path can
+recognise repeated entries and re-imports in O(1) per row.
+"""
+
+import json
+import os
+import uuid
+
+import pandas as pd
+
+import config
+from emissions_schema import NUMERIC_COLUMNS
+from emissions_store import file_lock, repair_tail
+
+# Columns that identify an emission entry for duplicate detection
+DEDUP_KEY_COLUMNS = ['date', 'scope', 'category', 'activity', 'facility', 'quantity', 'unit', 'emission_factor']
+
+# Note prepended to duplicates imported in "flag" mode
+DUPLICATE_FLAG = "[possible duplicate]"
+
+# How incoming duplicates are handled
+DEDUP_MODES = {
+    "skip": "Skip duplicates",
+    "update": "Update existing entries",
+    "flag": "Import and flag duplicates",
+}
+
+
+def row_hashes(df, columns=DEDUP_KEY_COLUMNS):
+    """
+    Hash the normalized identifying columns of each row.
+
+    Dates are reduced to YYYY-MM-DD, text is stripped and lower-cased and
+    numbers are rounded to 6 decimals, so formatting differences between a
+    manual entry and a CSV export do not hide a duplicate.
+
+    Args:
+        df (pandas.DataFrame): Emissions rows
+        columns (list, optional): Columns to hash, defaults to DEDUP_KEY_COLUMNS
+
+    Returns:
+        pandas.Series: uint64 hash per row
+    """
+    norm = pd.DataFrame(index=df.index)
+    for col in columns:
+        values = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if col == 'date':
+            norm[col] = pd.to_datetime(values, errors='coerce').dt.strftime('%Y-%m-%d').fillna('')
+        elif col in NUMERIC_COLUMNS:
+            norm[col] = pd.to_numeric(values, errors='coerce').round(6)
+        else:
+            norm[col] = values.astype(object).fillna('').astype(str).str.strip().str.lower()
+    return pd.util.hash_pandas_object(norm, index=False)
+
+
+class DedupIndex:
+    """
+    Persistent row-hash index.
+
+    Maps each row hash to the entry ids stored with it and each entry id back
+    to its hash. Changes are appended to a JSON lines file; the index is read
+    lazily on first use and rebuilt from the data when it falls out of sync.
+    """
+
+    def __init__(self, index_file=config.DEDUP_INDEX_FILE):
+        """Initialize the DedupIndex class."""
+        self.index_file = index_file
+        self._by_hash = None
+        self._by_id = None
+
+    def _ensure_loaded(self):
+        """Read the index file on first use."""
+        if self._by_hash is not None:
+            return
+        self._by_hash, self._by_id = {}, {}
+        if not os.path.exists(self.index_file):
+            return
+        with open(self.index_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn final line from an interrupted write
+                    break
+                if record.get("del"):
+                    self._forget(record["id"])
+                else:
+                    self._remember(record["h"], record["id"])
+
+    def invalidate(self):
+        """Drop the in-memory maps, so the index file is read again on next use."""
+        self._by_hash = self._by_id = None
+
+    def _remember(self, row_hash, entry_id):
+        """Add one entry to the in-memory maps."""
+        self._by_hash.setdefault(row_hash, []).append(entry_id)
+        self._by_id[entry_id] = row_hash
+
+    def _forget(self, entry_id):
+        """Remove one entry from the in-memory maps."""
+        row_hash = self._by_id.pop(entry_id, None)
+        if row_hash is None:
+            return
+        ids = self._by_hash.get(row_hash, [])
+        if entry_id in ids:
+            ids.remove(entry_id)
+        if not ids:
+            self._by_hash.pop(row_hash, None)
+
+    def _write(self, records):
+        """Append records to the index file, under its lock so writers of other processes do not interleave."""
+        if not records:
+            return
+        with file_lock(self.index_file):
+            repair_tail(self.index_file)
+            with open(self.index_file, 'a') as f:
+                f.write("\n".join(json.dumps(record) for record in records) + "\n")
+
+    def __len__(self):
+        """Number of indexed entries."""
+        self._ensure_loaded()
+        return len(self._by_id)
+
+    def rebuild(self, data):
+        """
+        Rebuild the index from the full emissions data.
+
+        Args:
+            data (pandas.DataFrame): All stored emissions rows
+        """
+        self._by_hash, self._by_id = {}, {}
+        hashes = row_hashes(data).tolist() if len(data) > 0 else []
+        for row_hash, entry_id in zip(hashes, data['entry_id'].tolist() if len(data) > 0 else []):
+            self._remember(row_hash, entry_id)
+        tmp_path = f"{self.index_file}.tmp"
+        with file_lock(self.index_file):
+            with open(tmp_path, 'w') as f:
+                for entry_id, row_hash in self._by_id.items():
+                    f.write(json.dumps({"h": row_hash, "id": entry_id}) + "\n")
+            os.replace(tmp_path, self.index_file)
+
+    def sync(self, data):
+        """
+        Rebuild the index if it does not cover exactly the stored entries.
+
+        Args:
+            data (pandas.DataFrame): All stored emissions rows
+        """
+        self._ensure_loaded()
+        if len(self._by_id) != len(data) or (len(data) > 0 and not data['entry_id'].isin(self._by_id.keys()).all()):
+            self.rebuild(data)
+
+    def deduplicate(self, df, mode=config.DEDUP_MODE):
+        """
+        Apply the duplicate policy to incoming rows.
+
+        A row is a duplicate when its hash is already indexed or appears earlier
+        in the same batch. In "skip" mode duplicates are dropped, in "update"
+        mode they take the entry_id of the row they duplicate so storing them
+        replaces it, and in "flag" mode they are kept as new entries with
+        DUPLICATE_FLAG prepended to their notes.
+
+        Args:
+            df (pandas.DataFrame): Incoming rows
+            mode (str, optional): One of DEDUP_MODES
+
+        Returns:
+            tuple: (rows to store, duplicate rows)
+        """
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown duplicate mode '{mode}'. Choose from: {', '.join(DEDUP_MODES)}")
+        self._ensure_loaded()
+        if len(df) == 0:
+            return df, df
+
+        hashes = row_hashes(df)
+        known = hashes.map(lambda h: self._by_hash[h][0] if h in self._by_hash else None)
+        duplicate = known.notna() | hashes.duplicated()
+
+        if mode == "skip":
+            return df[~duplicate], df[duplicate]
+        if mode == "update":
+            rows = df.copy()
+            if 'entry_id' not in rows.columns:
+                rows['entry_id'] = None
+            rows['entry_id'] = rows['entry_id'].astype(object)
+            rows.loc[known.notna(), 'entry_id'] = known[known.notna()]
+            # Within the batch the last occurrence wins
+            rows = rows[~hashes.duplicated(keep='last')]
+            return rows, df[duplicate]
+        rows = df.copy()
+        if 'notes' not in rows.columns:
+            rows['notes'] = None
+        notes = rows['notes'].astype(object)
+        rows['notes'] = notes.where(~duplicate, (DUPLICATE_FLAG + ' ' + notes.fillna('').astype(str)).str.strip())
+        # A re-imported file derives the same entry ids; give its copies new ones so they are added, not replaced
+        if 'entry_id' in rows.columns:
+            reused = rows['entry_id'].isin(self._by_id.keys())
+            rows['entry_id'] = rows['entry_id'].astype(object)
+            rows.loc[reused, 'entry_id'] = [uuid.uuid4().hex for _ in range(reused.sum())]
+        return rows, df[duplicate]
+
+    def add(self, df):
+        """
+        Index stored rows.
+
+        Args:
+            df (pandas.DataFrame): Rows as stored, with entry_id populated
+        """
+        self._ensure_loaded()
+        if len(df) == 0:
+            return
+        records = []
+        for row_hash, entry_id in zip(row_hashes(df).tolist(), df['entry_id'].tolist()):
+            # A replaced row may have changed hash; drop the old mapping first
+            if entry_id in self._by_id:
+                self._forget(entry_id)
+                records.append({"id": entry_id, "del": True})
+            self._remember(row_hash, entry_id)
+            records.append({"h": row_hash, "id": entry_id})
+        self._write(records)
+
+    def remove(self, entry_ids):
+        """
+        Remove deleted rows from the index.
+
+        Args:
+            entry_ids (list): entry_id values of the deleted rows
+        """
+        self._ensure_loaded()
+        for entry_id in entry_ids:
+            self._forget(entry_id)
+        self._write([{"id": entry_id, "del": True} for entry_id in entry_ids])
@@ -1,8 +1,19 @@
 """
 Emission factors database for Enterprise CarbonScope application.
-Based on DEFRA/IPCC datasets for common emission sources.
+Based on DEFRA/IPCC datasets for common emission sources. All lookups go
+through a factor registry that compiles the built-in factors and any
+loaded factor tables into a flat index.
 """
 
+import glob
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+import config
+
 # Emission factors by category (in kgCO2e per unit)
 EMISSION_FACTORS = {
     # Scope 1 - Direct emissions
@@ -74,6 +85,47 @@ EMISSION_FACTORS = {
     },
 }
 
+# Typical factors by country and category (in kgCO2e per unit), used when
+# no activity-specific factor exists
+COUNTRY_DEFAULT_FACTORS = {
+    "India": {
+        "Electricity": 0.82, "Mobile Combustion": 2.31, "Stationary Combustion": 1.85, "Other": 0.0
+    },
+    "United States": {
+        "Electricity": 0.42,
+        "Mobile Combustion": 2.32,
+        "Stationary Combustion": 2.01,
+        "Business Travel": 0.12,
+        "Employee Commuting": 0.15
+    }
+}
+
+# Columns of a factor table. Blank activity, country or unit match any value;
+# a factor is in force from valid_from (blank: always) through valid_to, its
+# last day, or until the next factor for the same activity starts when
+# valid_to is blank
+FACTOR_COLUMNS = ['category', 'activity', 'country', 'unit', 'valid_from', 'valid_to', 'factor', 'source']
+FACTOR_KEY_COLUMNS = ['category', 'activity', 'country', 'unit', 'valid_from']
+
+
+def factor_ids(table):
+    """
+    Derive stable ids for factor table rows from their key columns.
+
+    A newer table publishing the same key keeps the id, so entries that
+    reference a factor follow its updates.
+
+    Args:
+        table (pandas.DataFrame): Factor rows
+
+    Returns:
+        list: 16-character hex id per row
+    """
+    keys = table[FACTOR_KEY_COLUMNS].astype(object).where(table[FACTOR_KEY_COLUMNS].notna(), '').astype(str)
+    keys = keys.agg("|".join, axis=1)
+    return [hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] for key in keys]
+
+
 # Scope categories
 SCOPE_CATEGORIES = {
     "Scope 1": [
@@ -107,21 +159,412 @@ SCOPE_CATEGORIES = {
     ]
 }
 
+class _AsOfIndex:
+    """
+    Interval index answering "which factor was in force on this date" for
+    many (group, date) pairs at once.
+
+    Rows are sorted by group and start date and encoded as one integer key
+    (group code, rank of start date), so every probe is a single searchsorted
+    over the whole table followed by a check of the interval end.
+    """
+
+    def __init__(self, table, positions, group_columns):
+        """
+        Build the index.
+
+        Args:
+            table (pandas.DataFrame): Compiled factor table
+            positions (numpy.ndarray): Table positions of the rows to index
+            group_columns (list): Columns identifying a group of successive factors
+        """
+        rows = table.iloc[positions]
+        self.groups = pd.MultiIndex.from_frame(rows[group_columns].drop_duplicates())
+        group_codes = self.groups.get_indexer(pd.MultiIndex.from_frame(rows[group_columns]))
+        starts = rows['valid_from'].values.astype('datetime64[ns]').astype(np.int64)
+        undated = rows['valid_from'].isna().values
+        self.start_times = np.unique(starts[~undated])
+        self.radix = len(self.start_times) + 1
+        ranks = np.where(undated, 0, np.searchsorted(self.start_times, starts) + 1)
+
+        order = np.lexsort((ranks, group_codes))
+        self.keys = group_codes[order].astype(np.int64) * self.radix + ranks[order]
+        self.group_codes = group_codes[order]
+        self.positions = np.asarray(positions)[order]
+
+        # Ends are exclusive: the day after valid_to, or for an open-ended factor
+        # the start of the next one in its group
+        ends = (rows['valid_to'].dt.normalize() + pd.Timedelta(days=1)).values.astype('datetime64[ns]')[order]
+        next_starts = np.append(rows['valid_from'].values.astype('datetime64[ns]')[order][1:], np.datetime64('NaT'))
+        next_in_group = np.append(self.group_codes[1:] == self.group_codes[:-1], False)
+        next_starts[~next_in_group] = np.datetime64('NaT')
+        self.ends = np.where(np.isnat(ends), next_starts, ends)
+
+    def probe(self, group_arrays, dates):
+        """
+        Find the factor in force for each (group, date) pair.
+
+        Args:
+            group_arrays (list): One array per group column
+            dates (numpy.ndarray): datetime64 date per pair; NaT only matches undated factors
+
+        Returns:
+            numpy.ndarray: Table position per pair, -1 where no factor is in force
+        """
+        if len(self.keys) == 0:
+            return np.full(len(dates), -1)
+        group_codes = self.groups.get_indexer(pd.MultiIndex.from_arrays(group_arrays))
+        dates = dates.astype('datetime64[ns]')
+        dated = ~np.isnat(dates)
+        ranks = np.where(dated, np.searchsorted(self.start_times, dates.astype(np.int64), side='right'), 0)
+        slots = np.searchsorted(self.keys, group_codes.astype(np.int64) * self.radix + ranks, side='right') - 1
+        # A slot before the first key means the date precedes every factor of the first group
+        before_all = slots < 0
+        slots = np.maximum(slots, 0)
+        ends = self.ends[slots]
+        found = (group_codes != -1) & ~before_all & (self.group_codes[slots] == group_codes)
+        found &= np.isnat(ends) | ~dated | (dates < ends)
+        return np.where(found, self.positions[slots], -1)
+
+
+class FactorRegistry:
+    """
+    Registry of emission factors compiled into a flat hashed index.
+
+    Factor tables are appended with add_table or load_csv; later tables
+    override earlier rows with the same (category, activity, country, unit,
+    valid_from) key. The index is compiled on first lookup after a change.
+    Lookups pick the factor in force on the entry's date and fall back from
+    the most specific key to wildcard rows: exact activity before the
+    category-wide default and exact country before any country.
+    """
+
+    def __init__(self):
+        """Initialize the FactorRegistry class."""
+        self._tables = []
+        self._table = None
+        self._unit_index = None
+        self._unit_free_index = None
+
+    def add_table(self, table, source=""):
+        """
+        Add a factor table.
+
+        Args:
+            table (pandas.DataFrame): Rows with category, activity and factor columns and
+                optional country, unit, valid_from, valid_to and source columns. valid_to
+                is the last day a factor is in force. A year column is read as a factor in
+                force from January 1 of that year.
+            source (str, optional): Source label for rows without one
+        """
+        table = table.copy()
+        missing = [col for col in ['category', 'activity', 'factor'] if col not in table.columns]
+        if missing:
+            raise ValueError(f"Factor table must contain columns: {', '.join(missing)}")
+        for col in ['category', 'activity', 'country', 'unit']:
+            table[col] = table[col].fillna('').astype(str).str.strip() if col in table.columns else ''
+        for col in ['valid_from', 'valid_to']:
+            table[col] = pd.to_datetime(table[col], errors='coerce') if col in table.columns else pd.NaT
+        if 'year' in table.columns:
+            years = pd.to_numeric(table['year'], errors='coerce')
+            year_starts = pd.to_datetime(years.astype('Int64').astype(str) + "-01-01", errors='coerce')
+            table['valid_from'] = table['valid_from'].fillna(year_starts)
+        table['valid_from'] = table['valid_from'].astype('datetime64[ns]')
+        table['valid_to'] = table['valid_to'].astype('datetime64[ns]')
+        table['factor'] = pd.to_numeric(table['factor'], errors='coerce')
+        table['source'] = table['source'].fillna(source) if 'source' in table.columns else source
+        self._tables.append(table.dropna(subset=['factor'])[FACTOR_COLUMNS])
+        self._table = None
+
+    def load_csv(self, path):
+        """
+        Load a factor table from a CSV file.
+
+        Args:
+            path (str): Path to the CSV file
+        """
+        self.add_table(pd.read_csv(path), source=os.path.splitext(os.path.basename(path))[0])
+
+    def load_dir(self, directory):
+        """
+        Load every CSV factor table in a directory, in name order.
+
+        Args:
+            directory (str): Directory of CSV files
+        """
+        for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+            self.load_csv(path)
+
+    def update(self, table, source=""):
+        """
+        Add a newer factor table and report which existing factors it changed.
+
+        A factor changes when its value changes, or when a newly published
+        interval ends its period in force earlier than before.
+
+        Args:
+            table (pandas.DataFrame): Factor rows, as for add_table
+            source (str, optional): Source label for rows without one
+
+        Returns:
+            pandas.DataFrame: factor_id, unit, old_factor and new_factor of every changed factor
+        """
+        before = self.table[['factor_id', 'factor', 'in_force_until']]
+        self.add_table(table, source)
+        after = self.table[['factor_id', 'unit', 'factor', 'in_force_until']]
+        changes = before.merge(after, on='factor_id', suffixes=('_old', '_new'))
+        shortened = changes['in_force_until_new'].notna() & (
+            changes['in_force_until_old'].isna() | (changes['in_force_until_new'] < changes['in_force_until_old'])
+        )
+        changes = changes[(changes['factor_old'] != changes['factor_new']) | shortened]
+        return changes.rename(columns={'factor_old': 'old_factor', 'factor_new': 'new_factor'})[
+            ['factor_id', 'unit', 'old_factor', 'new_factor']
+        ].reset_index(drop=True)
+
+    def _compile(self):
+        """Build the flat interval indexes from the loaded tables."""
+        if self._table is not None:
+            return
+        table = pd.concat(self._tables, ignore_index=True) if self._tables else pd.DataFrame(columns=FACTOR_COLUMNS)
+        table = table.drop_duplicates(subset=FACTOR_KEY_COLUMNS, keep='last').reset_index(drop=True)
+        table['factor_id'] = factor_ids(table) if len(table) > 0 else pd.Series(dtype=object)
+        self._table = table
+        self._unit_index = _AsOfIndex(table, np.arange(len(table)), ['category', 'activity', 'country', 'unit'])
+        # Without a unit to match, the first unit listed for an activity and start date is used
+        unit_free = ~table.duplicated(subset=['category', 'activity', 'country', 'valid_from'], keep='first')
+        self._unit_free_index = _AsOfIndex(table, np.flatnonzero(unit_free.values), ['category', 'activity', 'country'])
+        table['in_force_until'] = pd.NaT
+        table.loc[self._unit_index.positions, 'in_force_until'] = self._unit_index.ends
+
+    @property
+    def table(self):
+        """pandas.DataFrame: The compiled factor table."""
+        self._compile()
+        return self._table
+
+    def __len__(self):
+        """Number of distinct factors."""
+        return len(self.table)
+
+    def lookup(self, category, activity, country=None, date=None, unit=None):
+        """
+        Get the emission factor for one activity.
+
+        Args:
+            category (str): The emission category
+            activity (str): The specific activity
+            country (str, optional): Country of the activity
+            date (datetime, optional): Date of the activity; undated lookups only match
+                factors without a validity interval
+            unit (str, optional): Unit the factor must be expressed in
+
+        Returns:
+            dict: Dictionary containing factor, unit, source and factor_id, or None if not found
+        """
+        row = pd.DataFrame([{'category': category, 'activity': activity, 'country': country,
+                             'date': date, 'unit': unit}])
+        resolved = self.lookup_frame(row, match_unit=bool(unit)).iloc[0]
+        if pd.isna(resolved['emission_factor']):
+            return None
+        return {"factor": float(resolved['emission_factor']), "unit": resolved['factor_unit'],
+                "source": resolved['factor_source'], "factor_id": resolved['factor_id']}
+
+    def lookup_frame(self, df, match_unit=False):
+        """
+        Resolve emission factors for all rows at once.
+
+        Rows are reduced to their distinct keys first. Each fallback level is
+        then one vectorized as-of probe that picks, per key, the factor in
+        force on the row's date with a sorted-interval search.
+
+        Args:
+            df (pandas.DataFrame): Rows with category and activity columns and
+                optional country, date and unit columns
+            match_unit (bool, optional): Only use factors expressed in the row's unit
+
+        Returns:
+            pandas.DataFrame: emission_factor, factor_unit, factor_source and factor_id
+                per row (NaN where no factor was found), aligned with df
+        """
+        self._compile()
+        dates = pd.to_datetime(df['date'], errors='coerce') if 'date' in df.columns else pd.Series(pd.NaT, index=df.index)
+        columns = {
+            'category': df.get('category'), 'activity': df.get('activity'), 'country': df.get('country'),
+            'date': dates, 'unit': df.get('unit')
+        }
+
+        # Factorize each column, then the code tuples, so only distinct keys are normalized and probed
+        column_codes, column_values = [], {}
+        for name, values in columns.items():
+            if values is None:
+                values = pd.Series('', index=df.index)
+            codes, uniques = pd.factorize(values)
+            # Missing values get their own code after the distinct values
+            column_codes.append(np.where(codes == -1, len(uniques), codes))
+            column_values[name] = pd.Index(uniques, dtype=object).append(pd.Index([None], dtype=object))
+        sizes = [len(values) for values in column_values.values()]
+        codes, distinct_rows = pd.factorize(np.ravel_multi_index(column_codes, sizes))
+        distinct_codes = np.unravel_index(distinct_rows, sizes)
+        distinct = pd.DataFrame({
+            name: column_values[name].take(distinct_codes[level])
+            for level, name in enumerate(columns)
+        })
+        for name in ['category', 'activity', 'country', 'unit']:
+            values = distinct[name]
+            distinct[name] = values.astype(object).where(values.notna(), '').astype(str).str.strip()
+        distinct_dates = pd.to_datetime(distinct['date']).values.astype('datetime64[ns]')
+
+        positions = np.full(len(distinct), -1)
+        blank = pd.Series('', index=distinct.index)
+        for act in (distinct['activity'], blank):
+            for ctry in (distinct['country'], blank):
+                todo = positions == -1
+                if not todo.any():
+                    break
+                groups = [distinct['category'][todo], act[todo], ctry[todo]]
+                if match_unit:
+                    found = self._unit_index.probe(groups + [distinct['unit'][todo]], distinct_dates[todo])
+                    fallback = self._unit_index.probe(groups + [blank[todo]], distinct_dates[todo])
+                    found = np.where(found != -1, found, fallback)
+                else:
+                    found = self._unit_free_index.probe(groups, distinct_dates[todo])
+                positions[todo] = found
+
+        positions = positions[codes]
+        resolved = positions != -1
+        factor = np.full(len(df), np.nan)
+        factor[resolved] = self._table['factor'].to_numpy(dtype=float)[positions[resolved]]
+        factor_unit = np.full(len(df), None, dtype=object)
+        factor_unit[resolved] = self._table['unit'].replace('', None).to_numpy(dtype=object)[positions[resolved]]
+        factor_source = np.full(len(df), None, dtype=object)
+        factor_source[resolved] = self._table['source'].to_numpy(dtype=object)[positions[resolved]]
+        factor_id = np.full(len(df), None, dtype=object)
+        factor_id[resolved] = self._table['factor_id'].to_numpy(dtype=object)[positions[resolved]]
+        return pd.DataFrame({'emission_factor': factor, 'factor_unit': factor_unit, 'factor_source': factor_source,
+                             'factor_id': factor_id}, index=df.index)
+
+    def in_force(self, factor_ids, dates):
+        """
+        Follow factor references to the factor of the same key in force on each date.
+
+        An entry linked to a factor keeps its category, activity, country and
+        unit; only the validity interval is re-resolved. References whose
+        date falls outside every interval keep their factor.
+
+        Args:
+            factor_ids (array-like): Referenced factor ids
+            dates (array-like): Date of each referencing entry
+
+        Returns:
+            pandas.DataFrame: emission_factor, factor_unit and factor_id per reference
+        """
+        self._compile()
+        positions = pd.Index(self._table['factor_id']).get_indexer(pd.Index(factor_ids, dtype=object))
+        known = positions != -1
+        linked = self._table.iloc[positions[known]]
+        dates = pd.to_datetime(pd.Series(dates), errors='coerce').values.astype('datetime64[ns]')
+        found = self._unit_index.probe(
+            [linked[col].values for col in ['category', 'activity', 'country', 'unit']], dates[known]
+        )
+        positions[known] = np.where(found != -1, found, positions[known])
+        resolved = self._table.iloc[positions[known]]
+        result = pd.DataFrame({'emission_factor': np.nan, 'factor_unit': None, 'factor_id': pd.Series(factor_ids, dtype=object).values})
+        result.loc[known, 'emission_factor'] = resolved['factor'].values
+        result.loc[known, 'factor_unit'] = resolved['unit'].replace('', None).values
+        result.loc[known, 'factor_id'] = resolved['factor_id'].values
+        return result
+
+    def activities(self, category):
+        """
+        Get the activities with a specific factor in a category.
+
+        Args:
+            category (str): The emission category
+
+        Returns:
+            list: Activity names in table order
+        """
+        table = self.table
+        return list(dict.fromkeys(table.loc[(table['category'] == category) & (table['activity'] != ''), 'activity']))
+
+    def describe(self, categories=None, limit=50):
+        """
+        Summarize factors as text, e.g. for an assistant prompt.
+
+        Args:
+            categories (list, optional): Only include these categories
+            limit (int, optional): Maximum number of factors listed
+
+        Returns:
+            str: One factor per line
+        """
+        table = self.table
+        if categories is not None:
+            table = table[table['category'].isin(categories)]
+        lines = []
+        for row in table.head(limit).itertuples(index=False):
+            period = f"from {row.valid_from:%Y-%m-%d}" if pd.notna(row.valid_from) else ''
+            qualifiers = ", ".join(part for part in [row.country, period] if part)
+            name = f"{row.category} / {row.activity or 'any activity'}" + (f" ({qualifiers})" if qualifiers else "")
+            lines.append(f"- {name}: {row.factor:g} kgCO2e per {row.unit or 'unit'}")
+        return "\n".join(lines)
+
+
+def builtin_factor_table():
+    """
+    Build a factor table from the built-in factors.
+
+    Returns:
+        pandas.DataFrame: Rows of EMISSION_FACTORS and COUNTRY_DEFAULT_FACTORS
+    """
+    rows = [
+        {'category': category, 'activity': activity, 'unit': ef["unit"], 'factor': ef["factor"], 'source': "DEFRA/IPCC"}
+        for category, activities in EMISSION_FACTORS.items()
+        for activity, ef in activities.items()
+    ]
+    rows += [
+        {'category': category, 'activity': '', 'country': country, 'factor': factor, 'source': "Country default"}
+        for country, factors in COUNTRY_DEFAULT_FACTORS.items()
+        for category, factor in factors.items()
+    ]
+    return pd.DataFrame(rows)
+
+
+_registry = None
+
+
+def get_registry():
+    """
+    Get the shared factor registry, built on first use from the built-in
+    factors and the CSV tables in config.FACTOR_TABLES_DIR.
+
+    Returns:
+        FactorRegistry: The shared registry
+    """
+    global _registry
+    if _registry is None:
+        registry = FactorRegistry()
+        registry.add_table(builtin_factor_table())
+        if os.path.isdir(config.FACTOR_TABLES_DIR):
+            registry.load_dir(config.FACTOR_TABLES_DIR)
+        _registry = registry
+    return _registry
+
 # Get emission factor for a specific activity
-def get_emission_factor(category, activity):
+def get_emission_factor(category, activity, country=None, date=None):
     """
     Get the emission factor for a specific activity within a category.
     
     Args:
         category (str): The emission category
         activity (str): The specific activity
+        country (str, optional): Country of the activity
+        date (datetime, optional): Date the factor must be in force on
         
     Returns:
         dict: Dictionary containing factor and unit, or None if not found
     """
-    if category in EMISSION_FACTORS and activity in EMISSION_FACTORS[category]:
-        return EMISSION_FACTORS[category][activity]
-    return None
+    return get_registry().lookup(category, activity, country, date)
 
 # Get all activities for a category
 def get_activities(category):
@@ -134,9 +577,7 @@ def get_activities(category):
     Returns:
         list: List of activities for the category, or empty list if category not found
     """
-    if category in EMISSION_FACTORS:
-        return list(EMISSION_FACTORS[category].keys())
-    return []
+    return get_registry().activities(category)
 
 # Get all categories for a scope
 def get_categories(scope):
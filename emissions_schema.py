@@ -0,0 +1,89 @@
+"""
+Emissions schema for Enterprise CarbonScope application.
+Defines the column types of emission entries and applies them to dataframes,
+keeping repetitive text columns as categoricals and numerics as floats.
+"""
+
+import pandas as pd
+
+# Columns of an emission entry, in display order
+EMISSIONS_COLUMNS = [
+    'date', 'business_unit', 'project', 'scope', 'category', 'activity',
+    'country', 'facility', 'responsible_person', 'quantity', 'unit',
+    'emission_factor', 'emissions_kgCO2e', 'data_quality',
+    'verification_status', 'notes', 'factor_id', 'entry_id'
+]
+
+# Numeric columns, stored as float64
+NUMERIC_COLUMNS = ['quantity', 'emission_factor', 'emissions_kgCO2e']
+
+# Highly repetitive text columns, stored as pandas Categoricals
+CATEGORICAL_COLUMNS = [
+    'business_unit', 'project', 'scope', 'category', 'activity', 'country',
+    'facility', 'responsible_person', 'unit', 'data_quality', 'verification_status'
+]
+
+
+def empty_frame():
+    """
+    Create an empty emissions dataframe with typed columns.
+
+    Returns:
+        pandas.DataFrame: Empty emissions data
+    """
+    return apply_schema(pd.DataFrame(columns=EMISSIONS_COLUMNS))
+
+
+def apply_schema(df):
+    """
+    Coerce emissions rows to the schema.
+
+    Dates become datetime64 (unparseable dates become NaT), numerics float64
+    (unparseable values become NaN) and repetitive text columns categoricals.
+    Columns outside the schema are left as they are.
+
+    Args:
+        df (pandas.DataFrame): Emissions rows
+
+    Returns:
+        pandas.DataFrame: Typed copy of the rows
+    """
+    data = df.copy()
+    for col in EMISSIONS_COLUMNS:
+        if col not in data.columns:
+            data[col] = None
+    if not pd.api.types.is_datetime64_any_dtype(data['date']):
+        data['date'] = pd.to_datetime(data['date'], errors='coerce')
+    for col in NUMERIC_COLUMNS:
+        if data[col].dtype != 'float64':
+            data[col] = pd.to_numeric(data[col], errors='coerce').astype('float64')
+    for col in CATEGORICAL_COLUMNS:
+        if not isinstance(data[col].dtype, pd.CategoricalDtype):
+            data[col] = data[col].astype(object).where(data[col].notna(), None).astype('category')
+    for col in ['notes', 'factor_id', 'entry_id']:
+        data[col] = data[col].astype(object)
+    return data
+
+
+def append_rows(data, rows):
+    """
+    Append rows to typed emissions data without losing categorical dtypes.
+
+    New category values are added to the existing categoricals first, so the
+    concatenation keeps compact codes instead of falling back to object dtype.
+
+    Args:
+        data (pandas.DataFrame): Typed emissions data
+        rows (pandas.DataFrame): Rows to append
+
+    Returns:
+        pandas.DataFrame: Combined typed data
+    """
+    data = apply_schema(data)
+    rows = apply_schema(rows)
+    for col in CATEGORICAL_COLUMNS:
+        new_values = rows[col].cat.categories.difference(data[col].cat.categories)
+        if len(new_values) > 0:
+            data[col] = data[col].cat.add_categories(new_values)
+        rows[col] = rows[col].astype(data[col].dtype)
+    return pd.concat([data, rows], ignore_index=True)
@@ -0,0 +1,1194 @@
+"""
+Emissions store for Enterprise CarbonScope application.
+Persists emission entries as an append-only record log that is
+periodically compacted into a snapshot, with pluggable snapshot formats.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+import config
+from emissions_schema import (
+    CATEGORICAL_COLUMNS, EMISSIONS_COLUMNS, NUMERIC_COLUMNS, apply_schema, empty_frame
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+try:
+    import fcntl
+except ImportError:
+    # Without fcntl (Windows) writes of concurrent processes are not serialized
+    fcntl = None
+
+# Last read of each version file: (stat signature, version record)
+_version_reads = {}
+
+# Version bumps made by this process, by version file
+_own_bumps = {}
+
+
+def _json_default(value):
+    """Serialize numpy scalars and timestamps that json cannot handle."""
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _atomic_write(path, text):
+    """Write text to path so readers never observe a half-written file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock on a file while a block runs.
+
+    The lock is taken on a separate `{path}.lock` file, so the locked file
+    itself can be replaced while it is held. Locks are not reentrant.
+
+    Args:
+        path (str): File to lock
+    """
+    with open(f"{path}.lock", 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def repair_tail(path):
+    """
+    Make a JSON lines file end with a line break before it is appended to.
+
+    A write interrupted part-way leaves a final line without its line break.
+    If that line still holds a complete record the line break is added,
+    otherwise the torn line is truncated, so the next append starts a line
+    of its own instead of running into the torn one.
+
+    Args:
+        path (str): JSON lines file
+    """
+    try:
+        f = open(path, 'rb+')
+    except FileNotFoundError:
+        return
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Search backwards for the line break ending the last complete line
+        start, end = 0, size
+        while end > 0:
+            f.seek(max(end - 65536, 0))
+            chunk = f.read(end - max(end - 65536, 0))
+            newline = chunk.rfind(b"\n")
+            if newline >= 0:
+                start = end - len(chunk) + newline + 1
+                break
+            end -= len(chunk)
+        f.seek(start)
+        try:
+            json.loads(f.read())
+        except ValueError:
+            f.truncate(start)
+        else:
+            f.write(b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _version_signature(path):
+    """Get the stat fields that change whenever a version file is replaced, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def read_version(path):
+    """
+    Read a persisted data version, polling the file's stat instead of reading it each time.
+
+    Args:
+        path (str): Version file
+
+    Returns:
+        dict: version, change and changed_at of the latest change; version 0 when none was recorded
+    """
+    signature = _version_signature(path)
+    if signature is None:
+        return {"version": 0, "change": None, "changed_at": None}
+    cached = _version_reads.get(path)
+    # Two changes within one mtime tick can leave the stat unchanged, so recent files are always read
+    if cached is not None and cached[0] == signature and time.time_ns() - signature[0] > 1_000_000_000:
+        return cached[1]
+    try:
+        with open(path, 'r') as f:
+            record = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return cached[1] if cached is not None else {"version": 0, "change": None, "changed_at": None}
+    _version_reads[path] = (signature, record)
+    return record
+
+
+def bump_version(path, change):
+    """
+    Increment a persisted data version.
+
+    The read-increment-write runs under an exclusive lock on a lock file and
+    the version file is replaced atomically, so concurrent processes neither
+    lose a bump nor read a half-written version.
+
+    Args:
+        path (str): Version file
+        change (str): Kind of change, e.g. 'append', 'delete' or 'compact'
+
+    Returns:
+        int: The new version
+    """
+    with file_lock(path):
+        try:
+            with open(path, 'r') as f:
+                version = json.load(f).get("version", 0)
+        except (FileNotFoundError, json.JSONDecodeError):
+            version = 0
+        record = {"version": version + 1, "change": change, "changed_at": datetime.now().isoformat()}
+        _atomic_write(path, json.dumps(record))
+    _version_reads[path] = (_version_signature(path), record)
+    _own_bumps[path] = _own_bumps.get(path, 0) + 1
+    return record["version"]
+
+
+def to_records(df):
+    """
+    Convert emissions rows to JSON-ready records.
+
+    Args:
+        df (pandas.DataFrame): Emissions rows
+
+    Returns:
+        list: List of dicts with ISO date strings and None for missing values
+    """
+    data = df.copy()
+    if 'date' in data.columns:
+        data['date'] = pd.to_datetime(data['date'], errors='coerce').dt.strftime('%Y-%m-%d')
+    data = data.astype(object).where(pd.notna(data), None)
+    return data.to_dict('records')
+
+
+class EmissionsStore:
+    """
+    Append-only emissions store with a JSON snapshot.
+
+    Every add or delete is written as one JSON line to the record log, so a
+    mutation costs O(1) I/O regardless of ledger size. Once the log holds
+    `compact_every` records it is folded into the snapshot file. Records carry
+    a sequence number and rows carry a stable `entry_id`, which makes replay
+    idempotent: re-applying a record that is already in the snapshot is a no-op.
+
+    Subclasses change the snapshot format by overriding `_read_snapshot` and
+    `_write_snapshot`; the record log is shared by all formats.
+    """
+
+    # Whether query() and aggregate() run inside the store instead of over a full load
+    pushdown = False
+
+    # Whether changes are written to the record log; stores that change their data in place have none
+    record_log = True
+
+    def __init__(self, snapshot_file=config.EMISSIONS_FILE, log_file=None,
+                 compact_every=config.LOG_COMPACTION_THRESHOLD):
+        """
+        Initialize the EmissionsStore class.
+
+        Subclasses call this with the file or directory holding their data,
+        which also places the data version file next to it.
+        """
+        base, ext = os.path.splitext(snapshot_file)
+        self.snapshot_file = snapshot_file
+        self.compact_every = compact_every
+        self.seq = 0
+        self.log_records = 0
+        self.log_file = self.meta_file = self.backup_file = None
+        os.makedirs(os.path.dirname(snapshot_file) or '.', exist_ok=True)
+        if self.record_log:
+            self.log_file = log_file or f"{base}_log.jsonl"
+            self.meta_file = f"{base}_meta.json"
+            self.backup_file = f"{base}_backup{ext}"
+            self._sync_position()
+
+    def _sync_position(self):
+        """Pick up the last sequence number and log length written so far."""
+        records = self._read_log()
+        self.seq = max([self._read_meta().get("snapshot_seq", 0)] + [r.get("seq", 0) for r in records])
+        self.log_records = len(records)
+
+    def empty_frame(self):
+        """Create an empty emissions dataframe."""
+        return empty_frame()
+
+    @property
+    def location(self):
+        """str: File or directory holding the stored data."""
+        return self.snapshot_file
+
+    @property
+    def version_file(self):
+        """str: File next to the stored data holding its data version."""
+        return f"{os.path.abspath(self.location)}.version"
+
+    @property
+    def data_version(self):
+        """int: Number of changes written to the stored data by any process, for keying cached results."""
+        return read_version(self.version_file)["version"]
+
+    @property
+    def own_changes(self):
+        """int: Number of changes this process wrote to the stored data."""
+        return _own_bumps.get(self.version_file, 0)
+
+    def _bump_version(self, change):
+        """Record a change to the stored data."""
+        bump_version(self.version_file, change)
+
+    def _read_snapshot(self):
+        """Read the snapshot; raises json.JSONDecodeError if the file is corrupted."""
+        if not os.path.exists(self.snapshot_file):
+            return self.empty_frame()
+        with open(self.snapshot_file, 'r') as f:
+            data = f.read().strip()
+        rows = json.loads(data) if data else []
+        return pd.DataFrame(rows) if rows else self.empty_frame()
+
+    def _write_snapshot(self, df):
+        """Write the snapshot atomically."""
+        _atomic_write(self.snapshot_file, json.dumps(to_records(df), indent=2, default=_json_default))
+
+    def _read_meta(self):
+        """Read the sequence number the snapshot was compacted at."""
+        if not os.path.exists(self.meta_file):
+            return {"snapshot_seq": 0}
+        with open(self.meta_file, 'r') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return {"snapshot_seq": 0}
+
+    def _read_log(self):
+        """
+        Read log records, skipping torn lines left by interrupted writes.
+
+        Appends repair a torn final line before writing, but logs written
+        before that could have a torn line followed by further records.
+        """
+        if not os.path.exists(self.log_file):
+            return []
+        records = []
+        with open(self.log_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+
+    def _replay(self):
+        """
+        Rebuild the current rows from the snapshot and the log tail.
+
+        Returns:
+            tuple: (pandas.DataFrame of current rows, bool whether legacy rows needed ids)
+        """
+        data = self._read_snapshot()
+        migrated = False
+        if 'entry_id' not in data.columns:
+            data['entry_id'] = None
+        missing = data['entry_id'].isna()
+        if missing.any():
+            data.loc[missing, 'entry_id'] = [uuid.uuid4().hex for _ in range(int(missing.sum()))]
+            migrated = True
+
+        self.seq = self._read_meta().get("snapshot_seq", 0)
+        records = self._read_log()
+        self.log_records = len(records)
+
+        # Keep only the last record per entry, in the order of that last record
+        latest = {}
+        for record in records:
+            self.seq = max(self.seq, record.get("seq", 0))
+            entry_id = record["row"]["entry_id"] if record["op"] == "put" else record["entry_id"]
+            latest.pop(entry_id, None)
+            latest[entry_id] = record
+
+        if latest:
+            data = data[~data['entry_id'].isin(list(latest))]
+            puts = [record["row"] for record in latest.values() if record["op"] == "put"]
+            if puts:
+                data = pd.concat([data, pd.DataFrame(puts)], ignore_index=True)
+        return data.reset_index(drop=True), migrated
+
+    def load(self):
+        """
+        Load emissions data by replaying the snapshot and the log tail.
+
+        Returns:
+            pandas.DataFrame: Current emissions data
+        """
+        data, migrated = self._replay()
+        if migrated:
+            # Persist ids given to legacy rows so later log records can refer to them
+            with file_lock(self.log_file):
+                data, migrated = self._replay()
+                if migrated:
+                    self._write_compacted(data)
+        return apply_schema(data)
+
+    def _append_records(self, records):
+        """
+        Append records to the log and compact once it grows past the threshold.
+
+        The write holds the log's lock, so it cannot land between the replay
+        and the truncation of a compaction by another store object.
+        """
+        if not records:
+            return
+        lines = []
+        for record in records:
+            self.seq += 1
+            record["seq"] = self.seq
+            lines.append(json.dumps(record, default=_json_default))
+        with file_lock(self.log_file):
+            repair_tail(self.log_file)
+            with open(self.log_file, 'a') as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.log_records += len(records)
+        self._bump_version("log")
+        if self.log_records >= self.compact_every:
+            self.compact()
+
+    def append(self, df):
+        """
+        Append new emission rows.
+
+        Args:
+            df (pandas.DataFrame): Rows to add; rows without an entry_id get one
+
+        Returns:
+            pandas.DataFrame: The same rows with entry_id populated
+        """
+        df = df.copy()
+        if 'entry_id' not in df.columns:
+            df['entry_id'] = None
+        missing = df['entry_id'].isna()
+        df.loc[missing, 'entry_id'] = [uuid.uuid4().hex for _ in range(int(missing.sum()))]
+        self._append_records([{"op": "put", "row": row} for row in to_records(df)])
+        return df
+
+    def delete(self, entry_ids, dates=None):
+        """
+        Delete emission rows.
+
+        Args:
+            entry_ids (list): entry_id values of the rows to delete
+            dates (list, optional): Dates of those rows, used by stores that locate rows by date
+        """
+        self._append_records([{"op": "delete", "entry_id": entry_id} for entry_id in entry_ids])
+
+    def get(self, entry_ids, dates=None):
+        """
+        Get emission rows by entry_id.
+
+        Args:
+            entry_ids (list): entry_id values of the rows to get
+            dates (list, optional): Dates of those rows, used by stores that locate rows by date
+
+        Returns:
+            pandas.DataFrame: The matching rows
+        """
+        data = self.load()
+        return data[data['entry_id'].isin(list(entry_ids))]
+
+    def _write_compacted(self, df):
+        """Write rows as the new snapshot and start an empty log."""
+        if os.path.exists(self.snapshot_file):
+            try:
+                shutil.copy(self.snapshot_file, self.backup_file)
+            except Exception:
+                # Continue even if backup fails
+                pass
+        self._write_snapshot(df)
+        _atomic_write(self.meta_file, json.dumps({"snapshot_seq": self.seq}))
+        _atomic_write(self.log_file, "")
+        self.log_records = 0
+        self._bump_version("compact")
+
+    def compact(self, df=None):
+        """
+        Fold the record log into the snapshot.
+
+        Replay and truncation hold the log's lock, so records appended by other
+        store objects either make it into the snapshot or wait for the new log.
+
+        Args:
+            df (pandas.DataFrame, optional): Full data to write instead of replaying the log
+        """
+        with file_lock(self.log_file):
+            if df is None:
+                df, _ = self._replay()
+            self._write_compacted(df)
+
+    def query(self, start_date=None, end_date=None, scope=None, category=None):
+        """
+        Get emission rows matching the given filters.
+
+        Args:
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            scope (str, optional): Scope for filtering
+            category (str, optional): Category for filtering
+
+        Returns:
+            pandas.DataFrame: Matching rows
+        """
+        data = self.load()
+        if start_date and end_date:
+            data = data[(data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))]
+        if scope:
+            data = data[data['scope'] == scope]
+        if category:
+            data = data[data['category'] == category]
+        return data
+
+    def aggregate(self, group_by, start_date=None, end_date=None, scope=None, category=None):
+        """
+        Sum emissions and count entries per group.
+
+        Args:
+            group_by (list): Columns to group by; 'month' groups by YYYY-MM of the date
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            scope (str, optional): Scope for filtering
+            category (str, optional): Category for filtering
+
+        Returns:
+            pandas.DataFrame: One row per group with emissions_kgCO2e and entries columns
+        """
+        data = self.query(start_date, end_date, scope, category)
+        keys = [data['date'].dt.strftime('%Y-%m').rename('month') if col == 'month' else data[col] for col in group_by]
+        return (data.groupby(keys, observed=True)['emissions_kgCO2e']
+                .agg(emissions_kgCO2e='sum', entries='count').reset_index())
+
+    def import_json(self, file_path_or_buffer):
+        """
+        Replace the stored data with the rows of a JSON array file.
+
+        Args:
+            file_path_or_buffer: Path to JSON file or file-like object
+
+        Returns:
+            pandas.DataFrame: Imported data
+        """
+        if hasattr(file_path_or_buffer, 'read'):
+            rows = json.load(file_path_or_buffer)
+        else:
+            with open(file_path_or_buffer, 'r') as f:
+                rows = json.load(f)
+        self.compact(pd.DataFrame(rows) if rows else self.empty_frame())
+        return self.load()
+
+    def export_json(self, file_path=None):
+        """
+        Export the stored data as a JSON array.
+
+        Args:
+            file_path (str, optional): Path to save JSON file
+
+        Returns:
+            str or bool: JSON string if file_path is None, otherwise True
+        """
+        text = json.dumps(to_records(self.load()), indent=2, default=_json_default)
+        if file_path:
+            with open(file_path, 'w') as f:
+                f.write(text)
+            return True
+        return text
+
+
+class ArrowStore(EmissionsStore):
+    """
+    Emissions store with a columnar Arrow IPC snapshot.
+
+    Dates are stored as timestamps, numerics as float64 and repetitive text
+    columns dictionary-encoded. The snapshot is read through a memory map, so
+    a cold load decodes columns straight from the page cache instead of
+    parsing JSON into Python dicts. Arrow IPC is used rather than Parquet
+    because Parquet pages are compressed and cannot be memory-mapped.
+    """
+
+    def __init__(self, snapshot_file=config.ARROW_EMISSIONS_FILE, log_file=None,
+                 compact_every=config.LOG_COMPACTION_THRESHOLD):
+        """Initialize the ArrowStore class."""
+        if pa is None:
+            raise ImportError("The arrow storage backend requires pyarrow. Install it with: pip install pyarrow")
+        super().__init__(snapshot_file, log_file, compact_every)
+        # Bring over existing JSON data the first time the Arrow backend is used
+        if not os.path.exists(self.snapshot_file) and os.path.exists(config.EMISSIONS_FILE):
+            self.import_json(config.EMISSIONS_FILE)
+
+    def _arrow_schema(self, df):
+        """Build the Arrow schema for the columns of df."""
+        fields = []
+        for col in df.columns:
+            if col == 'date':
+                fields.append(pa.field(col, pa.timestamp('ns')))
+            elif col in NUMERIC_COLUMNS:
+                fields.append(pa.field(col, pa.float64()))
+            elif col in CATEGORICAL_COLUMNS:
+                fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+            else:
+                fields.append(pa.field(col, pa.string()))
+        return pa.schema(fields)
+
+    def _read_snapshot(self):
+        """Read the snapshot through a memory map."""
+        if not os.path.exists(self.snapshot_file):
+            return self.empty_frame()
+        source = pa.memory_map(self.snapshot_file, 'r')
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+    def _write_snapshot(self, df):
+        """Write the snapshot atomically as an uncompressed Arrow IPC file."""
+        data = df.copy()
+        for col in EMISSIONS_COLUMNS:
+            if col not in data.columns:
+                data[col] = None
+        if 'date' in data.columns:
+            data['date'] = pd.to_datetime(data['date'], errors='coerce')
+        for col in data.columns:
+            if col in NUMERIC_COLUMNS:
+                data[col] = pd.to_numeric(data[col], errors='coerce').astype('float64')
+            elif col != 'date':
+                data[col] = data[col].astype(object).where(data[col].notna(), None)
+                data[col] = data[col].map(lambda v: v if v is None else str(v))
+        table = pa.Table.from_pandas(data, schema=self._arrow_schema(data), preserve_index=False)
+
+        tmp_path = f"{self.snapshot_file}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, self.snapshot_file)
+
+
+class SQLiteStore(EmissionsStore):
+    """
+    Emissions store backed by an embedded SQLite database.
+
+    Rows live in a single indexed table, so inserts and deletes are single
+    transactions that touch only their own rows, and filtered queries and
+    aggregations are pushed down to SQL and return only the matching rows.
+    Needs nothing beyond the standard library `sqlite3` module.
+    """
+
+    pushdown = True
+    record_log = False
+
+    INDEXES = {
+        "idx_emissions_date": ["date"],
+        "idx_emissions_scope_category": ["scope", "category"],
+        "idx_emissions_facility": ["facility"],
+        "idx_emissions_business_unit": ["business_unit"],
+    }
+
+    def __init__(self, db_file=config.SQLITE_EMISSIONS_FILE):
+        """Initialize the SQLiteStore class."""
+        super().__init__(db_file)
+        self.db_file = db_file
+        is_new = not os.path.exists(db_file)
+        self._create_schema()
+        # Bring over existing JSON data the first time the SQLite backend is used
+        if is_new and os.path.exists(config.EMISSIONS_FILE):
+            self.import_json(config.EMISSIONS_FILE)
+
+    def _connect(self):
+        """Open a connection; one per operation keeps the store safe across Streamlit threads."""
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _create_schema(self):
+        """Create the emissions table and its indexes if they do not exist."""
+        columns = []
+        for col in EMISSIONS_COLUMNS:
+            if col == 'entry_id':
+                columns.append('"entry_id" TEXT UNIQUE NOT NULL')
+            elif col in NUMERIC_COLUMNS:
+                columns.append(f'"{col}" REAL')
+            else:
+                columns.append(f'"{col}" TEXT')
+        with self._connect() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS emissions ({', '.join(columns)})")
+            for name, cols in self.INDEXES.items():
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON emissions ({', '.join(cols)})")
+        conn.close()
+
+    def _table_columns(self, conn):
+        """Get the column names of the emissions table."""
+        return [row[1] for row in conn.execute("PRAGMA table_info(emissions)")]
+
+    def _insert(self, conn, df):
+        """
+        Insert rows, adding TEXT columns for any extra CSV fields.
+
+        A row with the entry_id of a stored row updates it in place, so it
+        keeps its rowid and its position in load().
+        """
+        known = self._table_columns(conn)
+        for col in df.columns:
+            if col not in known:
+                conn.execute(f'ALTER TABLE emissions ADD COLUMN "{col}" TEXT')
+        records = to_records(df)
+        if not records:
+            return
+        cols = list(df.columns)
+        placeholders = ", ".join("?" for _ in cols)
+        col_list = ", ".join(f'"{col}"' for col in cols)
+        updates = ", ".join(f'"{col}" = excluded."{col}"' for col in cols if col != 'entry_id')
+        conn.executemany(
+            f"INSERT INTO emissions ({col_list}) VALUES ({placeholders}) "
+            f"ON CONFLICT(entry_id) DO {'UPDATE SET ' + updates if updates else 'NOTHING'}",
+            [tuple(record[col] for col in cols) for record in records]
+        )
+
+    def load(self):
+        """
+        Load all emissions data in insertion order.
+
+        Returns:
+            pandas.DataFrame: Current emissions data
+        """
+        conn = self._connect()
+        try:
+            return apply_schema(pd.read_sql_query("SELECT * FROM emissions ORDER BY rowid", conn))
+        finally:
+            conn.close()
+
+    def append(self, df):
+        """
+        Append new emission rows in one transaction.
+
+        Args:
+            df (pandas.DataFrame): Rows to add; rows without an entry_id get one
+
+        Returns:
+            pandas.DataFrame: The same rows with entry_id populated
+        """
+        df = df.copy()
+        if 'entry_id' not in df.columns:
+            df['entry_id'] = None
+        missing = df['entry_id'].isna()
+        df.loc[missing, 'entry_id'] = [uuid.uuid4().hex for _ in range(int(missing.sum()))]
+        conn = self._connect()
+        try:
+            with conn:
+                self._insert(conn, df)
+        finally:
+            conn.close()
+        self._bump_version("append")
+        return df
+
+    def delete(self, entry_ids, dates=None):
+        """
+        Delete emission rows in one transaction.
+
+        Args:
+            entry_ids (list): entry_id values of the rows to delete
+            dates (list, optional): Unused; rows are located through the entry_id index
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("DELETE FROM emissions WHERE entry_id = ?", [(entry_id,) for entry_id in entry_ids])
+        finally:
+            conn.close()
+        self._bump_version("delete")
+
+    def get(self, entry_ids, dates=None):
+        """
+        Get emission rows by entry_id through the entry_id index.
+
+        Args:
+            entry_ids (list): entry_id values of the rows to get
+            dates (list, optional): Unused; rows are located through the entry_id index
+
+        Returns:
+            pandas.DataFrame: The matching rows
+        """
+        entry_ids = list(entry_ids)
+        conn = self._connect()
+        try:
+            # Stay below SQLite's limit on bound parameters per statement
+            frames = [
+                pd.read_sql_query(
+                    f"SELECT * FROM emissions WHERE entry_id IN ({', '.join('?' for _ in batch)})", conn, params=batch
+                )
+                for batch in (entry_ids[i:i + 500] for i in range(0, len(entry_ids), 500))
+            ]
+        finally:
+            conn.close()
+        return apply_schema(pd.concat(frames, ignore_index=True)) if frames else self.empty_frame()
+
+    def compact(self, df=None):
+        """
+        Replace the stored data with df, or reclaim free pages when df is None.
+
+        Args:
+            df (pandas.DataFrame, optional): Full data to write
+        """
+        conn = self._connect()
+        try:
+            if df is None:
+                conn.execute("VACUUM")
+                return
+            df = df.copy()
+            if 'entry_id' not in df.columns:
+                df['entry_id'] = None
+            missing = df['entry_id'].isna()
+            df.loc[missing, 'entry_id'] = [uuid.uuid4().hex for _ in range(int(missing.sum()))]
+            with conn:
+                conn.execute("DELETE FROM emissions")
+                self._insert(conn, df)
+        finally:
+            conn.close()
+        self._bump_version("compact")
+
+    def _where(self, start_date, end_date, scope, category):
+        """Build the WHERE clause and parameters for the common filters."""
+        clauses, params = [], []
+        if start_date and end_date:
+            clauses.append("date >= ? AND date <= ?")
+            params += [pd.Timestamp(start_date).strftime('%Y-%m-%d'), pd.Timestamp(end_date).strftime('%Y-%m-%d')]
+        if scope:
+            clauses.append("scope = ?")
+            params.append(scope)
+        if category:
+            clauses.append("category = ?")
+            params.append(category)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, start_date=None, end_date=None, scope=None, category=None):
+        """
+        Get emission rows matching the given filters using the table indexes.
+
+        Args:
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            scope (str, optional): Scope for filtering
+            category (str, optional): Category for filtering
+
+        Returns:
+            pandas.DataFrame: Matching rows
+        """
+        where, params = self._where(start_date, end_date, scope, category)
+        conn = self._connect()
+        try:
+            data = pd.read_sql_query(f"SELECT * FROM emissions{where} ORDER BY rowid", conn, params=params)
+        finally:
+            conn.close()
+        return apply_schema(data)
+
+    def aggregate(self, group_by, start_date=None, end_date=None, scope=None, category=None):
+        """
+        Sum emissions and count entries per group in SQL.
+
+        Args:
+            group_by (list): Columns to group by; 'month' groups by YYYY-MM of the date
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            scope (str, optional): Scope for filtering
+            category (str, optional): Category for filtering
+
+        Returns:
+            pandas.DataFrame: One row per group with emissions_kgCO2e and entries columns
+        """
+        conn = self._connect()
+        try:
+            known = self._table_columns(conn)
+            select = []
+            for col in group_by:
+                if col == 'month':
+                    select.append("substr(date, 1, 7) AS month")
+                elif col in known:
+                    select.append(f'"{col}"')
+                else:
+                    raise ValueError(f"Cannot group by unknown column '{col}'")
+            where, params = self._where(start_date, end_date, scope, category)
+            groups = ", ".join(f'"{col}"' for col in group_by)
+            sql = (f"SELECT {', '.join(select)}, SUM(emissions_kgCO2e) AS emissions_kgCO2e, COUNT(*) AS entries "
+                   f"FROM emissions{where} GROUP BY {groups} ORDER BY {groups}")
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+
+
+class PartitionedStore(EmissionsStore):
+    """
+    Emissions store split into one JSON partition per month.
+
+    A manifest records the row count and min/max date of every partition, so
+    date-bounded queries open only the partitions that overlap the requested
+    range, and adding an entry rewrites only its own month. Rows without a
+    valid date go to the "undated" partition, which every query reads.
+
+    An entry index (JSON lines of entry_id and partition key) records where
+    each entry is stored, so a row whose date moved to another month is
+    removed from its previous partition, and entries are deleted or fetched
+    without knowing their dates. It is rebuilt from the partitions when it
+    is missing.
+
+    Several store objects, in this process or others, may share a directory.
+    Every write holds a lock on the manifest and starts from the manifest
+    and entry index as they are on disk, and reads pick up the manifest
+    afresh, so no store object writes back a stale view of the partitions.
+    """
+
+    pushdown = True
+    record_log = False
+    UNDATED = "undated"
+
+    def __init__(self, partitions_dir=config.PARTITIONS_DIR):
+        """Initialize the PartitionedStore class."""
+        super().__init__(partitions_dir)
+        self.partitions_dir = partitions_dir
+        self.manifest_file = os.path.join(partitions_dir, "manifest.json")
+        self.entry_index_file = os.path.join(partitions_dir, "entry_index.jsonl")
+        is_new = not os.path.exists(self.manifest_file)
+        os.makedirs(partitions_dir, exist_ok=True)
+        self.manifest = self._read_manifest()
+        # Entry index as read so far: partition key by entry_id, the file it was read from and the bytes consumed
+        self._entry_keys = None
+        self._entry_index_signature = None
+        self._entry_index_offset = 0
+        # Bring over existing JSON data the first time the partitioned backend is used
+        if is_new and os.path.exists(config.EMISSIONS_FILE):
+            self.import_json(config.EMISSIONS_FILE)
+
+    def _read_manifest(self):
+        """Read the partition manifest."""
+        if not os.path.exists(self.manifest_file):
+            return {}
+        with open(self.manifest_file, 'r') as f:
+            return json.load(f)
+
+    def _partition_file(self, key):
+        """Get the path of a partition."""
+        return os.path.join(self.partitions_dir, f"{key}.json")
+
+    def _partition_keys(self, dates):
+        """Map dates to partition keys (YYYY-MM, or UNDATED when unparseable)."""
+        months = pd.to_datetime(pd.Series(dates), errors='coerce').dt.strftime('%Y-%m')
+        return months.fillna(self.UNDATED).values
+
+    def _read_partition(self, key):
+        """Read the rows of one partition."""
+        path = self._partition_file(key)
+        if not os.path.exists(path):
+            return self.empty_frame()
+        with open(path, 'r') as f:
+            rows = json.load(f)
+        return pd.DataFrame(rows) if rows else self.empty_frame()
+
+    def _write_partition(self, key, df):
+        """Write one partition and update its manifest entry."""
+        if len(df) == 0:
+            if os.path.exists(self._partition_file(key)):
+                os.remove(self._partition_file(key))
+            self.manifest.pop(key, None)
+            return
+        _atomic_write(self._partition_file(key), json.dumps(to_records(df), separators=(',', ':'), default=_json_default))
+        dates = pd.to_datetime(df['date'], errors='coerce')
+        self.manifest[key] = {
+            "rows": len(df),
+            "min_date": dates.min().strftime('%Y-%m-%d') if dates.notna().any() else None,
+            "max_date": dates.max().strftime('%Y-%m-%d') if dates.notna().any() else None,
+        }
+
+    def _entry_partitions(self):
+        """Get the partition key of every stored entry_id, reading what was added to the entry index since the last call."""
+        try:
+            stat = os.stat(self.entry_index_file)
+        except FileNotFoundError:
+            # Partitions written before the entry index existed
+            keys = {}
+            for key in sorted(self.manifest):
+                keys.update(dict.fromkeys(self._read_partition(key)['entry_id'], key))
+            self._write_entry_index(keys)
+            return self._entry_keys
+        # A rewritten or truncated index is read again from the start
+        signature = (stat.st_dev, stat.st_ino)
+        if self._entry_keys is None or signature != self._entry_index_signature or stat.st_size < self._entry_index_offset:
+            self._entry_keys, self._entry_index_signature, self._entry_index_offset = {}, signature, 0
+        if stat.st_size == self._entry_index_offset:
+            return self._entry_keys
+        with open(self.entry_index_file, 'rb') as f:
+            f.seek(self._entry_index_offset)
+            data = f.read()
+        # A final line without its line break is still being written, or torn; it is read once complete
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record["p"] is None:
+                self._entry_keys.pop(record["id"], None)
+            else:
+                self._entry_keys[record["id"]] = record["p"]
+        self._entry_index_offset += end
+        return self._entry_keys
+
+    def _write_entry_index(self, keys):
+        """Replace the entry index with the partition key of every entry."""
+        with file_lock(self.entry_index_file):
+            _atomic_write(self.entry_index_file, "".join(
+                json.dumps({"id": entry_id, "p": key}, default=_json_default) + "\n" for entry_id, key in keys.items()
+            ))
+            stat = os.stat(self.entry_index_file)
+        self._entry_keys = dict(keys)
+        self._entry_index_signature, self._entry_index_offset = (stat.st_dev, stat.st_ino), stat.st_size
+
+    def _record_entries(self, keys):
+        """Record the partition key of entries in the entry index; None records a delete."""
+        if not keys:
+            return
+        # Read before taking the lock too, as a missing index is rebuilt under the same lock
+        self._entry_partitions()
+        with file_lock(self.entry_index_file):
+            repair_tail(self.entry_index_file)
+            entry_keys = self._entry_partitions()
+            for entry_id, key in keys.items():
+                if key is None:
+                    entry_keys.pop(entry_id, None)
+                else:
+                    entry_keys[entry_id] = key
+            with open(self.entry_index_file, 'a') as f:
+                f.write("".join(
+                    json.dumps({"id": entry_id, "p": key}, default=_json_default) + "\n" for entry_id, key in keys.items()
+                ))
+                self._entry_index_offset = f.tell()
+
+    def _entry_keys_of(self, entry_ids, dates=None):
+        """Get the keys of the partitions holding some entries, by the entry index and their dates."""
+        entry_keys = self._entry_partitions()
+        keys = {entry_keys[entry_id] for entry_id in entry_ids if entry_id in entry_keys}
+        if dates is not None:
+            keys.update(self._partition_keys(dates))
+        return keys & set(self.manifest)
+
+    @contextmanager
+    def _writing(self):
+        """
+        Hold the manifest lock over a write, starting from the manifest on disk.
+
+        The manifest is written and the data version bumped when the block
+        completes; every change runs inside one.
+        """
+        with file_lock(self.manifest_file):
+            self.manifest = self._read_manifest()
+            yield
+            _atomic_write(self.manifest_file, json.dumps(dict(sorted(self.manifest.items())), indent=2))
+        self._bump_version("partitions")
+
+    def _overlapping(self, start_date=None, end_date=None):
+        """Get the keys of partitions that can hold rows in [start_date, end_date]."""
+        keys = sorted(self.manifest)
+        if not (start_date and end_date):
+            return keys
+        start = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+        end = pd.Timestamp(end_date).strftime('%Y-%m-%d')
+        return [
+            key for key in keys
+            if key == self.UNDATED or (self.manifest[key]["min_date"] <= end and self.manifest[key]["max_date"] >= start)
+        ]
+
+    def _read_partitions(self, keys):
+        """Concatenate the rows of several partitions."""
+        frames = [self._read_partition(key) for key in keys]
+        frames = [frame for frame in frames if len(frame) > 0]
+        if not frames:
+            return self.empty_frame()
+        return pd.concat(frames, ignore_index=True)
+
+    def load(self):
+        """
+        Load all emissions data, month by month.
+
+        Returns:
+            pandas.DataFrame: Current emissions data
+        """
+        self.manifest = self._read_manifest()
+        return apply_schema(self._read_partitions(sorted(self.manifest)))
+
+    def append(self, df):
+        """
+        Append new emission rows, rewriting only the months they fall in.
+
+        A row replacing a stored entry of another month is also removed from
+        that month's partition.
+
+        Args:
+            df (pandas.DataFrame): Rows to add; rows without an entry_id get one
+
+        Returns:
+            pandas.DataFrame: The same rows with entry_id populated
+        """
+        df = df.copy()
+        if 'entry_id' not in df.columns:
+            df['entry_id'] = None
+        missing = df['entry_id'].isna()
+        df.loc[missing, 'entry_id'] = [uuid.uuid4().hex for _ in range(int(missing.sum()))]
+        keys = self._partition_keys(df['date'])
+        with self._writing():
+            moved_from = self._entry_keys_of(df.loc[~missing.values, 'entry_id']) - set(keys)
+            for key in pd.unique(keys):
+                rows = df[keys == key]
+                existing = self._read_partition(key)
+                existing = existing[~existing['entry_id'].isin(rows['entry_id'])]
+                self._write_partition(key, pd.concat([existing, rows], ignore_index=True))
+            for key in moved_from:
+                existing = self._read_partition(key)
+                self._write_partition(key, existing[~existing['entry_id'].isin(df['entry_id'])])
+            self._record_entries(dict(zip(df['entry_id'], keys)))
+        return df
+
+    def delete(self, entry_ids, dates=None):
+        """
+        Delete emission rows.
+
+        Args:
+            entry_ids (list): entry_id values of the rows to delete
+            dates (list, optional): Dates of those rows; partitions they fall in are searched
+                as well as those the entry index points to
+        """
+        entry_ids = list(entry_ids)
+        with self._writing():
+            for key in self._entry_keys_of(entry_ids, dates):
+                existing = self._read_partition(key)
+                remaining = existing[~existing['entry_id'].isin(entry_ids)]
+                if len(remaining) != len(existing):
+                    self._write_partition(key, remaining)
+            self._record_entries(dict.fromkeys(entry_ids))
+
+    def get(self, entry_ids, dates=None):
+        """
+        Get emission rows by entry_id.
+
+        Args:
+            entry_ids (list): entry_id values of the rows to get
+            dates (list, optional): Dates of those rows; partitions they fall in are searched
+                as well as those the entry index points to
+
+        Returns:
+            pandas.DataFrame: The matching rows
+        """
+        entry_ids = list(entry_ids)
+        self.manifest = self._read_manifest()
+        data = apply_schema(self._read_partitions(sorted(self._entry_keys_of(entry_ids, dates))))
+        return data[data['entry_id'].isin(entry_ids)]
+
+    def compact(self, df=None):
+        """
+        Replace the stored data with df, repartitioning it by month.
+
+        Args:
+            df (pandas.DataFrame, optional): Full data to write; partitions are already compact when omitted
+        """
+        if df is None:
+            return
+        df = df.copy()
+        if 'entry_id' not in df.columns:
+            df['entry_id'] = None
+        missing = df['entry_id'].isna()
+        df.loc[missing, 'entry_id'] = [uuid.uuid4().hex for _ in range(int(missing.sum()))]
+        keys = self._partition_keys(df['date'])
+        with self._writing():
+            for key in set(self.manifest) - set(keys):
+                self._write_partition(key, self.empty_frame())
+            for key in pd.unique(keys):
+                self._write_partition(key, df[keys == key])
+            self._write_entry_index(dict(zip(df['entry_id'], keys)))
+
+    def query(self, start_date=None, end_date=None, scope=None, category=None):
+        """
+        Get emission rows matching the given filters, reading only overlapping partitions.
+
+        Args:
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            scope (str, optional): Scope for filtering
+            category (str, optional): Category for filtering
+
+        Returns:
+            pandas.DataFrame: Matching rows
+        """
+        self.manifest = self._read_manifest()
+        data = apply_schema(self._read_partitions(self._overlapping(start_date, end_date)))
+        if start_date and end_date:
+            data = data[(data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))]
+        if scope:
+            data = data[data['scope'] == scope]
+        if category:
+            data = data[data['category'] == category]
+        return data
+
+
+# Storage backends selectable through config.STORAGE_BACKEND
+STORAGE_BACKENDS = {
+    "json": EmissionsStore,
+    "arrow": ArrowStore,
+    "sqlite": SQLiteStore,
+    "partitioned": PartitionedStore,
+}
+
+
+def open_store(backend=None):
+    """
+    Open the configured emissions store.
+
+    Args:
+        backend (str, optional): Backend name, defaults to config.STORAGE_BACKEND
+
+    Returns:
+        EmissionsStore: Store instance
+    """
+    backend = backend or config.STORAGE_BACKEND
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend '{backend}'. Choose from: {', '.join(STORAGE_BACKENDS)}")
+    return STORAGE_BACKENDS[backend]()
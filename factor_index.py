@@ -0,0 +1,222 @@
+"""
+Factor usage index for Enterprise CarbonScope application.
+Keeps a persistent reverse index from emission factor ids to the entries
+that use them, so a factor update recomputes and rewrites only those
+entries instead of rescanning the whole ledger.
+"""
+
+import json
+import os
+
+import pandas as pd
+
+import config
+from emission_factors import get_registry
+from emissions_store import file_lock, repair_tail
+from units import conversion_factors
+
+
+class FactorIndex:
+    """
+    Persistent reverse index from factor_id to entry ids.
+
+    Each indexed entry also keeps its date, so stores that partition by date
+    can read just the affected partitions. Changes are appended to a JSON
+    lines file; the index is read lazily on first use and brought in step
+    with the data on load.
+    """
+
+    def __init__(self, index_file=config.FACTOR_INDEX_FILE):
+        """Initialize the FactorIndex class."""
+        self.index_file = index_file
+        self._by_factor = None
+        self._by_id = None
+
+    def _ensure_loaded(self):
+        """Read the index file on first use."""
+        if self._by_factor is not None:
+            return
+        self._by_factor, self._by_id = {}, {}
+        if not os.path.exists(self.index_file):
+            return
+        with open(self.index_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn final line from an interrupted write
+                    break
+                if record.get("del"):
+                    self._forget(record["id"])
+                else:
+                    self._remember(record["f"], record["id"], record.get("d"))
+
+    def invalidate(self):
+        """Drop the in-memory maps, so the index file is read again on next use."""
+        self._by_factor = self._by_id = None
+
+    def _remember(self, factor_id, entry_id, date):
+        """Add one entry to the in-memory maps."""
+        self._forget(entry_id)
+        self._by_factor.setdefault(factor_id, {})[entry_id] = date
+        self._by_id[entry_id] = factor_id
+
+    def _forget(self, entry_id):
+        """Remove one entry from the in-memory maps."""
+        factor_id = self._by_id.pop(entry_id, None)
+        if factor_id is None:
+            return
+        entries = self._by_factor.get(factor_id, {})
+        entries.pop(entry_id, None)
+        if not entries:
+            self._by_factor.pop(factor_id, None)
+
+    def _write(self, records):
+        """Append records to the index file, under its lock so writers of other processes do not interleave."""
+        if not records:
+            return
+        with file_lock(self.index_file):
+            repair_tail(self.index_file)
+            with open(self.index_file, 'a') as f:
+                f.write("\n".join(json.dumps(record) for record in records) + "\n")
+
+    def __len__(self):
+        """Number of indexed entries."""
+        self._ensure_loaded()
+        return len(self._by_id)
+
+    def add(self, df):
+        """
+        Index stored rows that reference a factor.
+
+        Args:
+            df (pandas.DataFrame): Rows as stored, with entry_id populated
+        """
+        self._ensure_loaded()
+        if len(df) == 0 or 'factor_id' not in df.columns:
+            return
+        linked = df[df['factor_id'].notna()]
+        dates = pd.to_datetime(linked['date'], errors='coerce').dt.strftime('%Y-%m-%d')
+        records = []
+        for factor_id, entry_id, date in zip(linked['factor_id'], linked['entry_id'], dates.where(dates.notna(), None)):
+            self._remember(factor_id, entry_id, date)
+            records.append({"f": factor_id, "id": entry_id, "d": date})
+        # Rows stored again without a factor reference are no longer linked
+        unlinked = [entry_id for entry_id in df.loc[df['factor_id'].isna(), 'entry_id'] if entry_id in self._by_id]
+        for entry_id in unlinked:
+            self._forget(entry_id)
+        self._write(records + [{"id": entry_id, "del": True} for entry_id in unlinked])
+
+    def remove(self, entry_ids):
+        """
+        Remove deleted rows from the index.
+
+        Args:
+            entry_ids (list): entry_id values of the deleted rows
+        """
+        self._ensure_loaded()
+        removed = [entry_id for entry_id in entry_ids if entry_id in self._by_id]
+        for entry_id in removed:
+            self._forget(entry_id)
+        self._write([{"id": entry_id, "del": True} for entry_id in removed])
+
+    def sync(self, data):
+        """
+        Bring the index in step with the stored entries.
+
+        Only entries that were added, removed or relinked since the index was
+        last written are recorded.
+
+        Args:
+            data (pandas.DataFrame): All stored emissions rows
+        """
+        self._ensure_loaded()
+        linked = data[data['factor_id'].notna()] if 'factor_id' in data.columns else data.iloc[0:0]
+        indexed = linked['entry_id'].map(self._by_id)
+        self.add(linked[indexed.values != linked['factor_id'].values])
+        stale = set(self._by_id) - set(linked['entry_id'])
+        self.remove(list(stale))
+
+    def entries(self, factor_ids):
+        """
+        Get the entries that use any of the given factors.
+
+        Args:
+            factor_ids (list): Factor ids
+
+        Returns:
+            pandas.DataFrame: factor_id, entry_id and date of each entry
+        """
+        self._ensure_loaded()
+        rows = [
+            (factor_id, entry_id, date)
+            for factor_id in factor_ids
+            for entry_id, date in self._by_factor.get(factor_id, {}).items()
+        ]
+        return pd.DataFrame(rows, columns=['factor_id', 'entry_id', 'date'])
+
+
+def recalculate_for_factors(store, factor_index, changes, registry=None):
+    """
+    Recompute emissions of the entries that use changed factors.
+
+    Affected entries are found through the reverse index, read by entry_id,
+    recomputed in one vectorized pass and written back; no other entry is
+    read or rewritten. Each entry takes the factor of its key in force on its
+    date, so a newly published interval moves entries onto the new factor.
+    Factors apply per their own unit, so entries kept in another unit of the
+    same dimension are converted.
+
+    Args:
+        store (EmissionsStore): Store holding the entries, or a SharedDataset to publish the
+            rewritten rows through
+        factor_index (FactorIndex): Reverse index from factor ids to entries
+        changes (pandas.DataFrame): factor_id, unit, old_factor and new_factor per changed
+            factor, as returned by FactorRegistry.update
+        registry (FactorRegistry, optional): Registry to resolve factors from, defaults
+            to the shared registry
+
+    Returns:
+        tuple: (updated rows, per-factor summary with entries, emissions_before,
+                emissions_after and delta columns)
+    """
+    summary_columns = [
+        'factor_id', 'old_factor', 'new_factor', 'entries', 'emissions_before', 'emissions_after', 'delta'
+    ]
+    affected = factor_index.entries(changes['factor_id'].tolist())
+    if len(affected) == 0:
+        return store.empty_frame(), pd.DataFrame(columns=summary_columns)
+
+    registry = registry or get_registry()
+    rows = store.get(affected['entry_id'].tolist(), dates=affected['date'].tolist()).copy()
+    changes = changes.set_index('factor_id')
+    previous_ids = rows['factor_id'].copy()
+    before = rows['emissions_kgCO2e'].copy()
+    resolved = registry.in_force(rows['factor_id'].values, rows['date'].values)
+    resolved.index = rows.index
+    entry_units = rows['unit'].astype(object)
+    factor_units = resolved['factor_unit']
+    # An entry kept in MWh against a per-kWh factor gets the factor per MWh
+    per_unit = conversion_factors(entry_units, factor_units.where(factor_units.notna(), entry_units))
+    new_factors = resolved['emission_factor'].fillna(previous_ids.map(changes['new_factor'])).astype(float)
+    rows['emission_factor'] = new_factors * pd.Series(per_unit, index=rows.index).fillna(1.0)
+    rows['emissions_kgCO2e'] = rows['quantity'] * rows['emission_factor']
+    rows['factor_id'] = resolved['factor_id']
+    store.append(rows)
+    factor_index.add(rows)
+
+    summary = pd.DataFrame({
+        'factor_id': previous_ids.values,
+        'emissions_before': before.values,
+        'emissions_after': rows['emissions_kgCO2e'].values
+    }).groupby('factor_id').agg(
+        entries=('emissions_before', 'size'),
+        emissions_before=('emissions_before', 'sum'),
+        emissions_after=('emissions_after', 'sum')
+    )
+    summary['delta'] = summary['emissions_after'] - summary['emissions_before']
+    summary = summary.join(changes[['old_factor', 'new_factor']]).reset_index()
+    return rows, summary[summary_columns]
@@ -0,0 +1,100 @@
+"""
+Import-time profiler for Enterprise CarbonScope application.
+Runs the imports app.py makes at start-up in a fresh interpreter with
+python -X importtime and reports where the cold-start time goes.
+
+Usage:
+    python profile_imports.py [--top 25] [module ...]
+"""
+
+import argparse
+import ast
+import re
+import subprocess
+import sys
+
+# One line of python -X importtime output: self and cumulative microseconds, then the indented module name
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def startup_imports(script='app.py'):
+    """
+    Get the modules a script imports at its top level.
+
+    Imports inside functions or page branches are not part of start-up and are skipped.
+
+    Args:
+        script (str, optional): Path of the script
+
+    Returns:
+        list: Module names, in import order
+    """
+    with open(script, 'r') as f:
+        tree = ast.parse(f.read(), filename=script)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def profile(modules):
+    """
+    Import modules in a fresh interpreter under -X importtime.
+
+    Args:
+        modules (list): Module names
+
+    Returns:
+        tuple: (list of (module, self µs, cumulative µs, depth) records, list of
+                modules that failed to import with their errors)
+    """
+    code = "\n".join(
+        f"try:\n    import {module}\nexcept Exception as e:\n    print({module!r} + '\\t' + repr(e))"
+        for module in modules
+    )
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    records = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    failures = [line.split('\t', 1) for line in result.stdout.splitlines() if '\t' in line]
+    return records, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', help="Modules to profile; defaults to the start-up imports of app.py")
+    parser.add_argument('--top', type=int, default=25, help="Number of modules listed")
+    args = parser.parse_args()
+
+    modules = args.modules or startup_imports()
+    records, failures = profile(modules)
+    # Modules imported directly by the profiled code are at depth 0; they add up to the total
+    total_us = sum(cumulative for _, _, cumulative, depth in records if depth == 0)
+    print(f"Start-up imports: {total_us / 1000:.1f} ms for {len(records)} modules\n")
+
+    print("Slowest imports (cumulative, including their own imports):")
+    for name, _, cumulative, depth in sorted(records, key=lambda record: -record[2])[:args.top]:
+        print(f"  {cumulative / 1000:9.1f} ms  {'  ' * min(depth, 4)}{name}")
+
+    print("\nTime by top-level package (self time of all its modules):")
+    packages = {}
+    for name, self_us, _, _ in records:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {self_us / 1000:9.1f} ms  {package}")
+
+    if failures:
+        print("\nNot importable in this environment:")
+        for module, error in failures:
+            print(f"  {module}: {error}")
+
+
+if __name__ == '__main__':
+    main()
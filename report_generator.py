@@ -4,20 +4,72 @@ Generates PDF reports and visualizations.
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from fpdf import FPDF
 import os
 from datetime import datetime
 import base64
 from io import BytesIO
+from result_cache import ResultCache
+
+
+def _filters(start_date=None, end_date=None, scope=None, category=None):
+    """Normalize filter arguments into a hashable cache key part."""
+    return (
+        pd.Timestamp(start_date) if start_date is not None else None,
+        pd.Timestamp(end_date) if end_date is not None else None,
+        scope,
+        category
+    )
+
+
+def _group_totals(data, columns):
+    """Sum emissions by columns; 'month' is derived from the date as YYYY-MM."""
+    if 'month' in columns:
+        data = data.assign(month=pd.to_datetime(data['date']).dt.strftime('%Y-%m'))
+    return data.groupby(columns, observed=True)['emissions_kgCO2e'].sum().reset_index()
+
 
 class ReportGenerator:
-    def __init__(self, data_handler):
+    def __init__(self, data_handler, cache=None):
         """Initialize the ReportGenerator class."""
         self.data_handler = data_handler
+        # Aggregations and figures are cached per data version and filters
+        self.cache = cache if cache is not None else ResultCache()
+    
+    def _filtered_data(self, filters):
+        """Get the data handler's data for filters, cached until the data changes."""
+        return self.cache.get_or_compute(
+            (self.data_handler.store.data_version, 'data', filters),
+            lambda: self.data_handler.get_filtered_data(*filters)
+        )
+    
+    def _totals(self, data, filters, columns):
+        """Sum emissions by columns; cached when the data came from filters."""
+        if filters is None:
+            return _group_totals(data, columns)
+        return self.cache.get_or_compute(
+            (self.data_handler.store.data_version, 'totals', tuple(columns), filters),
+            lambda: _group_totals(data, columns)
+        )
+    
+    def _chart(self, name, build, data, filters):
+        """
+        Build a chart from explicit data, or from filtered data with caching.
+        
+        Args:
+            name (str): Chart name, part of the cache key
+            build (callable): Called as build(data, filters) to create the figure
+            data (pandas.DataFrame): Explicit data, or None to use filters
+            filters (tuple): Normalized filters
+            
+        Returns:
+            plotly.graph_objects.Figure: The figure; cached figures are shared and must not be modified
+        """
+        if data is not None:
+            return build(data, None)
+        return self.cache.get_or_compute(
+            (self.data_handler.store.data_version, name, filters),
+            lambda: build(self._filtered_data(filters), filters)
+        )
     
     def generate_pdf_report(self, file_path=None, start_date=None, end_date=None, company_info=None):
         """
@@ -34,11 +86,15 @@ class ReportGenerator:
         """
         try:
             # Get filtered data
-            data = self.data_handler.get_filtered_data(start_date, end_date)
+            filters = _filters(start_date, end_date)
+            data = self._filtered_data(filters)
             
             if len(data) == 0:
                 return False, "No data available for the selected period."
             
+            # fpdf is only needed here, so it is not imported at app start-up
+            from fpdf import FPDF
+            
             # Create PDF
             pdf = FPDF()
             pdf.add_page()
@@ -70,14 +126,14 @@ class ReportGenerator:
             pdf.cell(0, 10, f"Total Emissions: {total_emissions:.2f} kgCO2e", 0, 1)
             
             # Emissions by scope
-            scope_data = data.groupby('scope')['emissions_kgCO2e'].sum().reset_index()
+            scope_data = self._totals(data, filters, ['scope'])
             pdf.ln(5)
             pdf.cell(0, 10, "Emissions by Scope:", 0, 1)
             for _, row in scope_data.iterrows():
                 pdf.cell(0, 10, f"{row['scope']}: {row['emissions_kgCO2e']:.2f} kgCO2e ({row['emissions_kgCO2e'] / total_emissions * 100:.1f}%)", 0, 1)
             
             # Emissions by category
-            category_data = data.groupby('category')['emissions_kgCO2e'].sum().reset_index()
+            category_data = self._totals(data, filters, ['category'])
             pdf.ln(5)
             pdf.cell(0, 10, "Top Categories:", 0, 1)
             for _, row in category_data.nlargest(5, 'emissions_kgCO2e').iterrows():
@@ -141,17 +197,29 @@ class ReportGenerator:
         except Exception as e:
             return False, f"Error generating PDF report: {str(e)}"
     
-    def create_scope_pie_chart(self, data):
+    def create_scope_pie_chart(self, data=None, start_date=None, end_date=None, scope=None, category=None):
         """
         Create pie chart of emissions by scope.
         
         Args:
-            data (pandas.DataFrame): Emissions data
+            data (pandas.DataFrame, optional): Emissions data; when omitted the data handler's
+                data is filtered and the figure is cached until the data changes
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            scope (str, optional): Scope for filtering
+            category (str, optional): Category for filtering
             
         Returns:
             plotly.graph_objects.Figure: Pie chart figure
         """
-        scope_data = data.groupby('scope')['emissions_kgCO2e'].sum().reset_index()
+        return self._chart('scope_pie', self._scope_pie_chart, data,
+                           _filters(start_date, end_date, scope, category))
+    
+    # The figure builders import plotly themselves, so it loads on the first chart, not at start-up
+    def _scope_pie_chart(self, data, filters):
+        """Build the figure for create_scope_pie_chart."""
+        import plotly.express as px
+        scope_data = self._totals(data, filters, ['scope'])
         fig = px.pie(
             scope_data, 
             values='emissions_kgCO2e', 
@@ -171,17 +239,28 @@ class ReportGenerator:
         )
         return fig
     
-    def create_category_bar_chart(self, data):
+    def create_category_bar_chart(self, data=None, start_date=None, end_date=None, scope=None, category=None):
         """
         Create bar chart of emissions by category.
         
         Args:
-            data (pandas.DataFrame): Emissions data
+            data (pandas.DataFrame, optional): Emissions data; when omitted the data handler's
+                data is filtered and the figure is cached until the data changes
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            scope (str, optional): Scope for filtering
+            category (str, optional): Category for filtering
             
         Returns:
             plotly.graph_objects.Figure: Bar chart figure
         """
-        category_data = data.groupby('category')['emissions_kgCO2e'].sum().reset_index()
+        return self._chart('category_bar', self._category_bar_chart, data,
+                           _filters(start_date, end_date, scope, category))
+    
+    def _category_bar_chart(self, data, filters):
+        """Build the figure for create_category_bar_chart."""
+        import plotly.express as px
+        category_data = self._totals(data, filters, ['category'])
         category_data = category_data.sort_values('emissions_kgCO2e', ascending=False)
         fig = px.bar(
             category_data, 
@@ -200,16 +279,28 @@ class ReportGenerator:
         )
         return fig
     
-    def create_time_series_chart(self, data):
+    def create_time_series_chart(self, data=None, start_date=None, end_date=None, scope=None, category=None):
         """
         Create time series chart of emissions over time.
         
         Args:
-            data (pandas.DataFrame): Emissions data
+            data (pandas.DataFrame, optional): Emissions data; when omitted the data handler's
+                data is filtered and the figure is cached until the data changes
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            scope (str, optional): Scope for filtering
+            category (str, optional): Category for filtering
             
         Returns:
             plotly.graph_objects.Figure: Line chart figure
         """
+        return self._chart('time_series', self._time_series_chart, data,
+                           _filters(start_date, end_date, scope, category))
+    
+    def _time_series_chart(self, data, filters):
+        """Build the figure for create_time_series_chart."""
+        import plotly.express as px
+        import plotly.graph_objects as go
         if 'date' not in data.columns or len(data) == 0:
             # Create empty figure if no data
             fig = go.Figure()
@@ -223,9 +314,7 @@ class ReportGenerator:
             return fig
         
         # Group by month and scope
-        time_data = data.copy()
-        time_data['month'] = pd.to_datetime(time_data['date']).dt.strftime('%Y-%m')
-        time_data = time_data.groupby(['month', 'scope'])['emissions_kgCO2e'].sum().reset_index()
+        time_data = self._totals(data, filters, ['month', 'scope'])
         
         fig = px.line(
             time_data, 
@@ -244,16 +333,27 @@ class ReportGenerator:
         )
         return fig
     
-    def create_activity_treemap(self, data):
+    def create_activity_treemap(self, data=None, start_date=None, end_date=None, scope=None, category=None):
         """
         Create treemap of emissions by scope, category, and activity.
         
         Args:
-            data (pandas.DataFrame): Emissions data
+            data (pandas.DataFrame, optional): Emissions data; when omitted the data handler's
+                data is filtered and the figure is cached until the data changes
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            scope (str, optional): Scope for filtering
+            category (str, optional): Category for filtering
             
         Returns:
             plotly.graph_objects.Figure: Treemap figure
         """
+        return self._chart('activity_treemap', self._activity_treemap, data,
+                           _filters(start_date, end_date, scope, category))
+    
+    def _activity_treemap(self, data, filters):
+        """Build the figure for create_activity_treemap."""
+        import plotly.express as px
         fig = px.treemap(
             data,
             path=['scope', 'category', 'activity'],
@@ -272,16 +372,28 @@ class ReportGenerator:
         )
         return fig
     
-    def create_monthly_comparison_chart(self, data):
+    def create_monthly_comparison_chart(self, data=None, start_date=None, end_date=None, scope=None, category=None):
         """
         Create bar chart comparing emissions by month.
         
         Args:
-            data (pandas.DataFrame): Emissions data
+            data (pandas.DataFrame, optional): Emissions data; when omitted the data handler's
+                data is filtered and the figure is cached until the data changes
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            scope (str, optional): Scope for filtering
+            category (str, optional): Category for filtering
             
         Returns:
             plotly.graph_objects.Figure: Bar chart figure
         """
+        return self._chart('monthly_comparison', self._monthly_comparison_chart, data,
+                           _filters(start_date, end_date, scope, category))
+    
+    def _monthly_comparison_chart(self, data, filters):
+        """Build the figure for create_monthly_comparison_chart."""
+        import plotly.express as px
+        import plotly.graph_objects as go
         if 'date' not in data.columns or len(data) == 0:
             # Create empty figure if no data
             fig = go.Figure()
@@ -295,9 +407,7 @@ class ReportGenerator:
             return fig
         
         # Group by month
-        monthly_data = data.copy()
-        monthly_data['month'] = pd.to_datetime(monthly_data['date']).dt.strftime('%Y-%m')
-        monthly_data = monthly_data.groupby('month')['emissions_kgCO2e'].sum().reset_index()
+        monthly_data = self._totals(data, filters, ['month'])
         
         fig = px.bar(
             monthly_data,
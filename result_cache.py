@@ -0,0 +1,129 @@
+"""
+Result cache for Enterprise CarbonScope application.
+Memoizes aggregations and chart figures under keys that include the data
+version, so Streamlit reruns reuse them until the data changes.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import config
+
+
+def estimate_size(value):
+    """
+    Estimate the memory held by a cached value.
+
+    Args:
+        value: DataFrame, Series, Plotly figure or any other object
+
+    Returns:
+        int: Approximate size in bytes
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if hasattr(value, 'to_plotly_json'):
+        # Figures hold their data as plain lists; the JSON length tracks it closely
+        return len(value.to_json())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    LRU cache bounded by entry count and estimated size.
+
+    Keys should include the store's data_version, so entries of older
+    versions are never hit again and age out of the cache. Cached values are
+    shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_entries=config.RESULT_CACHE_MAX_ENTRIES, max_bytes=config.RESULT_CACHE_MAX_BYTES):
+        """Initialize the ResultCache class."""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        """Number of cached results."""
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """int: Estimated bytes held by the cache."""
+        return self._bytes
+
+    def get(self, key, default=None):
+        """
+        Get a cached result and mark it as recently used.
+
+        Args:
+            key: Hashable cache key
+            default: Value returned on a miss
+
+        Returns:
+            The cached value, or default
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        """
+        Cache a result, evicting least recently used entries beyond the limits.
+
+        Values larger than max_bytes on their own are not cached.
+
+        Args:
+            key: Hashable cache key
+            value: Result to cache
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def get_or_compute(self, key, compute):
+        """
+        Get a cached result, computing and caching it on a miss.
+
+        Args:
+            key: Hashable cache key
+            compute (callable): Called without arguments to produce the result
+
+        Returns:
+            The cached or computed result
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop every cached result."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,246 @@
+"""
+Shared dataset for Enterprise CarbonScope application.
+Holds one copy of the emissions data per process for every Streamlit session
+to read, so memory follows the size of the data rather than the number of
+sessions.
+"""
+
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from emissions_schema import append_rows
+
+
+class SharedDataset:
+    """
+    Read-mostly emissions data shared by all sessions of a process.
+
+    The DataFrame handed out is never modified in place. Appends and deletes
+    made through the dataset write to the store and then publish a new frame
+    under a lock (copy-on-write), so a session still holding the previous
+    frame keeps a consistent view. The frame is stamped with the store's
+    data version; when the store was changed by other means, such as another
+    process or a store object written to directly, the next read loads it
+    again.
+
+    Indexes kept next to the data (duplicate hashes, factor references,
+    aggregates) must change together with it, so a whole write runs inside
+    writing(): the store write, the index updates and the publish happen
+    while other sessions neither write nor read the data. Writes made inside
+    writing() are published together when it ends, so a chunked import
+    builds one new frame rather than one per chunk.
+
+    Stores keep per-object state such as the log position or the partition
+    manifest, so every load and write opens the store afresh, as each rerun
+    of the app does.
+
+    The dataset offers the store methods that the CSV importers and the
+    factor recalculation use, so it can be passed in place of a store and
+    the rows they write are applied to the shared frame instead of
+    reloading it.
+    """
+
+    def __init__(self, open_store):
+        """
+        Initialize the SharedDataset class.
+
+        Args:
+            open_store (callable): Opens the store the data is loaded from and written to
+        """
+        self.open_store = open_store
+        self.version = None
+        self._data = None
+        self._lock = threading.RLock()
+        self._depth = 0
+        # Writes not yet published: (rows written or None for a delete, entry ids written)
+        self._pending = []
+        # Data versions are kept per store location, so any store object can report them
+        self._versions = open_store()
+
+    @contextmanager
+    def writing(self):
+        """
+        Hold the dataset's lock over a whole write path.
+
+        The lock is reentrant, so append, delete and reload can be called
+        inside, e.g.
+
+            with dataset.writing():
+                rows = dataset.append(rows)
+                aggregates.add(rows)
+
+        Reads wait until the block ends, so no session sees the data
+        without the index updates that belong to it.
+        """
+        with self._lock:
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._flush()
+
+    @property
+    def data_version(self):
+        """int: The store's current data version, for keying cached results."""
+        return self._versions.data_version
+
+    def _current(self):
+        """Check whether the published frame, with the pending writes, reflects the store's latest version."""
+        return self._data is not None and self.version == self._versions.data_version
+
+    def _published(self):
+        """Get the published frame with pending writes applied, or None if the store moved past it."""
+        if not self._current():
+            return None
+        self._flush()
+        return self._data
+
+    def data(self):
+        """
+        Get the current emissions data, loading it if the store changed since it was read.
+
+        Returns:
+            pandas.DataFrame: Shared emissions data; it must not be modified
+        """
+        with self._lock:
+            data = self._published()
+            return data if data is not None else self.reload()
+
+    def reload(self):
+        """
+        Load the data from the store and publish it.
+
+        Returns:
+            pandas.DataFrame: Shared emissions data
+        """
+        with self._lock:
+            # Stamped with the version seen before loading; a write in between triggers another load
+            version = self._versions.data_version
+            self._data, self.version, self._pending = self.open_store().load(), version, []
+            return self._data
+
+    def empty_frame(self):
+        """Create an empty emissions dataframe."""
+        return self._versions.empty_frame()
+
+    def get(self, entry_ids, dates=None):
+        """
+        Get stored emission rows by entry_id, from the published frame while it is current.
+
+        Args:
+            entry_ids (list): entry_id values of the rows to get
+            dates (list, optional): Dates of those rows, used by date-partitioned stores
+
+        Returns:
+            pandas.DataFrame: The matching rows
+        """
+        with self._lock:
+            data = self._published()
+            if data is None:
+                return self.open_store().get(entry_ids, dates=dates)
+        return data[data['entry_id'].isin(list(entry_ids))]
+
+    def query(self, start_date=None, end_date=None, scope=None, category=None):
+        """
+        Get stored emission rows matching the given filters, from the published frame while it is current.
+
+        Args:
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            scope (str, optional): Scope for filtering
+            category (str, optional): Category for filtering
+
+        Returns:
+            pandas.DataFrame: Matching rows
+        """
+        with self._lock:
+            data = self._published()
+            if data is None:
+                return self.open_store().query(start_date, end_date, scope, category)
+        if start_date and end_date:
+            data = data[(data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))]
+        if scope:
+            data = data[data['scope'] == scope]
+        if category:
+            data = data[data['category'] == category]
+        return data
+
+    def clear(self):
+        """Publish empty data, e.g. when the stored data could not be read."""
+        with self._lock:
+            self._data, self.version, self._pending = self.empty_frame(), self._versions.data_version, []
+
+    def append(self, rows):
+        """
+        Write rows to the store and publish the data with them added.
+
+        Args:
+            rows (pandas.DataFrame): Typed rows; rows with the entry_id of a stored
+                entry replace it
+
+        Returns:
+            pandas.DataFrame: The rows as stored, with entry_id populated
+        """
+        with self._lock:
+            return self._write(lambda store: store.append(rows), lambda rows: (rows, rows['entry_id']))
+
+    def delete(self, entry_ids, dates=None):
+        """
+        Delete entries from the store and publish the data without them.
+
+        Args:
+            entry_ids (list): entry_id values of the entries to delete
+            dates (list, optional): Dates of the entries, used by date-partitioned stores
+        """
+        entry_ids = list(entry_ids)
+        with self._lock:
+            self._write(lambda store: store.delete(entry_ids, dates=dates), lambda _: (None, entry_ids))
+
+    def _write(self, write, change):
+        """
+        Run a store write and queue its change for publishing.
+
+        The change is applied to the published frame only if the store moved
+        by this write alone; after a write of another process in between, the
+        next read loads the store instead.
+
+        Args:
+            write (callable): Called with a freshly opened store
+            change (callable): Maps the write's result to (rows written or None, entry ids written)
+
+        Returns:
+            The write's result
+        """
+        current = self._current()
+        own = self._versions.own_changes
+        result = write(self.open_store())
+        version = self._versions.data_version
+        if current and version - self.version == self._versions.own_changes - own:
+            self._pending.append(change(result))
+            self.version = version
+            if self._depth == 0:
+                self._flush()
+        else:
+            self._pending, self.version = [], None
+        return result
+
+    def _flush(self):
+        """Publish the pending writes as one new frame."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        # The last write of an entry wins, so the writes are walked from the last one back
+        written, frames = set(), []
+        for rows, entry_ids in reversed(pending):
+            if rows is not None:
+                rows = rows[~rows['entry_id'].isin(written)].drop_duplicates(subset='entry_id', keep='last')
+                frames.append(rows)
+            written.update(entry_ids)
+        data = self._data[~self._data['entry_id'].isin(written)]
+        if frames:
+            data = append_rows(data, pd.concat(frames[::-1], ignore_index=True))
+        self._data = data.reset_index(drop=True)
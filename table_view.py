@@ -0,0 +1,156 @@
+"""
+Table view for Enterprise CarbonScope application.
+Serves the Existing Emissions Data table one page at a time: sorting and
+filtering run on the server against orderings and category codes computed
+once per dataset, and only the visible rows are sent to the browser.
+"""
+
+import numpy as np
+import pandas as pd
+
+from emissions_schema import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS
+
+# Columns the table can be sorted by
+SORTABLE_COLUMNS = ['date'] + CATEGORICAL_COLUMNS + NUMERIC_COLUMNS
+
+
+class TableView:
+    """
+    Sorted, filtered and paged access to emissions rows.
+
+    The view wraps one published frame and never copies it. The ascending
+    order of a column is computed on first use and kept, and the descending
+    order is derived from it, so changing the sort or the page only takes a
+    gather over precomputed positions. Categorical filters compare category
+    codes, and date ranges are cut from the date order with two binary
+    searches.
+    """
+
+    def __init__(self, data):
+        """
+        Initialize the TableView class.
+
+        Args:
+            data (pandas.DataFrame): Typed emissions data; it must not be modified
+        """
+        self.data = data
+        self._orders = {}
+
+    def __len__(self):
+        """Number of rows in the view."""
+        return len(self.data)
+
+    def options(self, column):
+        """
+        Get the values present in a categorical column, for filter choices.
+
+        Args:
+            column (str): One of the categorical columns
+
+        Returns:
+            list: Sorted distinct values
+        """
+        values = self.data[column]
+        return sorted(values.cat.categories[np.unique(values.cat.codes[values.cat.codes >= 0])].astype(str))
+
+    def _order(self, column):
+        """
+        Get the row positions in ascending order of a column, missing values last.
+
+        Returns:
+            tuple: (positions, number of rows with a value)
+        """
+        if column not in self._orders:
+            values = self.data[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Rank categories by their labels, so codes sort like the values they stand for
+                ranks = np.empty(len(values.cat.categories), dtype=np.int64)
+                ranks[np.argsort(values.cat.categories.astype(str), kind='stable')] = np.arange(len(ranks))
+                codes = values.cat.codes.to_numpy()
+                keys = np.where(codes >= 0, ranks[codes], len(ranks))
+                present = int((codes >= 0).sum())
+            else:
+                keys = values.to_numpy()
+                present = int(values.notna().sum())
+            # NaN and NaT sort last
+            self._orders[column] = (np.argsort(keys, kind='stable'), present)
+        return self._orders[column]
+
+    def _sorted(self, column, ascending):
+        """Get the row positions sorted by a column; missing values stay last when descending."""
+        if column is None:
+            return np.arange(len(self.data))
+        order, present = self._order(column)
+        if ascending:
+            return order
+        return np.concatenate([order[:present][::-1], order[present:]])
+
+    def _mask(self, filters, search, start_date, end_date):
+        """Get a boolean mask of the rows passing every filter, or None when nothing is filtered."""
+        mask = None
+        for column, value in (filters or {}).items():
+            if value is None:
+                continue
+            values = self.data[column]
+            code = values.cat.categories.get_indexer([value])[0]
+            matches = values.cat.codes.to_numpy() == code if code >= 0 else np.zeros(len(values), dtype=bool)
+            mask = matches if mask is None else mask & matches
+        if search:
+            # Matched against the distinct activity names, then selected by code
+            activities = self.data['activity']
+            wanted = np.flatnonzero(activities.cat.categories.astype(str).str.contains(search, case=False, regex=False))
+            matches = np.isin(activities.cat.codes.to_numpy(), wanted)
+            mask = matches if mask is None else mask & matches
+        if start_date is not None or end_date is not None:
+            order, present = self._order('date')
+            dates = self.data['date'].to_numpy()[order[:present]]
+            first = 0 if start_date is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date)), 'left')
+            last = present if end_date is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date)), 'right')
+            matches = np.zeros(len(self.data), dtype=bool)
+            matches[order[first:max(first, last)]] = True
+            mask = matches if mask is None else mask & matches
+        return mask
+
+    def count(self, filters=None, search=None, start_date=None, end_date=None):
+        """
+        Count the rows passing the filters.
+
+        Args:
+            filters (dict, optional): Value to keep by categorical column; None means any
+            search (str, optional): Text the activity must contain, ignoring case
+            start_date (datetime, optional): First date to keep
+            end_date (datetime, optional): Last date to keep
+
+        Returns:
+            int: Number of matching rows
+        """
+        mask = self._mask(filters, search, start_date, end_date)
+        return len(self.data) if mask is None else int(mask.sum())
+
+    def page(self, sort_by=None, ascending=True, filters=None, search=None, start_date=None, end_date=None,
+             page=0, page_size=50):
+        """
+        Get one page of the sorted and filtered rows.
+
+        Args:
+            sort_by (str, optional): One of SORTABLE_COLUMNS; stored order when omitted
+            ascending (bool, optional): Sort direction
+            filters (dict, optional): Value to keep by categorical column; None means any
+            search (str, optional): Text the activity must contain, ignoring case
+            start_date (datetime, optional): First date to keep
+            end_date (datetime, optional): Last date to keep
+            page (int, optional): Zero-based page number
+            page_size (int, optional): Rows per page
+
+        Returns:
+            tuple: (rows of the page with their positions in the data as index,
+                    number of rows passing the filters)
+        """
+        if sort_by is not None and sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort by '{sort_by}'. Choose from: {', '.join(SORTABLE_COLUMNS)}")
+        positions = self._sorted(sort_by, ascending)
+        mask = self._mask(filters, search, start_date, end_date)
+        if mask is not None:
+            positions = positions[mask[positions]]
+        start = page * page_size
+        return self.data.iloc[positions[start:start + page_size]], len(positions)
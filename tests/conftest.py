@@ -0,0 +1,33 @@
+"""
+Shared test fixtures for Enterprise CarbonScope application.
+"""
+
+import pandas as pd
+import pytest
+
+from emissions_schema import apply_schema
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Run each test in its own directory, so the relative data paths of config never reach real data."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    return tmp_path
+
+
+def make_rows(n, start='2024-01-01', scope='Scope 1', category='Stationary Combustion', emissions=10.0, **columns):
+    """Build n typed emissions rows, one day apart."""
+    return apply_schema(pd.DataFrame({
+        'date': pd.date_range(start, periods=n, freq='D'),
+        'scope': scope,
+        'category': category,
+        'activity': 'Diesel',
+        'facility': 'Plant 1',
+        'business_unit': 'Manufacturing',
+        'quantity': 1.0,
+        'unit': 'liters',
+        'emission_factor': emissions,
+        'emissions_kgCO2e': emissions,
+        **columns,
+    }))
@@ -0,0 +1,45 @@
+"""
+Tests for matching free-text activity names.
+"""
+
+import pandas as pd
+
+from activity_matcher import ACTIVITY_ALIASES, ACTIVITY_REGIONS, ActivityMatcher
+
+KEYS = [
+    ("Stationary Combustion", "Diesel"), ("Mobile Combustion", "Diesel"),
+    ("Electricity", "India Grid"), ("Electricity", "Indonesia Grid"), ("Electricity", "Japan Grid"),
+    ("Electricity", "Solar Power"), ("Electricity", "Wind Power"),
+]
+
+
+def match(activities, categories, countries=None):
+    matcher = ActivityMatcher(KEYS, ACTIVITY_ALIASES, ACTIVITY_REGIONS)
+    return matcher.match_column(
+        pd.Series(activities), pd.Series(categories), None if countries is None else pd.Series(countries)
+    )
+
+
+def test_exact_alias_and_fuzzy_matches():
+    result = match(['diesel', 'DG set', 'rooftop solar pv'], ['Stationary Combustion', 'Stationary Combustion',
+                                                              'Electricity'])
+    assert result['status'].tolist() == ['exact', 'matched', 'matched']
+    assert result['activity'].tolist() == ['Diesel', 'Diesel', 'Solar Power']
+
+
+def test_same_name_in_two_categories_is_ambiguous_without_category():
+    result = match(['Diesel'], [None])
+    assert result['status'].tolist() == ['ambiguous']
+    assert 'Mobile Combustion / Diesel' in result['candidates'].iloc[0]
+
+
+def test_region_specific_activity_needs_the_country():
+    result = match(['Grid Electricity', 'state electricity board', 'Grid Electricity'], ['Electricity'] * 3,
+                   [None, 'Japan', 'India'])
+    assert result['status'].tolist() == ['ambiguous', 'unmatched', 'matched']
+    assert result['activity'].iloc[2] == 'India Grid'
+
+
+def test_region_specific_activity_named_as_written_matches_anywhere():
+    result = match(['India Grid'], ['Electricity'], ['Japan'])
+    assert result[['activity', 'status']].values.tolist() == [['India Grid', 'exact']]
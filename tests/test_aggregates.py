@@ -0,0 +1,129 @@
+"""
+Tests for the persistent aggregate store.
+"""
+
+import json
+import threading
+
+import pandas as pd
+
+from aggregates import EmissionsAggregates
+from conftest import make_rows
+
+
+def scope_totals(aggregates):
+    return dict(zip(aggregates.by('scope')['scope'], aggregates.by('scope')['emissions_kgCO2e']))
+
+
+def test_reload_after_interleaved_writers():
+    ours = EmissionsAggregates('data/aggregates.jsonl')
+    theirs = EmissionsAggregates('data/aggregates.jsonl')
+    # Both load before either writes
+    assert len(ours) == len(theirs) == 0
+    ours.add(make_rows(1, scope='Scope 1', emissions=10.0, entry_id=['a']))
+    theirs.add(make_rows(1, scope='Scope 3', category='Business Travel', emissions=99.0, entry_id=['b']))
+
+    reloaded = EmissionsAggregates('data/aggregates.jsonl')
+    assert scope_totals(reloaded) == {'Scope 1': 10.0, 'Scope 3': 99.0}
+    assert len(reloaded) == 2
+
+
+def test_delete_of_entry_added_by_another_writer():
+    ours = EmissionsAggregates('data/aggregates.jsonl')
+    theirs = EmissionsAggregates('data/aggregates.jsonl')
+    assert len(ours) == len(theirs) == 0
+    ours.add(make_rows(2, entry_id=['a', 'b']))
+    theirs.remove(['a'])
+
+    assert len(EmissionsAggregates('data/aggregates.jsonl')) == 1
+
+
+def test_add_replace_and_remove_match_groupby():
+    rows = pd.concat([
+        make_rows(4, scope='Scope 1', emissions=5.0, entry_id=['a', 'b', 'c', 'd']),
+        make_rows(2, start='2024-02-10', scope='Scope 2', category='Electricity', emissions=7.0, entry_id=['e', 'f']),
+    ], ignore_index=True)
+    aggregates = EmissionsAggregates('data/aggregates.jsonl')
+    aggregates.add(rows)
+    replaced = rows.iloc[[0]].copy()
+    replaced['emissions_kgCO2e'] = 50.0
+    aggregates.add(replaced)
+    aggregates.remove(['f'])
+
+    expected = rows[rows['entry_id'] != 'f'].copy()
+    expected.loc[expected['entry_id'] == 'a', 'emissions_kgCO2e'] = 50.0
+    assert aggregates.total() == expected['emissions_kgCO2e'].sum() == 72.0
+    assert scope_totals(EmissionsAggregates('data/aggregates.jsonl')) == {'Scope 1': 65.0, 'Scope 2': 7.0}
+    assert aggregates.period_totals('2024-01-02', '2024-02-10') == 22.0
+    assert aggregates.rollup(['period'])['emissions_kgCO2e'].tolist() == [65.0, 7.0]
+
+
+def test_file_is_compacted_as_entries_are_replaced():
+    aggregates = EmissionsAggregates('data/aggregates.jsonl')
+    rows = make_rows(10, entry_id=[f"e{i}" for i in range(10)])
+    aggregates.add(rows)
+    for value in range(10):
+        changed = rows.copy()
+        changed['emissions_kgCO2e'] = float(value)
+        aggregates.add(changed)
+
+    with open('data/aggregates.jsonl') as f:
+        lines = f.read().splitlines()
+    assert len(lines) <= 2 * (10 + 1)
+    reloaded = EmissionsAggregates('data/aggregates.jsonl')
+    assert len(reloaded) == 10
+    assert reloaded.total() == 90.0
+
+
+def test_sync_rebuilds_positional_format():
+    with open('data/aggregates.jsonl', 'w') as f:
+        f.write(json.dumps({"k": ['Scope 1'] + [''] * 9}) + "\n")
+        f.write(json.dumps({"id": "a", "g": 0, "d": 0, "e": 1.0}) + "\n")
+    data = make_rows(1, entry_id=['a'])
+    aggregates = EmissionsAggregates('data/aggregates.jsonl')
+    aggregates.sync(data)
+
+    assert scope_totals(EmissionsAggregates('data/aggregates.jsonl')) == {'Scope 1': 10.0}
+
+
+def test_sync_rebuilds_when_scope_changed_outside_add():
+    data = make_rows(2, entry_id=['a', 'b'])
+    aggregates = EmissionsAggregates('data/aggregates.jsonl')
+    aggregates.sync(data)
+    data['scope'] = pd.Categorical(['Scope 1', 'Scope 2'])
+    aggregates.sync(data)
+
+    assert scope_totals(aggregates) == {'Scope 1': 10.0, 'Scope 2': 10.0}
+
+
+def test_concurrent_sessions_share_one_instance():
+    aggregates = EmissionsAggregates('data/aggregates.jsonl')
+    errors = []
+
+    def write(worker):
+        try:
+            for batch in range(5):
+                ids = [f"w{worker}b{batch}e{i}" for i in range(4)]
+                aggregates.add(make_rows(4, start=f"2024-0{batch + 1}-01", entry_id=ids))
+                aggregates.remove(ids[:1])
+        except Exception as e:
+            errors.append(e)
+
+    def read():
+        try:
+            for _ in range(20):
+                aggregates.invalidate()
+                aggregates.by('scope')
+                aggregates.rollup(['period'])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)] + [threading.Thread(target=read)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(aggregates) == 4 * 5 * 3
+    assert EmissionsAggregates('data/aggregates.jsonl').total() == aggregates.total() == 600.0
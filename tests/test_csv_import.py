@@ -0,0 +1,112 @@
+"""
+Tests for applying corrected CSV re-exports.
+"""
+
+import io
+
+import pandas as pd
+
+from aggregates import EmissionsAggregates
+from csv_import import bulk_import_csv, fingerprint, import_csv_chunked, upsert_csv
+from data_handler import DataHandler
+from dedup_index import DedupIndex
+from emissions_store import EmissionsStore
+
+HEADER = "date,scope,category,activity,facility,quantity,unit,emission_factor,notes\n"
+
+
+def write_csv(path, lines):
+    path.write_text(HEADER + "".join(line + "\n" for line in lines))
+    return str(path)
+
+
+def test_upsert_inserts_updates_and_deletes_by_natural_key(tmp_path):
+    store = EmissionsStore('data/emissions.json')
+    dedup, aggregates = DedupIndex('data/dedup_index.jsonl'), EmissionsAggregates('data/aggregates.jsonl')
+    first = write_csv(tmp_path / 'january.csv', [
+        "2024-01-05,Scope 1,Stationary Combustion,Diesel,Plant 1,100,liter,2.5,INV-1",
+        "2024-01-06,Scope 1,Stationary Combustion,Diesel,Plant 1,200,liter,2.5,INV-2",
+        "2024-01-07,Scope 1,Stationary Combustion,Diesel,Plant 1,300,liter,2.5,INV-3",
+    ])
+    success, message, changed, _ = upsert_csv(store, first, dedup=dedup, aggregates=aggregates)
+    assert success and changed == 3
+    stored_ids = store.load().set_index('notes')['entry_id']
+
+    corrected = write_csv(tmp_path / 'january_corrected.csv', [
+        "2024-01-05,Scope 1,Stationary Combustion,Diesel,Plant 1,110,liter,2.5,INV-1",
+        "2024-01-06,Scope 1,Stationary Combustion,Diesel,Plant 1,200,liter,2.5,INV-2",
+        "2024-01-07,Scope 1,Stationary Combustion,Diesel,Plant 1,50,liter,2.5,INV-4",
+    ])
+    success, message, changed, _ = upsert_csv(store, corrected, dedup=dedup, aggregates=aggregates)
+    assert success
+    assert message.startswith("Applied correction: 1 inserted, 1 updated, 1 deleted, 1 unchanged")
+    assert changed == 3
+
+    data = store.load().set_index('notes').sort_index()
+    assert data.index.tolist() == ['INV-1', 'INV-2', 'INV-4']
+    assert data['emissions_kgCO2e'].tolist() == [275.0, 500.0, 125.0]
+    # Updated and unchanged rows keep their entry ids
+    assert data.loc['INV-1', 'entry_id'] == stored_ids['INV-1']
+    assert data.loc['INV-2', 'entry_id'] == stored_ids['INV-2']
+    assert aggregates.total() == 900.0
+    assert len(dedup) == 3
+
+
+def test_reapplying_the_same_file_changes_nothing(tmp_path):
+    store = EmissionsStore('data/emissions.json')
+    source = write_csv(tmp_path / 'january.csv', [
+        "2024-01-05,Scope 1,Stationary Combustion,Diesel,Plant 1,100,liter,2.5,INV-1",
+        "2024-01-05,Scope 1,Stationary Combustion,Diesel,Plant 1,120,liter,2.5,INV-1",
+    ])
+    upsert_csv(store, source)
+    before = store.load()
+    success, message, changed, _ = upsert_csv(store, source)
+
+    assert success and changed == 0
+    assert "1 rows were superseded" in message
+    pd.testing.assert_frame_equal(store.load(), before)
+    assert before['quantity'].tolist() == [120.0]
+
+
+def test_text_sources_import_like_their_bytes(tmp_path):
+    lines = [
+        "2024-01-05,Scope 1,Stationary Combustion,Diesel,Plant 1,100,liter,2.5,INV-1",
+        "2024-01-06,Scope 1,Stationary Combustion,Diesel,Plant 1,200,liter,2.5,INV-2",
+    ]
+    text = HEADER + "".join(line + "\n" for line in lines)
+    assert fingerprint(io.StringIO(text)) == fingerprint(io.BytesIO(text.encode('utf-8')))
+
+    success, message, _ = DataHandler().import_csv(io.StringIO(text))
+    assert success, message
+    assert sorted(EmissionsStore('data/emissions.json').load()['notes']) == ['INV-1', 'INV-2']
+
+    store = EmissionsStore('data/emissions.json')
+    source = io.StringIO(text)
+    success, message, imported, _ = import_csv_chunked(store, source, chunksize=1)
+    assert success and imported == 2
+    # The caller's source is left open and rewound
+    assert source.read() == text
+    assert upsert_csv(store, io.StringIO(text))[2] == 0
+    assert bulk_import_csv(store, [io.StringIO(text)], max_workers=1)[2] == 2
+
+
+def test_data_handler_applies_imports_without_reloading(tmp_path, monkeypatch):
+    handler = DataHandler()
+    loads = []
+    load = EmissionsStore.load
+    monkeypatch.setattr(EmissionsStore, 'load', lambda store: loads.append(1) or load(store))
+    first = write_csv(tmp_path / 'january.csv', [
+        "2024-01-05,Scope 1,Stationary Combustion,Diesel,Plant 1,100,liter,2.5,INV-1",
+        "2024-01-06,Scope 1,Stationary Combustion,Diesel,Plant 1,200,liter,2.5,INV-2",
+    ])
+    assert handler.import_csv(first)[0]
+    corrected = write_csv(tmp_path / 'january_corrected.csv', [
+        "2024-01-05,Scope 1,Stationary Combustion,Diesel,Plant 1,110,liter,2.5,INV-1",
+    ])
+    assert handler.upsert_csv(corrected)[0]
+
+    assert loads == []
+    assert sorted(handler.emissions_data['emissions_kgCO2e']) == [275.0, 500.0]
+    assert handler.get_emissions_summary()['total_emissions'] == 775.0
+    stored = load(EmissionsStore('data/emissions.json'))
+    assert sorted(stored['entry_id']) == sorted(handler.emissions_data['entry_id'])
@@ -0,0 +1,69 @@
+"""
+Tests for the duplicate index.
+"""
+
+import pandas as pd
+
+from conftest import make_rows
+from dedup_index import DUPLICATE_FLAG, DedupIndex, row_hashes
+
+
+def indexed(rows):
+    dedup = DedupIndex('data/dedup_index.jsonl')
+    dedup.add(rows)
+    return dedup
+
+
+def test_hashes_ignore_formatting():
+    rows = make_rows(1, entry_id=['a'])
+    reformatted = rows.astype(object).copy()
+    reformatted['date'] = '2024-01-01'
+    reformatted['activity'] = '  DIESEL '
+    reformatted['quantity'] = 1.0000000001
+    assert row_hashes(rows).tolist() == row_hashes(reformatted).tolist()
+
+
+def test_skip_drops_stored_and_repeated_rows():
+    dedup = indexed(make_rows(2, entry_id=['a', 'b']))
+    incoming = pd.concat([make_rows(3), make_rows(1, start='2024-01-03')], ignore_index=True)
+    rows, duplicates = dedup.deduplicate(incoming, 'skip')
+    assert rows['date'].dt.strftime('%Y-%m-%d').tolist() == ['2024-01-03']
+    assert len(duplicates) == 3
+
+
+def test_update_takes_the_stored_entry_id():
+    dedup = indexed(make_rows(2, entry_id=['a', 'b']))
+    rows, _ = dedup.deduplicate(make_rows(3), 'update')
+    assert rows['entry_id'].tolist()[:2] == ['a', 'b']
+    assert pd.isna(rows['entry_id'].iloc[2])
+
+
+def test_flag_keeps_duplicates_under_new_ids():
+    dedup = indexed(make_rows(1, entry_id=['a']))
+    rows, duplicates = dedup.deduplicate(make_rows(1, entry_id=['a'], notes=['invoice 7']), 'flag')
+    assert rows['notes'].tolist() == [f"{DUPLICATE_FLAG} invoice 7"]
+    new_id = rows['entry_id'].iloc[0]
+    assert new_id != 'a' and len(new_id) == 32 and int(new_id, 16) >= 0
+    assert len(duplicates) == 1
+
+
+def test_index_survives_reload_and_follows_replacements():
+    dedup = indexed(make_rows(2, entry_id=['a', 'b']))
+    changed = make_rows(1, entry_id=['a'], emissions=3.0)
+    dedup.add(changed)
+    dedup.remove(['b'])
+
+    reloaded = DedupIndex('data/dedup_index.jsonl')
+    assert len(reloaded) == 1
+    rows, _ = reloaded.deduplicate(pd.concat([changed, make_rows(2)], ignore_index=True), 'skip')
+    # The replaced and the deleted row no longer count as stored
+    assert rows['date'].dt.strftime('%Y-%m-%d').tolist() == ['2024-01-01', '2024-01-02']
+
+
+def test_invalidate_picks_up_entries_indexed_elsewhere():
+    dedup = indexed(make_rows(1, entry_id=['a']))
+    DedupIndex('data/dedup_index.jsonl').add(make_rows(1, start='2024-01-02', entry_id=['b']))
+    assert len(dedup) == 1
+    dedup.invalidate()
+    rows, duplicates = dedup.deduplicate(make_rows(2), 'skip')
+    assert len(rows) == 0 and len(duplicates) == 2
@@ -0,0 +1,95 @@
+"""
+Tests for as-of emission factor lookups.
+"""
+
+import pandas as pd
+
+from emission_factors import FactorRegistry
+
+
+def registry():
+    factors = FactorRegistry()
+    factors.add_table(pd.DataFrame([
+        {'category': 'Electricity', 'activity': 'Grid', 'country': '', 'unit': 'kWh',
+         'valid_from': '2022-01-01', 'factor': 0.5},
+        {'category': 'Electricity', 'activity': 'Grid', 'country': '', 'unit': 'kWh',
+         'valid_from': '2023-01-01', 'factor': 0.4},
+        {'category': 'Electricity', 'activity': 'Grid', 'country': 'India', 'unit': 'kWh',
+         'valid_from': '2022-01-01', 'valid_to': '2022-12-31', 'factor': 0.8},
+        {'category': 'Electricity', 'activity': '', 'country': '', 'unit': 'kWh', 'factor': 0.3},
+    ]), source='test')
+    return factors
+
+
+def factor(factors, activity, country=None, date=None):
+    found = factors.lookup('Electricity', activity, country=country, date=date)
+    return found and found['factor']
+
+
+def test_lookup_picks_the_factor_in_force_on_the_date():
+    factors = registry()
+    assert factor(factors, 'Grid', date='2021-06-01') == 0.3
+    assert factor(factors, 'Grid', date='2022-06-01') == 0.5
+    assert factor(factors, 'Grid', date='2023-01-01') == 0.4
+    assert factor(factors, 'Grid', date='2030-01-01') == 0.4
+
+
+def test_country_factor_applies_only_within_its_interval():
+    factors = registry()
+    # valid_to is the last day in force; after it the country falls back to the default in force
+    assert factor(factors, 'Grid', 'India', '2022-12-31') == 0.8
+    assert factor(factors, 'Grid', 'India', pd.Timestamp('2022-12-31 18:00')) == 0.8
+    assert factor(factors, 'Grid', 'India', '2023-01-01') == 0.4
+    assert factor(factors, 'Grid', 'Japan', '2022-06-01') == 0.5
+
+
+def test_undated_lookup_only_matches_undated_factors():
+    factors = registry()
+    assert factor(factors, 'Grid') == 0.3
+    assert factor(factors, 'Unknown', date='2022-06-01') == 0.3
+    assert factors.lookup('Heat', 'Steam') is None
+
+
+def test_lookup_frame_matches_single_lookups():
+    factors = registry()
+    rows = pd.DataFrame({
+        'category': ['Electricity'] * 4,
+        'activity': ['Grid', 'Grid', 'Grid', 'Grid'],
+        'country': ['India', 'India', None, 'India'],
+        'date': ['2022-02-01', '2023-02-01', '2022-02-01', '2022-02-01'],
+    })
+    resolved = factors.lookup_frame(rows)
+    assert resolved['emission_factor'].tolist() == [0.8, 0.4, 0.5, 0.8]
+    assert resolved['factor_id'].iloc[0] == resolved['factor_id'].iloc[3]
+
+
+def test_update_reports_changed_values_and_shortened_intervals():
+    factors = registry()
+    changes = factors.update(pd.DataFrame([
+        {'category': 'Electricity', 'activity': 'Grid', 'country': '', 'unit': 'kWh',
+         'valid_from': '2022-01-01', 'factor': 0.55},
+        {'category': 'Electricity', 'activity': 'Grid', 'country': '', 'unit': 'kWh',
+         'valid_from': '2024-01-01', 'factor': 0.35},
+    ]))
+    assert sorted(changes['old_factor'].tolist()) == [0.4, 0.5]
+    assert factor(factors, 'Grid', date='2022-06-01') == 0.55
+    assert factor(factors, 'Grid', date='2024-06-01') == 0.35
+
+
+def test_in_force_follows_references_to_the_current_interval():
+    factors = registry()
+    linked = factors.lookup('Electricity', 'Grid', date='2022-06-01')['factor_id']
+    resolved = factors.in_force([linked, linked, 'missing'], ['2022-03-01', '2023-03-01', '2023-03-01'])
+    assert resolved['emission_factor'].tolist()[:2] == [0.5, 0.4]
+    assert pd.isna(resolved['emission_factor'].iloc[2])
+
+
+def test_valid_to_is_inclusive_up_to_a_gap_before_the_next_factor():
+    factors = FactorRegistry()
+    factors.add_table(pd.DataFrame([
+        {'category': 'Heat', 'activity': 'Steam', 'valid_from': '2024-01-01', 'valid_to': '2024-06-30', 'factor': 0.2},
+        {'category': 'Heat', 'activity': 'Steam', 'valid_from': '2024-09-01', 'factor': 0.25},
+    ]))
+    dates = ['2024-06-30', '2024-07-01', '2024-08-31', '2024-09-01']
+    resolved = factors.lookup_frame(pd.DataFrame({'category': 'Heat', 'activity': 'Steam', 'date': dates}))
+    assert resolved['emission_factor'].fillna(0).tolist() == [0.2, 0, 0, 0.25]
@@ -0,0 +1,91 @@
+"""
+Tests for the record log of the emissions store.
+"""
+
+import json
+
+from conftest import make_rows
+from emissions_store import EmissionsStore, repair_tail
+
+
+def test_replay_applies_log_over_snapshot():
+    store = EmissionsStore('data/emissions.json', compact_every=100)
+    rows = store.append(make_rows(3))
+    store.delete([rows['entry_id'].iloc[0]])
+    changed = rows.iloc[[1]].copy()
+    changed['emissions_kgCO2e'] = 99.0
+    store.append(changed)
+
+    reopened = EmissionsStore('data/emissions.json', compact_every=100)
+    data = reopened.load()
+    assert list(data['entry_id']) == [rows['entry_id'].iloc[2], rows['entry_id'].iloc[1]]
+    assert list(data['emissions_kgCO2e']) == [10.0, 99.0]
+    assert reopened.seq == store.seq == 5
+    assert reopened.log_records == 5
+
+
+def test_compaction_keeps_current_rows():
+    store = EmissionsStore('data/emissions.json', compact_every=4)
+    rows = store.append(make_rows(3))
+    store.delete([rows['entry_id'].iloc[0]])
+
+    assert store.log_records == 0
+    with open(store.log_file) as f:
+        assert f.read() == ""
+    assert list(EmissionsStore('data/emissions.json').load()['entry_id']) == list(rows['entry_id'].iloc[1:])
+
+
+def test_append_after_torn_write():
+    store = EmissionsStore('data/emissions.json', compact_every=100)
+    first = store.append(make_rows(1))
+    with open(store.log_file, 'a') as f:
+        f.write('{"op": "put", "row": {"date": "2024-')
+
+    # Opening and loading ignore the torn line
+    reopened = EmissionsStore('data/emissions.json', compact_every=100)
+    assert list(reopened.load()['entry_id']) == list(first['entry_id'])
+
+    second = reopened.append(make_rows(1, start='2024-02-01'))
+    with open(store.log_file) as f:
+        lines = f.read().splitlines()
+    assert [json.loads(line)['row']['entry_id'] for line in lines] == [first['entry_id'].iloc[0],
+                                                                       second['entry_id'].iloc[0]]
+    assert len(EmissionsStore('data/emissions.json').load()) == 2
+
+
+def test_load_skips_torn_line_inside_log():
+    store = EmissionsStore('data/emissions.json', compact_every=100)
+    first = store.append(make_rows(1))
+    # A log written before tails were repaired: the next record ran into the torn line
+    with open(store.log_file, 'a') as f:
+        f.write('{"op": "put", "row": {"da{"op": "delete", "entry_id": "x", "seq": 7}\n')
+    second = store.append(make_rows(1, start='2024-02-01'))
+
+    data = EmissionsStore('data/emissions.json').load()
+    assert list(data['entry_id']) == [first['entry_id'].iloc[0], second['entry_id'].iloc[0]]
+
+
+def test_repair_tail_keeps_complete_last_record(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    path.write_text('{"a": 1}\n{"b": 2}')
+    repair_tail(str(path))
+    assert path.read_text() == '{"a": 1}\n{"b": 2}\n'
+
+    path.write_text('{"a": 1}\n{"b": ')
+    repair_tail(str(path))
+    assert path.read_text() == '{"a": 1}\n'
+
+    path.write_text('{"b": ')
+    repair_tail(str(path))
+    assert path.read_text() == ''
+
+
+def test_compaction_keeps_rows_appended_by_another_store():
+    ours = EmissionsStore('data/emissions.json', compact_every=100)
+    theirs = EmissionsStore('data/emissions.json', compact_every=100)
+    rows = ours.append(make_rows(2))
+    more = theirs.append(make_rows(2, start='2024-03-01'))
+    ours.compact()
+
+    data = EmissionsStore('data/emissions.json').load()
+    assert set(data['entry_id']) == set(rows['entry_id']) | set(more['entry_id'])
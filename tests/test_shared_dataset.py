@@ -0,0 +1,143 @@
+"""
+Tests for the emissions data shared by the sessions of a process.
+"""
+
+import threading
+
+import pandas as pd
+
+from conftest import make_rows
+from csv_import import import_csv_chunked, upsert_csv
+from emission_factors import FactorRegistry
+from emissions_store import EmissionsStore
+from factor_index import FactorIndex, recalculate_for_factors
+from shared_dataset import SharedDataset
+
+
+def open_store():
+    return EmissionsStore('data/emissions.json')
+
+
+class CountingStore(EmissionsStore):
+    """Store recording every full load, to tell in-place updates from reloads."""
+
+    def __init__(self, *args, loads=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loads = loads
+
+    def load(self):
+        self.loads.append(1)
+        return super().load()
+
+
+def test_append_and_delete_publish_new_frames():
+    dataset = SharedDataset(open_store)
+    before = dataset.reload()
+    rows = dataset.append(make_rows(3))
+    changed = rows.iloc[[0]].copy()
+    changed['emissions_kgCO2e'] = 1.0
+    dataset.append(changed)
+    dataset.delete([rows['entry_id'].iloc[1]])
+
+    data = dataset.data()
+    assert len(before) == 0
+    assert sorted(data['emissions_kgCO2e']) == [1.0, 10.0]
+    assert set(data['entry_id']) == set(open_store().load()['entry_id'])
+
+
+def test_write_through_another_store_is_picked_up():
+    dataset = SharedDataset(open_store)
+    dataset.reload()
+    rows = open_store().append(make_rows(2))
+    assert list(dataset.data()['entry_id']) == list(rows['entry_id'])
+
+
+def test_reads_wait_for_the_write_path():
+    dataset = SharedDataset(open_store)
+    dataset.reload()
+    seen = []
+    reader = threading.Thread(target=lambda: seen.append(len(dataset.data())))
+    with dataset.writing():
+        dataset.append(make_rows(1))
+        reader.start()
+        reader.join(0.2)
+        # Index updates would run here; the reader must not see the data yet
+        assert reader.is_alive() and seen == []
+    reader.join()
+    assert seen == [1]
+
+
+def test_factor_recalculation_is_applied_in_place():
+    registry = FactorRegistry()
+    registry.add_table(pd.DataFrame([{'category': 'Stationary Combustion', 'activity': 'Diesel', 'unit': 'liters',
+                                      'valid_from': '2024-01-01', 'factor': 10.0}]))
+    factor_id = registry.lookup('Stationary Combustion', 'Diesel', date='2024-01-01')['factor_id']
+    loads = []
+    dataset = SharedDataset(lambda: CountingStore('data/emissions.json', loads=loads))
+    dataset.reload()
+    factor_index = FactorIndex('data/factor_index.jsonl')
+    factor_index.add(dataset.append(make_rows(3, factor_id=[factor_id, factor_id, None])))
+
+    changes = registry.update(pd.DataFrame([{'category': 'Stationary Combustion', 'activity': 'Diesel',
+                                             'unit': 'liters', 'valid_from': '2024-01-01', 'factor': 2.0}]))
+    updated, summary = recalculate_for_factors(dataset, factor_index, changes, registry=registry)
+
+    assert len(updated) == 2 and summary['delta'].tolist() == [-16.0]
+    assert sorted(dataset.data()['emissions_kgCO2e']) == [2.0, 2.0, 10.0]
+    assert len(loads) == 1
+
+
+def test_imports_through_the_dataset_are_applied_in_place(tmp_path):
+    loads = []
+    dataset = SharedDataset(lambda: CountingStore('data/emissions.json', loads=loads))
+    dataset.reload()
+    source = tmp_path / 'january.csv'
+    source.write_text(
+        "date,scope,category,activity,facility,quantity,unit,emission_factor,notes\n"
+        "2024-01-05,Scope 1,Stationary Combustion,Diesel,Plant 1,100,liter,2.5,INV-1\n"
+        "2024-01-06,Scope 1,Stationary Combustion,Diesel,Plant 1,200,liter,2.5,INV-2\n"
+    )
+    with dataset.writing():
+        assert import_csv_chunked(dataset, str(source), chunksize=1)[0]
+    source.write_text(
+        "date,scope,category,activity,facility,quantity,unit,emission_factor,notes\n"
+        "2024-01-05,Scope 1,Stationary Combustion,Diesel,Plant 1,120,liter,2.5,INV-1\n"
+    )
+    with dataset.writing():
+        assert upsert_csv(dataset, str(source))[0]
+
+    data = dataset.data().sort_values('notes')
+    assert data['emissions_kgCO2e'].tolist() == [300.0, 500.0]
+    assert len(loads) == 1
+    assert data['entry_id'].tolist() == open_store().load().sort_values('notes')['entry_id'].tolist()
+
+
+def test_writes_inside_one_block_are_published_together():
+    dataset = SharedDataset(open_store)
+    dataset.reload()
+    with dataset.writing():
+        rows = dataset.append(make_rows(3, entry_id=['a', 'b', 'c']))
+        dataset.delete(['b'])
+        dataset.append(make_rows(1, entry_id=['b'], emissions=2.0))
+        dataset.append(make_rows(1, entry_id=['a'], emissions=1.0))
+        dataset.delete(['c'])
+        # Reads in the block see the writes so far
+        assert sorted(dataset.get(['a', 'b', 'c'])['emissions_kgCO2e']) == [1.0, 2.0]
+        dataset.append(make_rows(1, entry_id=['c'], emissions=3.0))
+
+    data = dataset.data().set_index('entry_id')['emissions_kgCO2e']
+    assert data.sort_index().to_dict() == {'a': 1.0, 'b': 2.0, 'c': 3.0}
+    assert len(rows) == 3
+
+
+def test_write_after_another_writer_reloads_instead_of_patching():
+    loads = []
+    dataset = SharedDataset(lambda: CountingStore('data/emissions.json', loads=loads))
+    dataset.reload()
+    with dataset.writing():
+        dataset.append(make_rows(1, entry_id=['a']))
+        # A store object outside the dataset writes in between
+        open_store().append(make_rows(1, start='2024-02-01', entry_id=['b']))
+        dataset.append(make_rows(1, start='2024-03-01', entry_id=['c']))
+    assert sorted(dataset.data()['entry_id']) == ['a', 'b', 'c']
+    assert len(loads) == 2
@@ -0,0 +1,16 @@
+"""
+Tests that plotting and PDF libraries stay out of the start-up imports.
+"""
+
+import os
+import subprocess
+import sys
+
+
+def test_report_and_data_modules_load_without_plotting_libraries():
+    code = ("import sys, data_handler, report_generator; "
+            "print(sorted({'plotly', 'fpdf', 'matplotlib', 'seaborn'} & set(sys.modules)))")
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=repo)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '[]'
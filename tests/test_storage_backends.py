@@ -0,0 +1,150 @@
+"""
+Tests for the storage backends behind open_store.
+"""
+
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from conftest import make_rows
+from emissions_store import ArrowStore, EmissionsStore, PartitionedStore, SQLiteStore, pa
+
+BACKENDS = {
+    'json': lambda: EmissionsStore('data/emissions.json', compact_every=4),
+    'arrow': lambda: ArrowStore('data/emissions.arrow', compact_every=4),
+    'sqlite': lambda: SQLiteStore('data/emissions.db'),
+    'partitioned': lambda: PartitionedStore('data/partitions'),
+}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def open_backend(request):
+    if request.param == 'arrow' and pa is None:
+        pytest.skip("pyarrow is not installed")
+    return BACKENDS[request.param]
+
+
+def stored(store):
+    """The stored rows in entry_id order, for comparing backends that order rows differently."""
+    data = store.load()
+    columns = ['entry_id', 'date', 'scope', 'category', 'facility', 'emissions_kgCO2e']
+    return data[columns].astype({'scope': str, 'category': str, 'facility': str}).sort_values('entry_id').reset_index(drop=True)
+
+
+def test_backends_agree_on_appends_replacements_and_deletes(open_backend):
+    store = open_backend()
+    rows = store.append(pd.concat([
+        make_rows(3, start='2024-01-30', entry_id=['a', 'b', 'c']),
+        make_rows(2, start='2024-03-01', scope='Scope 2', category='Electricity', entry_id=['d', 'e']),
+    ], ignore_index=True))
+    changed = rows[rows['entry_id'].isin(['a', 'd'])].copy()
+    changed['date'] = pd.Timestamp('2024-05-15')
+    changed['emissions_kgCO2e'] = [1.0, 2.0]
+    store.append(changed)
+    store.delete(['b'])
+
+    data = stored(open_backend())
+    assert data['entry_id'].tolist() == ['a', 'c', 'd', 'e']
+    assert data['emissions_kgCO2e'].tolist() == [1.0, 10.0, 2.0, 10.0]
+    assert data['date'].dt.strftime('%Y-%m-%d').tolist() == ['2024-05-15', '2024-02-01', '2024-05-15', '2024-03-02']
+
+    queried = open_backend().query('2024-02-01', '2024-03-31', scope='Scope 2')
+    assert queried['entry_id'].tolist() == ['e']
+    totals = open_backend().aggregate(['month', 'scope'])
+    assert totals.values.tolist() == [['2024-02', 'Scope 1', 10.0, 1], ['2024-03', 'Scope 2', 10.0, 1],
+                                      ['2024-05', 'Scope 1', 1.0, 1], ['2024-05', 'Scope 2', 2.0, 1]]
+
+
+def test_backends_share_initialisation_and_versioning(open_backend):
+    store = open_backend()
+    assert store.seq == store.log_records == 0
+    assert (store.log_file is None) == (not store.record_log)
+    assert store.version_file == os.path.abspath(store.location) + ".version"
+    before = store.data_version
+    store.append(make_rows(1))
+    assert open_backend().data_version > before
+
+
+def test_sqlite_update_keeps_load_order():
+    store = SQLiteStore('data/emissions.db')
+    store.append(make_rows(3, entry_id=['a', 'b', 'c']))
+    changed = make_rows(1, entry_id=['a'], emissions=1.0)
+    store.append(changed)
+
+    data = store.load()
+    assert data['entry_id'].tolist() == ['a', 'b', 'c']
+    assert data['emissions_kgCO2e'].tolist() == [1.0, 10.0, 10.0]
+
+
+def test_partitioned_row_moved_to_another_month_is_stored_once():
+    store = PartitionedStore('data/partitions')
+    rows = store.append(make_rows(2, start='2024-01-30'))
+    moved = rows.iloc[[0]].copy()
+    moved['date'] = moved['date'] + pd.Timedelta(days=40)
+    moved['emissions_kgCO2e'] = 5.0
+    store.append(moved)
+
+    data = PartitionedStore('data/partitions').load()
+    assert sorted(data['entry_id']) == sorted(rows['entry_id'])
+    assert data.set_index('entry_id').loc[rows['entry_id'].iloc[0], 'emissions_kgCO2e'] == 5.0
+    assert sorted(store.manifest) == ['2024-01', '2024-03']
+
+
+def test_partitioned_delete_and_get_without_dates():
+    store = PartitionedStore('data/partitions')
+    rows = store.append(make_rows(3, start='2024-01-31'))
+    reopened = PartitionedStore('data/partitions')
+    assert sorted(reopened.get(rows['entry_id'].iloc[1:])['entry_id']) == sorted(rows['entry_id'].iloc[1:])
+    reopened.delete([rows['entry_id'].iloc[2]])
+
+    assert list(PartitionedStore('data/partitions').load()['entry_id']) == list(rows['entry_id'].iloc[:2])
+
+
+def test_partitioned_entry_index_is_rebuilt_when_missing():
+    store = PartitionedStore('data/partitions')
+    rows = store.append(make_rows(2, start='2024-01-31'))
+    os.remove(store.entry_index_file)
+
+    reopened = PartitionedStore('data/partitions')
+    moved = rows.iloc[[1]].copy()
+    moved['date'] = moved['date'].map(lambda date: date.replace(year=2023))
+    reopened.append(moved)
+
+    data = PartitionedStore('data/partitions').load()
+    assert sorted(data['entry_id']) == sorted(rows['entry_id'])
+    assert sorted(reopened.manifest) == ['2023-02', '2024-01']
+
+
+def test_partitioned_stores_sharing_a_directory_keep_each_others_writes():
+    first, second = PartitionedStore('data/partitions'), PartitionedStore('data/partitions')
+    january = first.append(make_rows(1, start='2024-01-15'))
+    february = second.append(make_rows(1, start='2024-02-15'))
+    moved = january.copy()
+    moved['date'] = pd.Timestamp('2024-03-15')
+    second.append(moved)
+    first.delete(february['entry_id'])
+
+    data = PartitionedStore('data/partitions').load()
+    assert data['entry_id'].tolist() == january['entry_id'].tolist()
+    assert data['date'].dt.strftime('%Y-%m').tolist() == ['2024-03']
+    assert sorted(first.manifest) == ['2024-03']
+
+
+def test_partitioned_stores_written_concurrently_lose_no_rows():
+    def write(start):
+        store = PartitionedStore('data/partitions')
+        for month in range(6):
+            store.append(make_rows(1, start=pd.Timestamp(start) + pd.DateOffset(months=month)))
+
+    writers = [threading.Thread(target=write, args=(start,)) for start in ['2023-01-10', '2024-01-20']]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    data = PartitionedStore('data/partitions').load()
+    assert len(data) == 12
+    # The entry index knows every row, so they can be fetched without their dates
+    assert len(PartitionedStore('data/partitions').get(data['entry_id'])) == 12
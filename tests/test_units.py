@@ -0,0 +1,45 @@
+"""
+Tests for unit conversion.
+"""
+
+import numpy as np
+import pandas as pd
+
+from units import conversion_factors, convert, dimension, normalize_quantities
+
+
+def test_dimensions():
+    assert dimension('MWh') == dimension('GJ') == 'energy'
+    assert dimension('gallon') == 'volume'
+    assert dimension('furlong') is None
+
+
+def test_conversion_factors_within_and_across_dimensions():
+    factors = conversion_factors(['MWh', 'tonne', 'kWh', 'furlong', 'furlong', 'kWh'],
+                                 ['kWh', 'kg', 'liter', 'furlong', 'km', 'unknown'])
+    assert factors[:2].tolist() == [1000.0, 1000.0]
+    assert np.isnan(factors[2])
+    # Identical units convert 1:1 even when they are not defined
+    assert factors[3] == 1.0
+    assert np.isnan(factors[4:]).all()
+
+
+def test_convert_whole_columns():
+    converted = convert([1.0, 3.6, 2.0], ['MWh', 'GJ', 'mile'], ['kWh', 'kWh', 'km'])
+    assert np.allclose(converted, [1000.0, 1000.0, 3.218688])
+    # Index alignment of the inputs does not matter
+    quantities = pd.Series([5.0, 7.0], index=[10, 20])
+    units = pd.Series(['tonne', 'kg'], index=[3, 4])
+    assert convert(quantities, units, ['kg', 'tonne']).tolist() == [5000.0, 0.007]
+
+
+def test_normalize_quantities_converts_to_the_factor_unit():
+    rows = pd.DataFrame({'quantity': [2, 50, 10, 4], 'unit': ['MWh', 'gallon', 'kWh', 'km']}, index=[7, 8, 9, 10])
+    targets = pd.Series(['kWh', 'liter', None, 'kg'], index=rows.index)
+    converted, incompatible = normalize_quantities(rows, targets)
+
+    assert converted['unit'].tolist() == ['kWh', 'liter', 'kWh', 'km']
+    assert np.allclose(converted['quantity'], [2000.0, 189.2705892, 10.0, 4.0])
+    assert incompatible.tolist() == [False, False, False, True]
+    # The input frame is left as it was
+    assert rows['unit'].tolist() == ['MWh', 'gallon', 'kWh', 'km']
@@ -0,0 +1,119 @@
+"""
+Unit conversion for Enterprise CarbonScope application.
+Defines the dimension and scale of every supported unit and converts whole
+columns of quantities between units with a precomputed conversion matrix.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Dimension of each unit and its size in the dimension's base unit
+UNIT_DEFINITIONS = {
+    "kWh": ("energy", 1.0),
+    "MWh": ("energy", 1000.0),
+    "GJ": ("energy", 1000.0 / 3.6),
+    "liter": ("volume", 1.0),
+    "cubic meter": ("volume", 1000.0),
+    "gallon": ("volume", 3.785411784),
+    "kg": ("mass", 1.0),
+    "tonne": ("mass", 1000.0),
+    "km": ("distance", 1.0),
+    "mile": ("distance", 1.609344),
+    "passenger-km": ("passenger distance", 1.0),
+    "square meter": ("area", 1.0),
+    "hour": ("time", 1.0),
+    "day": ("time", 24.0),
+    "piece": ("count", 1.0),
+    "USD": ("currency", 1.0),
+}
+
+UNITS = pd.Index(list(UNIT_DEFINITIONS))
+
+# CONVERSION_MATRIX[i, j] converts a quantity in UNITS[i] to UNITS[j]; NaN across dimensions
+_dimensions = np.array([dimension for dimension, _ in UNIT_DEFINITIONS.values()])
+_scales = np.array([scale for _, scale in UNIT_DEFINITIONS.values()])
+CONVERSION_MATRIX = np.where(
+    _dimensions[:, None] == _dimensions[None, :],
+    _scales[:, None] / _scales[None, :],
+    np.nan
+)
+
+
+def dimension(unit):
+    """
+    Get the dimension of a unit.
+
+    Args:
+        unit (str): Unit name
+
+    Returns:
+        str: Dimension (e.g. "energy"), or None for unknown units
+    """
+    definition = UNIT_DEFINITIONS.get(unit)
+    return definition[0] if definition else None
+
+
+def conversion_factors(from_units, to_units):
+    """
+    Get the multipliers converting quantities between units, for whole columns.
+
+    Args:
+        from_units (array-like): Unit of each quantity
+        to_units (array-like): Target unit of each quantity
+
+    Returns:
+        numpy.ndarray: Multiplier per element; 1.0 where the units are equal and
+            NaN where either unit is unknown or the dimensions differ
+    """
+    from_units = pd.Series(from_units, dtype=object).reset_index(drop=True)
+    to_units = pd.Series(to_units, dtype=object).reset_index(drop=True)
+    from_codes = UNITS.get_indexer(from_units)
+    to_codes = UNITS.get_indexer(to_units)
+    known = (from_codes != -1) & (to_codes != -1)
+    factors = np.full(len(from_units), np.nan)
+    factors[known] = CONVERSION_MATRIX[from_codes[known], to_codes[known]]
+    # Identical units convert 1:1 even when the unit is not defined here
+    factors[(from_units == to_units).values] = 1.0
+    return factors
+
+
+def convert(quantities, from_units, to_units):
+    """
+    Convert quantities to other units.
+
+    Args:
+        quantities (array-like): Quantities
+        from_units (array-like): Unit of each quantity
+        to_units (array-like): Target unit of each quantity
+
+    Returns:
+        numpy.ndarray: Converted quantities, NaN where no conversion exists
+    """
+    return np.asarray(quantities, dtype=float) * conversion_factors(from_units, to_units)
+
+
+def normalize_quantities(df, target_units):
+    """
+    Express quantities in the unit their emission factor is given in.
+
+    Args:
+        df (pandas.DataFrame): Rows with quantity and unit columns
+        target_units (pandas.Series): Factor unit per row, aligned with df; missing
+            values keep the row's own unit
+
+    Returns:
+        tuple: (rows with converted quantity and unit, bool mask of rows whose
+                unit cannot be converted to the target unit)
+    """
+    targets = target_units.reindex(df.index).astype(object)
+    targets = targets.where(targets.notna(), df['unit'].astype(object))
+    factors = pd.Series(conversion_factors(df['unit'].astype(object), targets), index=df.index)
+    incompatible = factors.isna()
+    convertible = ~incompatible & (factors != 1.0)
+    rows = df.copy()
+    if convertible.any():
+        rows['quantity'] = rows['quantity'].astype(float)
+        rows.loc[convertible, 'quantity'] = rows.loc[convertible, 'quantity'] * factors[convertible]
+        rows['unit'] = rows['unit'].astype(object)
+        rows.loc[convertible, 'unit'] = targets[convertible]
+    return rows, incompatible
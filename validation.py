@@ -0,0 +1,95 @@
+"""
+Row-level validation for Enterprise CarbonScope application.
+Checks every row of an emissions import at once with vectorized masks and
+collects all failures into an error table instead of stopping at the first.
+"""
+
+import pandas as pd
+
+import config
+from emission_factors import SCOPE_CATEGORIES
+
+# Columns every emissions CSV must contain
+REQUIRED_COLUMNS = ['date', 'scope', 'category', 'activity', 'quantity', 'unit', 'emission_factor']
+
+# Valid (scope, category) pairs
+VALID_SCOPE_CATEGORIES = pd.MultiIndex.from_tuples(
+    [(scope, category) for scope, categories in SCOPE_CATEGORIES.items() for category in categories]
+)
+
+# Columns of the error table
+ERROR_COLUMNS = ['row', 'column', 'reason', 'value']
+
+
+def empty_errors():
+    """Create an empty error table."""
+    return pd.DataFrame(columns=ERROR_COLUMNS)
+
+
+def _errors(df, mask, column, reason, row_offset):
+    """Build error table rows for the rows selected by mask."""
+    if not mask.any():
+        return None
+    return pd.DataFrame({
+        'row': df.index[mask] + row_offset + 1,
+        'column': column,
+        'reason': reason,
+        'value': df.loc[mask, column].astype(str).values if column in df.columns else ''
+    })
+
+
+def validate_emissions(df, row_offset=0, require_factor=True):
+    """
+    Validate emissions rows.
+
+    Checks numeric parsing, negative quantities, unknown scopes, categories not
+    listed for the scope in SCOPE_CATEGORIES, units outside config.DEFAULT_UNITS,
+    unparseable dates and missing activities. Each check is a single vectorized
+    mask over all rows.
+
+    Args:
+        df (pandas.DataFrame): Raw CSV rows
+        row_offset (int, optional): Number of data rows before df in the source file
+        require_factor (bool, optional): Whether emission_factor must be present; when False
+            the column may be absent or blank, to be resolved from the factor registry
+
+    Returns:
+        tuple: (pandas.Series bool mask of valid rows, pandas.DataFrame error table)
+
+    Raises:
+        ValueError: If required columns are missing
+    """
+    required = REQUIRED_COLUMNS if require_factor else [col for col in REQUIRED_COLUMNS if col != 'emission_factor']
+    missing_columns = [col for col in required if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"CSV must contain all required columns: {', '.join(required)}")
+
+    df = df.reset_index(drop=True)
+    found = []
+
+    optional = [col for col in ['emission_factor', 'emissions_kgCO2e'] if col not in required and col in df.columns]
+    for col in ['quantity'] + (['emission_factor'] if require_factor else []) + optional:
+        parsed = pd.to_numeric(df[col], errors='coerce')
+        if col in required:
+            found.append(_errors(df, df[col].isna(), col, "missing value", row_offset))
+        found.append(_errors(df, parsed.isna() & df[col].notna(), col, "not a number", row_offset))
+        found.append(_errors(df, parsed < 0, col, "negative value", row_offset))
+
+    dates = pd.to_datetime(df['date'], errors='coerce')
+    found.append(_errors(df, df['date'].isna(), 'date', "missing value", row_offset))
+    found.append(_errors(df, dates.isna() & df['date'].notna(), 'date', "unparseable date", row_offset))
+
+    unknown_scope = ~df['scope'].isin(config.EMISSION_SCOPES)
+    found.append(_errors(df, unknown_scope, 'scope', "unknown scope", row_offset))
+    pairs = pd.MultiIndex.from_arrays([df['scope'], df['category']])
+    found.append(_errors(df, ~unknown_scope & ~pairs.isin(VALID_SCOPE_CATEGORIES).astype(bool),
+                         'category', "category not valid for scope", row_offset))
+
+    found.append(_errors(df, ~df['unit'].isin(config.DEFAULT_UNITS), 'unit', "unknown unit", row_offset))
+    found.append(_errors(df, df['activity'].isna(), 'activity', "missing value", row_offset))
+
+    found = [errors for errors in found if errors is not None]
+    errors = pd.concat(found, ignore_index=True).sort_values('row', kind='stable') if found else empty_errors()
+    valid = pd.Series(True, index=df.index)
+    valid[errors['row'].values - row_offset - 1] = False
+    return valid, errors.reset_index(drop=True)